@@ -1,31 +1,32 @@
 import os
-import pandas as pd
+import time
+import argparse
 import numpy as np
 from gensim.models import Word2Vec
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report
 import joblib
+from ddos2vec_features import FlowEmbedder, flow_sentences
+from feature_store import sync_store
+from ddos2vec_corpusgen import write_corpus
+import instrumentation
+from instrumentation import stage
 
 # CONFIG 
 TRAINING_DATA_FOLDER = "training_data/"
 EMBEDDING_MODEL_FILE = "ddos2vec_embedding.model"
 CLASSIFIER_FILE = "ddos2vec_classifier.pkl"
 LABEL_MAP_FILE = "ddos2vec_label_map.pkl"
+CORPUS_FILE = "ddos2vec_corpus.txt"  # LineSentence file Word2Vec trains from (corpus_file mode)
 EMBEDDING_SIZE = 100
 CHUNK_SIZE = 500000  # Read 500k rows at a time
 WORKERS = os.cpu_count()  # Use all CPU cores
 
 
-# Create label map (fast vectorized) 
-def create_label_map(input_folder):
-    all_labels = []
-    for file in os.listdir(input_folder):
-        if file.endswith(".csv"):
-            for chunk in pd.read_csv(os.path.join(input_folder, file), usecols=["label"], chunksize=CHUNK_SIZE):
-                all_labels.extend(chunk["label"].tolist())
-
-    all_labels = list(set(all_labels))  # unique labels
+# Create label map (from the feature store label codes, no CSV scan) 
+def create_label_map(store):
+    all_labels = store.present_labels()  # unique labels
     label_map = {label: idx for idx, label in enumerate(sorted(all_labels))}
     print(f" Label map created: {label_map}")
     return label_map
@@ -33,57 +34,91 @@ def create_label_map(input_folder):
 
 #  Sentence Generator 
 class FlowSentenceGenerator:
-    def __init__(self, csv_folder):
-        self.files = [os.path.join(csv_folder, f) for f in os.listdir(csv_folder) if f.endswith(".csv")]
+    def __init__(self, store):
+        self.store = store
 
     def __iter__(self):
-        for file in self.files:
-            for chunk in pd.read_csv(file, usecols=["proto", "sport", "dport"], chunksize=CHUNK_SIZE):
-                chunk["sentence"] = chunk["proto"].astype(str) + "_" + chunk["sport"].astype(str) + "_" + chunk["dport"].astype(str)
-                for sentence in chunk["sentence"]:
-                    yield sentence.split()
+        for chunk in self.store.iter_chunks(["proto", "sport", "dport"], chunk_size=CHUNK_SIZE):
+            for sentence in flow_sentences(chunk):
+                yield sentence.split()
 
 
 # Train Word2Vec Model 
-def train_word2vec(csv_folder, embedding_model_path, embedding_size=100):
-    sentences = FlowSentenceGenerator(csv_folder)
-    w2v_model = Word2Vec(
+def fit_word2vec(embedding_size=100, workers=WORKERS, sentences=None, corpus_file=None):
+    # sentences: iterable of token lists (one Python producer thread feeds the workers)
+    # corpus_file: LineSentence file, each worker reads and trains on its own slice of it
+    return Word2Vec(
         sentences,
+        corpus_file=corpus_file,
         vector_size=embedding_size,
         window=5,
         min_count=1,
-        workers=WORKERS
+        workers=workers
     )
-    w2v_model.save(embedding_model_path)
+
+
+def train_word2vec(store, embedding_model_path, embedding_size=100, workers=WORKERS, corpus_file=CORPUS_FILE):
+    """
+    Trains the DDoS2Vec embedding on every flow in the store.
+
+    By default the flows are first written to `corpus_file` in one streaming pass and gensim
+    trains in corpus_file mode, which scales with `workers`. With corpus_file=None the
+    flows are streamed through FlowSentenceGenerator instead.
+    """
+    if corpus_file is None:
+        with stage("train", rows=store.n_rows):
+            w2v_model = fit_word2vec(embedding_size, workers, sentences=FlowSentenceGenerator(store))
+    else:
+        with stage("corpus", rows=store.n_rows):
+            n_sentences = write_corpus(store, corpus_file)
+        print(f" Corpus written to: {corpus_file} ({n_sentences} sentences)")
+        with stage("train", rows=n_sentences):
+            w2v_model = fit_word2vec(embedding_size, workers, corpus_file=corpus_file)
+
+    # sep_limit=0 stores the vectors as separate .npy files so scorers can mmap them
+    with stage("write"):
+        w2v_model.save(embedding_model_path, sep_limit=0)
     print(f" Word2Vec model saved to: {embedding_model_path}")
     return w2v_model
 
 
-#  Convert sentence to vector 
-def sentence_to_vec(sentence, w2v_model):
-    words = sentence.split()
-    vecs = [w2v_model.wv[w] for w in words if w in w2v_model.wv]
-    if not vecs:
-        return np.zeros(w2v_model.vector_size)
-    return np.mean(vecs, axis=0)
+def benchmark(store, worker_counts, embedding_size=100, corpus_file=CORPUS_FILE):
+    """
+    Prints Word2Vec training throughput (vocab scan + all epochs) for the iterable and the
+    corpus_file path at each worker count.
+    """
+    start = time.perf_counter()
+    n_sentences = write_corpus(store, corpus_file)
+    print(f" Corpus write: {n_sentences} sentences in {time.perf_counter() - start:.2f}s")
+
+    print(f" {'workers':>7} {'path':>11} {'seconds':>8} {'words/s':>12}")
+    for workers in worker_counts:
+        for path in ("iterable", "corpus_file"):
+            start = time.perf_counter()
+            if path == "iterable":
+                model = fit_word2vec(embedding_size, workers, sentences=FlowSentenceGenerator(store))
+            else:
+                model = fit_word2vec(embedding_size, workers, corpus_file=corpus_file)
+            elapsed = time.perf_counter() - start
+            words = model.corpus_total_words * model.epochs
+            print(f" {workers:>7} {path:>11} {elapsed:>8.2f} {words / elapsed:>12,.0f}")
 
 
 # Prepare Dataset (vectorized) 
-def prepare_dataset(input_folder, w2v_model, label_map):
+def prepare_dataset(store, w2v_model, label_map):
+    embedder = FlowEmbedder(w2v_model)
+    store_to_label_map = store.label_codes(label_map)
     X = []
     y = []
 
-    for file in os.listdir(input_folder):
-        if file.endswith(".csv"):
-            for chunk in pd.read_csv(os.path.join(input_folder, file), usecols=["proto", "sport", "dport", "label"], chunksize=CHUNK_SIZE):
-                chunk["sentence"] = chunk["proto"].astype(str) + "_" + chunk["sport"].astype(str) + "_" + chunk["dport"].astype(str)
-                chunk["label_encoded"] = chunk["label"].map(label_map)
-
-                X.extend([sentence_to_vec(s, w2v_model) for s in chunk["sentence"]])
-                y.extend(chunk["label_encoded"].tolist())
+    chunks = store.iter_chunks(["proto", "sport", "dport", "label"], chunk_size=CHUNK_SIZE)
+    for chunk in instrumentation.iter_stage("load", chunks):
+        with stage("embed", rows=len(chunk)):
+            X.append(embedder.transform(chunk))
+        y.append(store_to_label_map[chunk["label"].cat.codes.to_numpy()])
 
-    X = np.array(X)
-    y = np.array(y)
+    X = np.concatenate(X) if X else np.empty((0, w2v_model.vector_size), dtype=np.float32)
+    y = np.concatenate(y) if y else np.empty(0)
     print(f" Prepared dataset: {X.shape[0]} samples")
     return X, y
 
@@ -102,16 +137,38 @@ def train_classifier(X, y):
     return clf
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the DDoS2Vec embedding and classifier")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--iterable", action="store_true",
+                        help="Stream sentences from Python instead of training from the corpus file")
+    parser.add_argument("--benchmark", default=None, metavar="N,N,...",
+                        help="Only compare words/s of both training paths at these worker counts")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
 # MAIN
 if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure_from_args(args, "ddos2vec_trainer")
+    with stage("sync_store"):
+        store = sync_store(TRAINING_DATA_FOLDER)
+
+    if args.benchmark:
+        benchmark(store, [int(n) for n in args.benchmark.split(",")], EMBEDDING_SIZE)
+        raise SystemExit
+
     print(" Creating label map...")
-    label_map = create_label_map(TRAINING_DATA_FOLDER)
+    label_map = create_label_map(store)
 
     print(" Training Word2Vec model...")
-    w2v_model = train_word2vec(TRAINING_DATA_FOLDER, EMBEDDING_MODEL_FILE, embedding_size=EMBEDDING_SIZE)
+    w2v_model = train_word2vec(store, EMBEDDING_MODEL_FILE, embedding_size=EMBEDDING_SIZE, workers=args.workers,
+                               corpus_file=None if args.iterable else CORPUS_FILE)
+    instrumentation.write_report()
 """ 
     print(" Preparing dataset...")
-    X, y = prepare_dataset(TRAINING_DATA_FOLDER, w2v_model, label_map)
+    X, y = prepare_dataset(store, w2v_model, label_map)
 
     print(" Training classifier...")
     classifier = train_classifier(X, y)
@@ -1,101 +1,181 @@
 import numpy as np
 import os
+import argparse
 import datetime
-from silk import *
-from Sliding_Window import Sliding_Window 
+import instrumentation
+from Sliding_Window import Sliding_Window
+from npy_writer import NpyWriter
+from instrumentation import stage, iter_stage
+from silk_io import is_supported, iter_flow_batches, TCP_FLAG_BITS
 
-def extract_silk_features(list_of_silk_files, output_dir="data/Classifiers", sliding_window_times=[1200, 6000, 12000]):
-    """
-    Extracts network flow features from SiLK files and saves them in .npy format.
+try:
+    from silk import silkfile_open, READ
+except ImportError:  # PySiLK is only needed for record formats silk_io cannot decode
+    silkfile_open = READ = None
 
-    Parameters:
-        list_of_silk_files (list): List of SiLK file paths.
-        output_dir (str): Directory to save extracted features.
-        sliding_window_times (list): Time windows for entropy-based calculations.
-    
-    Returns:
-        None (Saves features in .npy files)
-    """
+# === CONFIG ===
+BLOCK_ROWS = 65536  # Rows held in memory before a flush to the .npy files
 
-    # Initialize sliding windows for entropy-based features
-    sliding_window = Sliding_Window(sliding_window_times[0], sliding_window_times[1], sliding_window_times[2], False)
+# Fields-based feature columns, in output order
+FIELD_COLUMNS = ["sip", "dip", "sport", "dport", "proto", "packets", "bytes", "nhip",
+                 "fin", "syn", "rst", "psh", "ack", "urg", "ece", "cwr", "duration", "sensor"]
+N_FIELDS = len(FIELD_COLUMNS)
+READ_COLUMNS = ["stime", "sip", "dip", "sport", "dport", "proto", "packets", "bytes", "nhip",
+                "flags", "duration", "sensor"]
 
-    # Storage for feature sets
-    fields_features = []  # For Fields-based classifiers (Random Forest)
-    entropy_features = []  # For Entropy-based classifiers
-    combined_features = []  # For classifiers using both fields and entropy
 
-    for file in list_of_silk_files:
-        print(f"Processing SiLK file: {file}")
+class FeatureBlockWriter:
+    """
+    One preallocated float32 block of [fields | entropy] rows, flushed to
+    fields.npy, entropy.npy and combined.npy whenever it fills up.
 
-        # Open the SiLK flow file
-        infile = silkfile_open(file, READ)
+    fields and entropy are column views of the combined block, so each row is written once
+    and peak memory is a single block regardless of how many records are extracted.
+    """
+
+    def __init__(self, output_dir, block_rows=BLOCK_ROWS):
+        self.block = np.empty((block_rows, N_FIELDS + Sliding_Window.N_FEATURES), dtype=np.float32)
+        self.fields = self.block[:, :N_FIELDS]
+        self.entropy = self.block[:, N_FIELDS:]
+        self.n = 0
+        self.writers = {
+            "fields": NpyWriter(os.path.join(output_dir, "fields.npy"), np.float32, (N_FIELDS,)),
+            "entropy": NpyWriter(os.path.join(output_dir, "entropy.npy"), np.float32, (Sliding_Window.N_FEATURES,)),
+            "combined": NpyWriter(os.path.join(output_dir, "combined.npy"), np.float32, (self.block.shape[1],)),
+        }
+
+    def reserve(self, rows):
+        # Returns the first free row of a slot of `rows` rows (rows <= block size)
+        if self.n + rows > len(self.block):
+            self.flush()
+        start = self.n
+        self.n += rows
+        return start
+
+    def flush(self):
+        if self.n:
+            with stage("write", rows=self.n):
+                self.writers["fields"].write(self.fields[:self.n])
+                self.writers["entropy"].write(self.entropy[:self.n])
+                self.writers["combined"].write(self.block[:self.n])
+            self.n = 0
+
+    def close(self):
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        return self.writers["combined"].n_rows
+
+
+def _extract_native(file, sliding_window, out):
+    # Vectorized path: silk_io batches through Sliding_Window.add_batch
+    batches = iter_flow_batches(file, batch_size=len(out.block), columns=READ_COLUMNS)
+    for df in iter_stage("load", batches):
+        with stage("entropy", rows=len(df)):
+            entropy = sliding_window.add_frame(df)
+        start = out.reserve(len(df))
+        rows = slice(start, start + len(df))
+
+        with stage("featurize", rows=len(df)):
+            flags = df["flags"].to_numpy()
+            for j, col in enumerate(FIELD_COLUMNS):
+                if col in TCP_FLAG_BITS:
+                    out.fields[rows, j] = (flags & TCP_FLAG_BITS[col]) != 0
+                else:
+                    out.fields[rows, j] = df[col].to_numpy()
+            out.entropy[rows] = entropy
 
+
+def _extract_pysilk(file, sliding_window, out):
+    # Per-record fallback for SiLK formats silk_io does not decode; timed per file, not per record
+    infile = silkfile_open(file, READ)
+    with stage("extract_pysilk") as s:
+        n = 0
         for rec in infile:
-            sliding_window_values = sliding_window.addNewRec(rec)  # Update sliding window
+            row = out.reserve(1)
+            out.entropy[row] = sliding_window.addNewRec(rec)  # 15 window entropies for this record
 
             # Extract Fields-Based Features (Basic NetFlow fields)
-            field_data = [
+            out.fields[row] = (
                 int(rec.sip), int(rec.dip), rec.sport, rec.dport, rec.protocol, rec.packets, rec.bytes, int(rec.nhip),
                 int(rec.tcpflags.fin), int(rec.tcpflags.syn), int(rec.tcpflags.rst), int(rec.tcpflags.psh), int(rec.tcpflags.ack),
                 int(rec.tcpflags.urg), int(rec.tcpflags.ece), int(rec.tcpflags.cwr),
                 rec.duration / datetime.timedelta(milliseconds=1),  # Normalize duration
                 rec.sensor_id  # Attack label (assumed)
-            ]
+            )
+            n += 1
+        s.add_rows(n)
+    infile.close()
+
+
+def _can_read_natively(file):
+    # Record layout, compression method and header version must all be ones silk_io decodes
+    try:
+        return is_supported(file)
+    except ValueError:  # not a SiLK file as far as silk_io can tell; left to PySiLK
+        return False
+
 
-            # Extract Entropy-Based Features (Requires sliding window)
-            entropy_data, combined_data = extract_entropy_features(sliding_window_values)
+def extract_silk_features(list_of_silk_files, output_dir="data/Classifiers", sliding_window_times=[1200, 6000, 12000],
+                          block_rows=BLOCK_ROWS):
+    """
+    Extracts network flow features from SiLK files and saves them in .npy format.
+
+    Rows are written through one preallocated block that is flushed to disk when full, so
+    memory use does not grow with the number of records. All outputs are float32 and load
+    with np.load(path, mmap_mode="r"):
+        fields.npy   (n, 18)  FIELD_COLUMNS
+        entropy.npy  (n, 15)  sip/dip/sport/dport/proto entropy for each window
+        combined.npy (n, 33)  fields followed by entropy
 
-            # Store extracted features
-            fields_features.append(field_data)
-            if entropy_data:
-                entropy_features.append(entropy_data)
-            if combined_data:
-                combined_features.append(combined_data)
+    Parameters:
+        list_of_silk_files (list): List of SiLK file paths.
+        output_dir (str): Directory to save extracted features.
+        sliding_window_times (list): Time windows (ms) for entropy-based calculations.
+        block_rows (int): Rows per in-memory block.
 
-        infile.close()
+    Returns:
+        int: Number of records extracted (features are saved in .npy files)
+    """
 
-    # Convert lists to numpy arrays
-    fields_features = np.array(fields_features, dtype=np.float32)
-    entropy_features = np.array(entropy_features, dtype=object)
-    combined_features = np.array(combined_features, dtype=np.float32)
+    # Initialize sliding windows for entropy-based features
+    sliding_window = Sliding_Window(sliding_window_times[0], sliding_window_times[1], sliding_window_times[2], False)
 
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
+    out = FeatureBlockWriter(output_dir, block_rows)
 
-    # Save extracted features
-    np.save(os.path.join(output_dir, "fields.npy"), fields_features)
-    np.save(os.path.join(output_dir, "entropy.npy"), entropy_features)
-    np.save(os.path.join(output_dir, "combined.npy"), combined_features)
+    for file in list_of_silk_files:
+        print(f"Processing SiLK file: {file}")
 
-    print(f"Feature extraction complete. Data saved in {output_dir}/")
+        if _can_read_natively(file):
+            _extract_native(file, sliding_window, out)
+        elif silkfile_open is not None:
+            _extract_pysilk(file, sliding_window, out)
+        else:
+            raise ValueError(f"{file}: record format not supported by silk_io and PySiLK is not installed")
 
-def extract_entropy_features(sliding_window_values):
-    """
-    Processes entropy-based features from a sliding window.
+    n_rows = out.close()
+    print(f"Feature extraction complete. {n_rows} records saved in {output_dir}/")
+    return n_rows
 
-    Parameters:
-        sliding_window_values (list): Values from the sliding window.
 
-    Returns:
-        tuple: (entropy-based features, combined features)
-    """
-    entropy_data = []
-    combined_data = []
-
-    if len(sliding_window_values) > 0:
-        for x in range(0, len(sliding_window_values)):
-            if sliding_window_values[x] == "window":
-                if x + 1 >= len(sliding_window_values):
-                    continue
-                elif sliding_window_values[x + 1] == "window" or len(sliding_window_values[x + 1]) == 0:
-                    continue
-                else:
-                    entropy_data.append(sliding_window_values[x + 1][0][18:])  # Extract entropy values
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract fields and window entropy features from SiLK files")
+    parser.add_argument("files", nargs="+", help="SiLK files, in time order")
+    parser.add_argument("--output-dir", default="data/Classifiers")
+    parser.add_argument("--windows", type=int, nargs=3, default=[1200, 6000, 12000], metavar="MS",
+                        help="Sliding window lengths in ms")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    instrumentation.configure_from_args(args, "IDS")
+    instrumentation.count("records", extract_silk_features(args.files, args.output_dir, args.windows))
+    instrumentation.write_report()
 
-        for temp in sliding_window_values:
-            if len(temp) != 0 and temp != "window":
-                for r in temp:
-                    combined_data.append(r)  # Append combined feature set
 
-    return entropy_data, combined_data
\ No newline at end of file
+if __name__ == "__main__":
+    main()
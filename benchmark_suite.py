@@ -0,0 +1,255 @@
+# benchmark_suite.py
+"""
+End-to-end throughput benchmark over deterministic synthetic flow data.
+
+For every dataset size a scratch directory is laid out the way the scripts expect
+(final_dataset_01/*.rw, attack_data/*.csv) and each stage is run as its own process with
+that directory as cwd:
+
+    labeling         process_traning.py --native    .rw -> training_data/*.csv
+    train_rf         random_forest.py
+    train_nb         naive_bayes.py
+    train_ddos2vec   DDoS2Vec_trainer.py
+    evaluate         pipeline.py
+    port_detection   port_detection.py
+
+Wall time, rows/s and peak RSS (ru_maxrss of the stage and the workers it waited for, from
+os.wait4) are written to a JSON file, together with the per-stage breakdown each script
+reports through instrumentation (FLOW_METRICS). Everything runs offline: the .rw inputs are written
+with silk_io.FlowWriter and labeling reads them natively, so no SiLK tools are needed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+# === CONFIG ===
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+SEED = 42
+ROWS_PER_FILE = 1_000_000   # Flows per generated .rw / attack CSV file
+GENERATE_CHUNK = 250_000    # Flows generated at a time; bounds generator memory
+ATTACK_FRACTION = 0.3
+START_MS = 1_743_519_600_000  # 2025-04-01T15:00:00Z
+SPAN_MS = 3_600_000           # Flow start times spread over one hour
+OUTPUT_FILE = "benchmark_results.json"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Normal traffic services (dport, proto), disjoint from generate_attacks.ATTACK_PORTS
+NORMAL_SERVICES = [(80, 6), (443, 6), (22, 6), (25, 6), (53, 17), (123, 17), (0, 1)]
+
+# (stage name, script, arguments); the scripts read and write relative to the scratch directory
+STAGES = [
+    ("labeling", "process_traning.py", ["--native"]),
+    ("train_rf", "random_forest.py", []),
+    ("train_nb", "naive_bayes.py", []),
+    ("train_ddos2vec", "DDoS2Vec_trainer.py", []),
+    # DDoS2Vec_trainer.py only builds the embedding (its classifier step is disabled), so
+    # the scorers run the models that training produced
+    ("evaluate", "pipeline.py", ["--models", "rf,nb"]),
+    ("port_detection", "port_detection.py", ["--models", "rf,nb"]),
+]
+
+
+# === Synthetic data (runs in a child process, see generate_dataset) ===
+
+def synthetic_flows(n, seed, chunk_index):
+    """
+    Generates `n` flows as FLOW_COLUMNS arrays. Attack flows follow the ATTACK_PORTS /
+    ATTACK_PROTOCOLS profiles and rwgenerate parameters of generate_attacks.py; the rest is
+    normal client traffic. The result depends only on (seed, chunk_index, n).
+    """
+    import numpy as np
+    import pandas as pd
+    from generate_attacks import ATTACK_PORTS, ATTACK_PROTOCOLS, VICTIM_IP
+    from silk_io import str_to_ipv4
+
+    rng = np.random.default_rng([seed, chunk_index])
+    attacks = list(ATTACK_PORTS)
+    attack_ports = np.array([ATTACK_PORTS[a] for a in attacks], dtype=np.uint16)
+    attack_protos = np.array([ATTACK_PROTOCOLS[a] for a in attacks], dtype=np.uint8)
+    normal_ports = np.array([p for p, _ in NORMAL_SERVICES], dtype=np.uint16)
+    normal_protos = np.array([p for _, p in NORMAL_SERVICES], dtype=np.uint8)
+
+    attack = rng.random(n) < ATTACK_FRACTION
+    kind = rng.integers(0, len(attacks), n)
+    service = rng.integers(0, len(NORMAL_SERVICES), n)
+    victim = int(str_to_ipv4([VICTIM_IP])[0])
+
+    packets = np.where(attack, 1, rng.integers(1, 20, n))
+    stime = START_MS + chunk_index * SPAN_MS + np.sort(rng.integers(0, SPAN_MS, n))
+    return pd.DataFrame({
+        "stime": stime.astype(np.int64),
+        "duration": rng.integers(0, 90_000, n).astype(np.uint32),
+        # --sip-range=192.168.40.1-192.168.40.200 for attacks, 10.0.0.0/16 clients otherwise
+        "sip": np.where(attack, 0xC0A82800 + rng.integers(1, 201, n), 0x0A000000 + rng.integers(1, 65536, n)).astype(np.uint32),
+        "dip": np.where(attack, victim, 0xC0A83200 + rng.integers(1, 255, n)).astype(np.uint32),
+        "sport": rng.integers(1024, 65536, n).astype(np.uint16),
+        "dport": np.where(attack, attack_ports[kind], normal_ports[service]),
+        "proto": np.where(attack, attack_protos[kind], normal_protos[service]),
+        "packets": packets.astype(np.uint32),
+        "bytes": (packets * np.where(attack, rng.integers(40, 151, n), rng.integers(60, 1500, n))).astype(np.uint32),
+    })
+
+
+def generate_dataset(root, n_rows, seed=SEED):
+    """
+    Writes final_dataset_01/*.rw (labeling input) and attack_data/*.csv (port_detection input,
+    headerless port_detection.COLUMNS layout) holding the same n_rows flows.
+    """
+    from silk_io import FlowWriter, ipv4_to_str, ms_to_rwcut_time
+    from port_detection import COLUMNS
+
+    os.makedirs(os.path.join(root, "final_dataset_01"), exist_ok=True)
+    os.makedirs(os.path.join(root, "attack_data"), exist_ok=True)
+
+    for file_index, file_start in enumerate(range(0, n_rows, ROWS_PER_FILE)):
+        file_rows = min(ROWS_PER_FILE, n_rows - file_start)
+        rw_path = os.path.join(root, "final_dataset_01", f"synthetic_{file_index:03d}.rw")
+        csv_path = os.path.join(root, "attack_data", f"synthetic_{file_index:03d}.csv")
+        with FlowWriter(rw_path) as writer, open(csv_path, "w") as csv_file:
+            for start in range(0, file_rows, GENERATE_CHUNK):
+                chunk_index = (file_start + start) // GENERATE_CHUNK
+                flows = synthetic_flows(min(GENERATE_CHUNK, file_rows - start), seed, chunk_index)
+                writer.write(flows)
+
+                flows["etime"] = flows["stime"] + flows["duration"]
+                for col in ("sip", "dip"):
+                    flows[col] = ipv4_to_str(flows[col]).to_numpy()
+                for col in ("stime", "etime"):
+                    flows[col] = ms_to_rwcut_time(flows[col]).to_numpy()
+                flows[COLUMNS].to_csv(csv_file, header=False, index=False)
+
+
+# === Measurement ===
+
+def run_measured(cmd, cwd, log_path, env=None):
+    """
+    Runs `cmd` to completion.
+
+    Returns:
+        tuple: (returncode, wall seconds, peak RSS in MB of the process and its waited-for children)
+    """
+    with open(log_path, "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, cwd=cwd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, wall, usage.ru_maxrss / 1024
+
+
+def _log_tail(path, lines=5):
+    with open(path, errors="replace") as f:
+        return "".join(f.readlines()[-lines:]).strip()
+
+
+def benchmark_size(label, n_rows, workdir=None, keep=False, stages=None):
+    """
+    Generates one dataset and runs every stage on it.
+
+    Returns:
+        list: One result dict per stage (generation included).
+    """
+    root = tempfile.mkdtemp(prefix=f"flow_bench_{label}_", dir=workdir)
+    results = []
+    try:
+        print(f"\n Dataset {label} ({n_rows:,} flows) in {root}")
+        code = f"import benchmark_suite; benchmark_suite.generate_dataset({root!r}, {n_rows}, {SEED})"
+        steps = [("generate", [sys.executable, "-c", code], REPO_DIR)]
+        steps += [(name, [sys.executable, os.path.join(REPO_DIR, script)] + args, root)
+                  for name, script, args in STAGES if stages is None or name in stages]
+
+        for name, cmd, cwd in steps:
+            log_path = os.path.join(root, f"{name}.log")
+            metrics_path = os.path.join(root, f"{name}_metrics.json")
+            env = dict(os.environ, FLOW_METRICS=metrics_path)
+            returncode, wall, rss = run_measured(cmd, cwd, log_path, env)
+            result = {
+                "dataset": label,
+                "rows": n_rows,
+                "stage": name,
+                "returncode": returncode,
+                "wall_s": round(wall, 3),
+                "rows_per_s": round(n_rows / wall, 1) if wall > 0 else None,
+                "peak_rss_mb": round(rss, 1),
+            }
+            if os.path.exists(metrics_path):
+                with open(metrics_path) as f:
+                    result["stages"] = json.load(f)["stages"]
+            if returncode != 0:
+                result["log_tail"] = _log_tail(log_path)
+            results.append(result)
+            status = "ok" if returncode == 0 else f"FAILED ({returncode})"
+            print(f"  {name:<15} {wall:8.2f}s {n_rows / wall:>12,.0f} rows/s {rss:8.1f} MB  {status}")
+    finally:
+        if keep:
+            print(f" Kept {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    # Prints rows/s and peak RSS of this run relative to an earlier results file
+    with open(baseline_path) as f:
+        baseline = {(r["dataset"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"\n Compared with {baseline_path}")
+    for r in results:
+        old = baseline.get((r["dataset"], r["stage"]))
+        if old and old.get("rows_per_s") and r.get("rows_per_s"):
+            print(f"  {r['dataset']:>4} {r['stage']:<15} rows/s x{r['rows_per_s'] / old['rows_per_s']:.2f}  "
+                  f"RSS x{r['peak_rss_mb'] / old['peak_rss_mb']:.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of every stage on synthetic flows")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help=f"Comma separated dataset sizes ({', '.join(SIZES)}) or row counts")
+    parser.add_argument("--stages", default=None, help="Comma separated subset of stages")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--compare", default=None, metavar="JSON", help="Earlier results to compare against")
+    parser.add_argument("--workdir", default=None, help="Where the scratch datasets are created")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch datasets")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    stages = args.stages.split(",") if args.stages else None
+    results = []
+    for label in args.sizes.split(","):
+        n_rows = SIZES[label] if label in SIZES else int(label)
+        results += benchmark_size(label, n_rows, args.workdir, args.keep, stages)
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": SEED,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n Results saved to: {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
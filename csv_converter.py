@@ -1,7 +1,9 @@
 # rw_to_csv_converter.py
 
 import os
-import subprocess
+import shlex
+import argparse
+from flow_conversion import DEFAULT_CONVERTER, NUM_WORKERS, run_parallel, stream_converter_to_file
 
 # === CONFIG ===
 INPUT_FOLDER = "final_dataset_01"        # Folder where your .rw files are
@@ -10,29 +12,31 @@ FIELDS = "sip,dip,sport,dport,proto,packets,bytes,stime,etime"  # Fields to extr
 
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
-def convert_rw_to_csv(rw_file, csv_file):
-    try:
-        with open(csv_file, "w") as f:
-            subprocess.run([
-                "rwcut",
-                "--fields", FIELDS,
-                "--delimited",
-                "--no-title",
-                rw_file
-            ], stdout=f, check=True)
-        print(f" Converted: {rw_file} -> {csv_file}")
-    except subprocess.CalledProcessError:
-        print(f" Error converting: {rw_file}")
-
-def batch_convert(input_folder, output_folder):
-    files = [f for f in os.listdir(input_folder) if f.endswith(".rw")]
+def convert_rw_to_csv(rw_file, csv_file, converter=DEFAULT_CONVERTER):
+    # Comma delimited, matching how port_detection.py reads attack_data/*.csv
+    stream_converter_to_file(rw_file, csv_file, FIELDS, converter, delimiter=",")
+    print(f" Converted: {rw_file} -> {csv_file}")
+    return csv_file
 
+def batch_convert(input_folder, output_folder, converter=DEFAULT_CONVERTER, workers=NUM_WORKERS):
+    files = sorted(f for f in os.listdir(input_folder) if f.endswith(".rw"))
+
+    jobs = []
     for rw_file in files:
         input_path = os.path.join(input_folder, rw_file)
         output_path = os.path.join(output_folder, rw_file.replace(".rw", ".csv"))
-        convert_rw_to_csv(input_path, output_path)
+        jobs.append((input_path, output_path, converter))
+    return run_parallel(convert_rw_to_csv, jobs, max_workers=workers)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert .rw flow files to CSV in parallel")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Converters running at once")
+    parser.add_argument("--converter", default=shlex.join(DEFAULT_CONVERTER),
+                        help="Converter command template with {input}, {fields} and {delimiter} placeholders")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     print(" Converting all .rw files to CSV...")
-    batch_convert(INPUT_FOLDER, OUTPUT_FOLDER)
+    batch_convert(INPUT_FOLDER, OUTPUT_FOLDER, shlex.split(args.converter), args.workers)
     print("\n All conversions complete!")
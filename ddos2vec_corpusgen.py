@@ -1,16 +1,54 @@
 # ddos2vec_corpus_gen.py
-import pandas as pd
 import os
+import numpy as np
+from ddos2vec_features import flow_sentences, _pack_flow_keys, SENTENCE_COLS
+from feature_store import sync_store
+
+# === CONFIG ===
+CHUNK_SIZE = 500_000  # Rows formatted and written per step; bounds memory use
+
+
+def _chunk_lines(df):
+    # One "proto_sport_dport" line per flow. Integer columns format each distinct flow word once.
+    cols = [df[c].to_numpy() for c in SENTENCE_COLS]
+    if not all(c.dtype.kind in "iu" for c in cols):
+        return "\n".join(flow_sentences(df).tolist())
+
+    _, first, inverse = np.unique(_pack_flow_keys(*cols), return_index=True, return_inverse=True)
+    words = flow_sentences(df.iloc[first]).to_numpy(dtype=object)
+    return "\n".join(words[inverse].tolist())
+
+
+def write_corpus(store, output_corpus_path, chunk_size=CHUNK_SIZE):
+    """
+    Writes the flows of a feature store as a gensim LineSentence file in one streaming pass.
+
+    Only one chunk of flows is held in memory at a time. The file is written under a
+    temporary name and renamed when complete, so Word2Vec(corpus_file=...) never sees a
+    partial corpus.
+
+    Parameters:
+        store (FeatureStore): Source flows.
+        output_corpus_path (str): Corpus file to write.
+        chunk_size (int): Rows per chunk.
+
+    Returns:
+        int: Number of sentences (one word each) written.
+    """
+    n_lines = 0
+    tmp_path = output_corpus_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for df in store.iter_chunks(SENTENCE_COLS, chunk_size=chunk_size):
+            if len(df):
+                f.write(_chunk_lines(df))
+                f.write("\n")
+                n_lines += len(df)
+    os.replace(tmp_path, output_corpus_path)
+    return n_lines
+
 
 def generate_corpus(input_csv_folder, output_corpus_path="ddos2vec_corpus.txt"):
-    all_rows = []
-    for file in os.listdir(input_csv_folder):
-        if file.endswith(".csv"):
-            df = pd.read_csv(os.path.join(input_csv_folder, file))
-            df["sentence"] = df["proto"].astype(str) + "_" + df["sport"].astype(str) + "_" + df["dport"].astype(str)
-            all_rows.extend(df["sentence"].tolist())
-
-    with open(output_corpus_path, "w") as f:
-        for row in all_rows:
-            f.write(row + "\n")
-    print(f" DDoS2Vec corpus saved to: {output_corpus_path}")
+    store = sync_store(input_csv_folder)
+    n_lines = write_corpus(store, output_corpus_path)
+    print(f" DDoS2Vec corpus saved to: {output_corpus_path} ({n_lines} sentences)")
+    return n_lines
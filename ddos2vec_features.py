@@ -0,0 +1,77 @@
+# ddos2vec_features.py
+import numpy as np
+import pandas as pd
+
+# Columns that make up a DDoS2Vec flow "word": proto_sport_dport
+SENTENCE_COLS = ["proto", "sport", "dport"]
+
+
+def flow_sentences(df):
+    return df["proto"].astype(str) + "_" + df["sport"].astype(str) + "_" + df["dport"].astype(str)
+
+
+def _pack_flow_keys(proto, sport, dport):
+    # One int64 per (proto, sport, dport) triple: 8 bits proto, 16 bits per port
+    return (proto.astype(np.int64) << 32) | (sport.astype(np.int64) << 16) | dport.astype(np.int64)
+
+
+class FlowEmbedder:
+    """
+    Batch featurizer that maps whole chunks of flows to DDoS2Vec embeddings.
+
+    Each (proto, sport, dport) triple is looked up in the Word2Vec vocabulary in one
+    vectorized pass and the matching rows of `wv.vectors` are gathered with a single
+    fancy index. Flows whose word is not in the vocabulary get a zero vector.
+
+    Parameters:
+        w2v_model (Word2Vec): Trained DDoS2Vec embedding model.
+    """
+
+    def __init__(self, w2v_model):
+        wv = w2v_model.wv
+        self.vectors = wv.vectors
+        self.vector_size = w2v_model.vector_size
+        self.vocab = pd.Index(wv.index_to_key)
+
+        # Integer fast path: pack every "proto_sport_dport" token into one int64 key
+        keys, rows = [], []
+        for row, word in enumerate(wv.index_to_key):
+            parts = str(word).split("_")
+            if len(parts) != 3 or not all(p.isdigit() for p in parts):
+                continue
+            proto, sport, dport = (int(p) for p in parts)
+            if proto <= 0xFF and sport <= 0xFFFF and dport <= 0xFFFF:
+                keys.append((proto << 32) | (sport << 16) | dport)
+                rows.append(row)
+        self.key_index = pd.Index(np.array(keys, dtype=np.int64))
+        self.key_rows = np.array(rows, dtype=np.int64)
+
+    def lookup(self, df):
+        """
+        Returns the vocabulary row of every flow in `df`, or -1 for out-of-vocabulary flows.
+        """
+        cols = [df[c].to_numpy() for c in SENTENCE_COLS]
+        if all(c.dtype.kind in "iu" for c in cols) and all(
+            len(c) == 0 or (c.min() >= 0 and c.max() <= limit)
+            for c, limit in zip(cols, (0xFF, 0xFFFF, 0xFFFF))
+        ):
+            pos = self.key_index.get_indexer(_pack_flow_keys(*cols))
+            if len(self.key_rows) == 0:
+                return pos
+            return np.where(pos >= 0, self.key_rows[pos], -1)
+
+        # Non-integer columns (NaNs, strings): fall back to the exact string tokens
+        return self.vocab.get_indexer(flow_sentences(df))
+
+    def transform(self, df):
+        """
+        Embeds every flow in `df`.
+
+        Returns:
+            np.ndarray: float32 array of shape (len(df), vector_size).
+        """
+        idx = self.lookup(df)
+        oov = idx < 0
+        X = self.vectors.take(np.where(oov, 0, idx), axis=0).astype(np.float32, copy=False)
+        X[oov] = 0.0
+        return X
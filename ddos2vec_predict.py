@@ -1,33 +1,84 @@
 # ddos2vec_predict.py
-import pandas as pd
 import numpy as np
 from gensim.models import Word2Vec
-from keras.models import load_model
 import joblib
+from ddos2vec_features import FlowEmbedder, SENTENCE_COLS
+from flow_loader import CHUNK_SIZE, _iter_raw, coerce_flows
+from instrumentation import stage
 
-def sentence_to_vec(sentence, w2v_model):
-    words = sentence.split()
-    vecs = [w2v_model.wv[w] for w in words if w in w2v_model.wv]
-    if not vecs:
-        return np.zeros(w2v_model.vector_size)
-    return np.mean(vecs, axis=0)
+# === CONFIG ===
+EMBEDDING_PATH = "ddos2vec_embedding.model"
+LSTM_PATH = "ddos2vec_lstm.h5"
+LABEL_MAP_PATH = "ddos2vec_label_map.pkl"
+ARTIFACT_PATHS = [EMBEDDING_PATH, LSTM_PATH, LABEL_MAP_PATH]
+OUTPUT_PATH = "ddos2vec_predictions.csv"
 
-def predict_ddos2vec(input_csv):
-    df = pd.read_csv(input_csv)
-    df["sentence"] = df["proto"].astype(str) + "_" + df["sport"].astype(str) + "_" + df["dport"].astype(str)
 
-    w2v = Word2Vec.load("ddos2vec_embedding.model")
-    model = load_model("ddos2vec_lstm.h5")
-    label_map = joblib.load("ddos2vec_label_map.pkl")
+class DDoS2VecModels:
+    """
+    The loaded DDoS2Vec artifacts: embedding, LSTM classifier and class names.
+    """
+
+    def __init__(self, embedder, model, class_names):
+        self.embedder = embedder
+        self.model = model
+        self.class_names = class_names
+
+
+def load_ddos2vec(embedding_path=EMBEDDING_PATH, lstm_path=LSTM_PATH, label_map_path=LABEL_MAP_PATH):
+    from keras.models import load_model
+
+    w2v = Word2Vec.load(embedding_path)
+    model = load_model(lstm_path)
+    label_map = joblib.load(label_map_path)
     rev_label_map = {v: k for k, v in label_map.items()}
+    class_names = np.array([rev_label_map[i] for i in range(max(rev_label_map) + 1)], dtype=object)
+    return DDoS2VecModels(FlowEmbedder(w2v), model, class_names)
+
+
+def score_ddos2vec(models, df):
+    """
+    Predicted label names for a DataFrame with proto, sport and dport columns.
+    """
+    if len(df) == 0:
+        return np.empty(0, dtype=object)
+    with stage("embed", rows=len(df)):
+        X = models.embedder.transform(df)
+        X = X.reshape((X.shape[0], 1, X.shape[1]))
+
+    with stage("predict", rows=len(X)):
+        predictions = models.model.predict(X, verbose=0)
+    return models.class_names[np.argmax(predictions, axis=1)]
+
+
+def score_ddos2vec_aligned(models, df):
+    """
+    Like score_ddos2vec, for raw (unparsed) flows: returns one label per row of `df`, None
+    where proto, sport or dport is missing or invalid, and the positions of those rows.
+    """
+    flows, invalid = coerce_flows(df[SENTENCE_COLS], return_invalid=True)
+    labels = np.full(len(df), None, dtype=object)
+    valid = np.ones(len(df), dtype=bool)
+    valid[invalid] = False
+    labels[valid] = score_ddos2vec(models, flows)
+    return labels, invalid
 
-    X = np.array([sentence_to_vec(s, w2v) for s in df["sentence"]])
-    X = X.reshape((X.shape[0], 1, X.shape[1]))
 
-    predictions = model.predict(X)
-    predicted_indices = np.argmax(predictions, axis=1)
-    predicted_labels = [rev_label_map[i] for i in predicted_indices]
+def predict_ddos2vec(input_csv, models=None, chunk_size=CHUNK_SIZE):
+    # Pass `models` (from load_ddos2vec) to score several files without reloading
+    if models is None:
+        models = load_ddos2vec()
 
-    df["predicted_label"] = predicted_labels
-    df.to_csv("ddos2vec_predictions.csv", index=False)
-    print("Predictions saved to ddos2vec_predictions.csv")
+    # Every input row is written back as read; rows that cannot be scored get an empty label.
+    # The flow loader's raw chunks are scored through its schema (score_ddos2vec_aligned),
+    # as flow_partition does, since read_flows itself drops the rows it cannot type.
+    invalid, offset = [], 0
+    for i, df in enumerate(_iter_raw(input_csv, None, None, chunk_size, "error")):
+        df["predicted_label"], chunk_invalid = score_ddos2vec_aligned(models, df)
+        invalid.extend((chunk_invalid + offset).tolist())
+        offset += len(df)
+        df.to_csv(OUTPUT_PATH, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    if invalid:
+        print(f" Warning: {len(invalid)} rows with invalid proto/sport/dport left unlabeled "
+              f"(first rows: {invalid[:10]})")
+    print(f"Predictions saved to {OUTPUT_PATH}")
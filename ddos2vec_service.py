@@ -0,0 +1,302 @@
+# ddos2vec_service.py
+"""
+Resident DDoS2Vec scoring service.
+
+POST /predict with either a CSV body (header row with at least proto, sport, dport) or JSON
+{"flows": [{"proto": 6, "sport": 40312, "dport": 6007}, ...]}. The response is
+{"labels": [...], "model_version": n}, one label per submitted flow in request order. A
+request with a missing or invalid proto / sport / dport in any row is answered with a 400
+that names those rows, so labels never shift against the flows they belong to.
+
+Concurrent requests are queued and coalesced into one batched predict of up to
+MAX_BATCH_ROWS flows. A batch is scored once it is full or once its oldest request has waited
+MAX_WAIT_MS. The artifacts are polled for changes and reloaded in the background. A
+batch always runs against one consistent set of models, and the new set is swapped in between
+batches, so no request is dropped. GET /metrics reports queue depth, batch-size and latency
+histograms, and the loaded model version.
+"""
+import io
+import os
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import Future
+import instrumentation
+from instrumentation import stage
+from flow_loader import coerce_flows
+from ddos2vec_predict import ARTIFACT_PATHS, load_ddos2vec, score_ddos2vec
+
+# === CONFIG ===
+HOST = "127.0.0.1"
+PORT = 8500
+MAX_BATCH_ROWS = 8192   # Flows per batched predict
+MAX_WAIT_MS = 10.0      # Longest a request waits for other requests to share its batch
+RELOAD_INTERVAL = 5.0   # Seconds between artifact mtime checks
+REQUEST_TIMEOUT = 60.0
+MAX_REPORTED_ROWS = 20  # Invalid row numbers listed in a 400 response
+SENTENCE_COLS = ["proto", "sport", "dport"]
+BATCH_SIZE_BUCKETS = [1, 8, 64, 256, 1024, 4096, 16384, 65536]
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; counts[i] is the number of values <= bounds[i], the last
+    entry counts values above every bound.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[int(np.searchsorted(self.bounds, value))] += 1
+        self.total += 1
+        self.sum += value
+
+    def to_dict(self):
+        buckets = {f"le_{b}": c for b, c in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {"buckets": buckets, "count": self.total, "sum": self.sum}
+
+
+class ModelHolder:
+    """
+    Holds the current models and reloads them when any artifact file changes.
+
+    A reload happens only after the artifact mtimes have stayed the same for one full poll
+    interval, so a file that is still being written is not picked up. If the new artifacts
+    fail to load, the old models stay in service.
+    """
+
+    def __init__(self, loader=load_ddos2vec, paths=ARTIFACT_PATHS):
+        self.loader = loader
+        self.paths = paths
+        with stage("load_model"):
+            self.models = loader()
+        self.version = 1
+        self.loaded_at = time.time()
+        self.reload_errors = 0
+        self._loaded_mtimes = self._mtimes()
+        self._seen_mtimes = self._loaded_mtimes
+
+    def _mtimes(self):
+        return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in self.paths)
+
+    def check(self):
+        mtimes = self._mtimes()
+        if mtimes == self._loaded_mtimes or None in mtimes:
+            self._seen_mtimes = mtimes
+            return False
+        if mtimes != self._seen_mtimes:  # still changing; wait for it to settle
+            self._seen_mtimes = mtimes
+            return False
+
+        try:
+            with stage("load_model"):
+                models = self.loader()
+        except Exception as e:
+            self.reload_errors += 1
+            self._loaded_mtimes = mtimes  # do not retry the same broken files every poll
+            print(f" Model reload failed, keeping version {self.version}: {e}")
+            return False
+
+        self.models = models  # single reference swap; batches in flight keep the old models
+        self.version += 1
+        self.loaded_at = time.time()
+        self._loaded_mtimes = mtimes
+        print(f" Reloaded DDoS2Vec models (version {self.version})")
+        return True
+
+    def watch(self, stop_event, interval=RELOAD_INTERVAL):
+        while not stop_event.wait(interval):
+            self.check()
+            instrumentation.flush()  # the service never ends, so its metrics report is rewritten here
+
+
+class BatchScorer:
+    """
+    Coalesces concurrent scoring requests into batched predicts on one worker thread.
+
+    Parameters:
+        holder (ModelHolder): Source of the current models.
+        max_batch_rows (int): Flow limit per batched predict (a larger single request is scored alone).
+        max_wait_ms (float): Latency budget spent waiting for more requests.
+    """
+
+    def __init__(self, holder, max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS):
+        self.holder = holder
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.requests_per_batch = Histogram(BATCH_SIZE_BUCKETS)
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.flows_scored = 0
+        self.errors = 0
+        self._carry = None
+
+    def submit(self, df):
+        future = Future()
+        self.queue.put((time.perf_counter(), df, future))
+        return future
+
+    def _next_batch(self):
+        first = self._carry
+        self._carry = None
+        if first is None:
+            try:
+                first = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                return []
+
+        batch, rows = [first], len(first[1])
+        deadline = first[0] + self.max_wait
+        while rows < self.max_batch_rows:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if rows + len(item[1]) > self.max_batch_rows:
+                self._carry = item  # starts the next batch
+                break
+            batch.append(item)
+            rows += len(item[1])
+        return batch
+
+    def _score(self, batch):
+        models, version = self.holder.models, self.holder.version
+        frames = [df for _, df, _ in batch]
+        try:
+            labels = score_ddos2vec(models, pd.concat(frames, ignore_index=True))
+        except Exception as e:
+            self.errors += 1
+            instrumentation.count("batch_errors")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        done = time.perf_counter()
+        start = 0
+        for received, df, future in batch:
+            future.set_result((labels[start:start + len(df)], version))
+            start += len(df)
+            self.latency_ms.observe((done - received) * 1000)
+        self.batch_sizes.observe(start)
+        self.requests_per_batch.observe(len(batch))
+        self.flows_scored += start
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._score(batch)
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue.qsize() + (self._carry is not None),
+            "flows_scored": self.flows_scored,
+            "errors": self.errors,
+            "batch_size": self.batch_sizes.to_dict(),
+            "requests_per_batch": self.requests_per_batch.to_dict(),
+            "latency_ms": self.latency_ms.to_dict(),
+            "max_batch_rows": self.max_batch_rows,
+            "max_wait_ms": self.max_wait * 1000,
+            "model_version": self.holder.version,
+            "model_loaded_at": self.holder.loaded_at,
+            "model_reload_errors": self.holder.reload_errors,
+        }
+
+
+def parse_flows(req):
+    """
+    Parses the flows of a /predict request.
+
+    Labels are returned by position, so a request with any unusable row is rejected as a
+    whole (ValueError naming the rows, 0-based) rather than scored with the row left out.
+    """
+    if req.is_json:
+        df = pd.DataFrame(req.get_json()["flows"])
+    else:
+        df = pd.read_csv(io.BytesIO(req.get_data()), dtype=str)
+    missing = [c for c in SENTENCE_COLS if c not in df]
+    if missing:
+        raise ValueError(f"missing columns {missing}")
+    flows, invalid = coerce_flows(df[SENTENCE_COLS], return_invalid=True)
+    if len(invalid):
+        shown = ", ".join(str(i) for i in invalid[:MAX_REPORTED_ROWS])
+        more = f" and {len(invalid) - MAX_REPORTED_ROWS} more" if len(invalid) > MAX_REPORTED_ROWS else ""
+        raise ValueError(f"invalid proto/sport/dport in {len(invalid)} rows: {shown}{more}")
+    return flows
+
+
+def create_app(scorer):
+    from flask import Flask, Response, jsonify, request
+
+    app = Flask(__name__)
+
+    @app.route("/predict", methods=["POST"])
+    def predict():
+        try:
+            with stage("parse") as s:
+                df = parse_flows(request)
+                s.add_rows(len(df))
+        except Exception as e:
+            instrumentation.count("bad_requests")
+            return jsonify({"error": f"bad request: {e}"}), 400
+        labels, version = scorer.submit(df).result(timeout=REQUEST_TIMEOUT)
+        return jsonify({"labels": labels.tolist(), "model_version": version})
+
+    @app.route("/metrics")
+    def metrics():
+        return jsonify(scorer.metrics())
+
+    @app.route("/health")
+    def health():
+        return Response("ok\n", mimetype="text/plain")
+
+    return app
+
+
+def start_service(max_batch_rows=MAX_BATCH_ROWS, max_wait_ms=MAX_WAIT_MS, reload_interval=RELOAD_INTERVAL,
+                  loader=load_ddos2vec):
+    """
+    Loads the models and starts the batching and reload threads.
+
+    Returns:
+        tuple: (Flask app, BatchScorer)
+    """
+    holder = ModelHolder(loader)
+    scorer = BatchScorer(holder, max_batch_rows, max_wait_ms)
+    threading.Thread(target=scorer.run, daemon=True).start()
+    threading.Thread(target=holder.watch, args=(scorer.stop_event, reload_interval), daemon=True).start()
+    return create_app(scorer), scorer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resident DDoS2Vec scoring service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--max-batch-rows", type=int, default=MAX_BATCH_ROWS,
+                        help="Flows per batched predict (throughput)")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="Max time a request waits to be coalesced (latency)")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL)
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure_from_args(args, "ddos2vec_service")
+    app, scorer = start_service(args.max_batch_rows, args.max_wait_ms, args.reload_interval)
+    print(f" DDoS2Vec service on http://{args.host}:{args.port} (max batch {args.max_batch_rows}, "
+          f"max wait {args.max_wait_ms} ms)")
+    app.run(host=args.host, port=args.port, threaded=True)
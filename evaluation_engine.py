@@ -0,0 +1,91 @@
+# evaluation_engine.py
+"""
+Read-once evaluation of several models over the feature store.
+
+Every chunk is loaded once with the union of the columns the models read, its model inputs
+are built once per distinct transform (ChunkInputs: the RF / NB feature matrix, the DDoS2Vec
+embedding) and the same buffers are scored by every model, each with its own confusion
+matrix. Adding a model (e.g. the Keras LSTM on the DDoS2Vec embedding) adds a predict() per
+chunk, not another pass over the data.
+
+    engine = EvaluationEngine(store, [registry.get(key) for key in keys])
+    for model, cm in engine.run():
+        ...
+"""
+import instrumentation
+from instrumentation import stage, iter_stage
+from streaming_metrics import ConfusionMatrix
+from feature_store import LABEL_COLUMN
+from model_registry import ChunkInputs
+
+# === CONFIG ===
+CHUNK_SIZE = 500_000  # Rows per chunk; memory stays constant in the number of flows
+
+
+class ModelEvaluation:
+    """
+    Running confusion matrix of one model over the chunks it is fed.
+
+    Rows whose label the model was not trained on cannot be scored and are skipped.
+    """
+
+    def __init__(self, model, store):
+        self.model = model
+        self.cm = ConfusionMatrix(len(model.class_names))
+        self.store_to_label_map = store.label_codes(model.label_map())
+
+    def update(self, df, inputs):
+        # Same feature transform (and proto codes / embedding) the model was trained with
+        df, X = self.model.prepare(df, inputs)
+        y_true = self.store_to_label_map[df[LABEL_COLUMN].cat.codes.to_numpy()]
+        known = y_true >= 0
+        if not known.all():
+            X, y_true = X[known], y_true[known]
+            instrumentation.count("unknown_label_rows", int((~known).sum()))
+
+        if len(y_true):
+            y_pred = self.model.predict(X)
+            with stage("aggregate", rows=len(y_true)):
+                self.cm.update(y_true, y_pred)
+
+
+class EvaluationEngine:
+    """
+    Streams the feature store once and scores every chunk with all registered models.
+
+    Parameters:
+        store: FeatureStore to evaluate on.
+        models (list): ScoringModels, in report order.
+        chunk_size (int): Rows per chunk.
+    """
+
+    def __init__(self, store, models=(), chunk_size=CHUNK_SIZE):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.evaluations = []
+        for model in models:
+            self.add(model)
+
+    def add(self, model):
+        self.evaluations.append(ModelEvaluation(model, self.store))
+        return self
+
+    def columns(self):
+        # Union of the models' input columns, in first-use order, plus the label
+        columns = []
+        for evaluation in self.evaluations:
+            columns += [col for col in evaluation.model.input_columns if col not in columns]
+        return columns + [LABEL_COLUMN]
+
+    def run(self):
+        """
+        Returns:
+            list: (ScoringModel, ConfusionMatrix) pairs, in registration order.
+        """
+        if self.evaluations:
+            chunks = self.store.iter_chunks(self.columns(), chunk_size=self.chunk_size)
+            for df in iter_stage("load", chunks):
+                inputs = ChunkInputs(df)
+                for evaluation in self.evaluations:
+                    evaluation.update(df, inputs)
+        return [(evaluation.model, evaluation.cm) for evaluation in self.evaluations]
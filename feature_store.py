@@ -0,0 +1,205 @@
+# feature_store.py
+import os
+import json
+import shutil
+import collections
+import hashlib
+import numpy as np
+import pandas as pd
+from flow_loader import read_flows, FLOW_SCHEMA
+
+# === CONFIG ===
+TRAINING_DATA_FOLDER = "training_data"  # Labeled CSVs from process_traning.py
+STORE_FOLDER = "feature_store"          # One sub-folder of per-column .npy files per CSV
+MANIFEST_FILE = "manifest.json"
+SOURCE_EXTENSIONS = (".csv", ".csv.gz", ".parquet")  # Output formats of process_traning.py
+
+# Fixed on-disk dtypes; label is stored as uint8 codes into manifest["labels"]
+STORE_SCHEMA = {col: FLOW_SCHEMA[col] for col in ["sport", "dport", "proto", "packets", "bytes"]}
+LABEL_COLUMN = "label"
+STORE_COLUMNS = list(STORE_SCHEMA) + [LABEL_COLUMN]
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(store_dir):
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"schema": {c: np.dtype(t).name for c, t in STORE_SCHEMA.items()}, "labels": [], "files": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(store_dir, manifest):
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)  # readers never see a half-written manifest
+
+
+def ingest_file(csv_path, out_dir, labels):
+    """
+    Converts one labeled CSV into typed per-column .npy files.
+
+    Parameters:
+        csv_path (str): Labeled CSV written by process_traning.py.
+        out_dir (str): Folder that receives <column>.npy.
+        labels (list): Global label categories; new labels are appended in place.
+
+    Returns:
+        int: Number of rows stored.
+    """
+    # Typed read of the store columns; rows with missing or invalid values are dropped
+    df = read_flows(csv_path, STORE_COLUMNS)
+
+    os.makedirs(out_dir, exist_ok=True)
+    for col, dtype in STORE_SCHEMA.items():
+        np.save(os.path.join(out_dir, f"{col}.npy"), df[col].to_numpy().astype(dtype))
+
+    for label in pd.unique(df[LABEL_COLUMN].astype(str)):
+        if label not in labels:
+            labels.append(label)
+    codes = pd.Index(labels).get_indexer(df[LABEL_COLUMN].astype(str)).astype(np.uint8)
+    np.save(os.path.join(out_dir, f"{LABEL_COLUMN}.npy"), codes)
+
+    return len(df)
+
+
+def sync_store(csv_folder=TRAINING_DATA_FOLDER, store_dir=STORE_FOLDER):
+    """
+    Brings the store up to date with `csv_folder`, re-ingesting only new or changed CSVs.
+
+    A CSV whose size and mtime match the manifest is skipped without reading it; otherwise
+    its sha256 is compared with the recorded hash and it is only re-parsed when that differs.
+
+    Returns:
+        FeatureStore: The up-to-date store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_manifest(store_dir)
+    files = manifest["files"]
+    sources = sorted(f for f in os.listdir(csv_folder) if f.endswith(SOURCE_EXTENSIONS))
+
+    # Stores written before entries were keyed on the full name (x.csv and x.csv.gz both
+    # in x/) may hold one file's columns under another's entry: re-ingest those
+    old_dirs = collections.Counter(entry["dir"] for entry in files.values())
+
+    ingested = 0
+    for name in sources:
+        path = os.path.join(csv_folder, name)
+        stat = os.stat(path)
+        entry = files.get(name)
+        if entry and old_dirs[entry["dir"]] > 1:
+            entry = None
+
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            continue
+
+        sha256 = file_sha256(path)
+        if entry and entry["sha256"] == sha256:
+            entry["mtime_ns"] = stat.st_mtime_ns
+            continue
+
+        entry_dir = name  # the full file name, so x.csv, x.csv.gz and x.parquet never share a folder
+        rows = ingest_file(path, os.path.join(store_dir, entry_dir), manifest["labels"])
+        files[name] = {
+            "dir": entry_dir,
+            "sha256": sha256,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "rows": rows,
+        }
+        ingested += 1
+
+    # Drop entries whose source CSV is gone, and folders no entry uses any more
+    for name in sorted(set(files) - set(sources)):
+        del files[name]
+    for entry_dir in sorted(set(old_dirs) - {entry["dir"] for entry in files.values()}):
+        shutil.rmtree(os.path.join(store_dir, entry_dir), ignore_errors=True)
+
+    save_manifest(store_dir, manifest)
+    if ingested:
+        print(f" Feature store: ingested {ingested} changed file(s) into {store_dir}/")
+    return FeatureStore(store_dir)
+
+
+class FeatureStore:
+    """
+    Read access to the columnar training data store.
+
+    Columns are opened as read-only memory maps, so nothing is parsed and only the pages
+    that are actually touched are read from disk.
+
+    Parameters:
+        store_dir (str): Folder created by sync_store().
+    """
+
+    def __init__(self, store_dir=STORE_FOLDER):
+        self.store_dir = store_dir
+        manifest = load_manifest(store_dir)
+        self.labels = manifest["labels"]
+        self.files = [manifest["files"][name] for name in sorted(manifest["files"])]
+
+    @property
+    def n_rows(self):
+        return sum(entry["rows"] for entry in self.files)
+
+    def column(self, entry, name):
+        return np.load(os.path.join(self.store_dir, entry["dir"], f"{name}.npy"), mmap_mode="r")
+
+    def label_codes(self, label_map, missing=-1):
+        # Lookup table from store label codes to the codes of an existing label map
+        return np.array([label_map.get(label, missing) for label in self.labels], dtype=np.int64)
+
+    def unique_values(self, name):
+        values = [np.unique(self.column(entry, name)) for entry in self.files]
+        return np.unique(np.concatenate(values)) if values else np.empty(0, dtype=STORE_SCHEMA[name])
+
+    def present_labels(self):
+        codes = np.zeros(len(self.labels), dtype=bool)
+        for entry in self.files:
+            codes[np.unique(self.column(entry, LABEL_COLUMN))] = True
+        return [label for label, present in zip(self.labels, codes) if present]
+
+    def _frame(self, entry, columns, start=None, stop=None):
+        data = {}
+        for col in columns:
+            values = self.column(entry, col)[start:stop]
+            if col == LABEL_COLUMN:
+                values = pd.Categorical.from_codes(values, categories=self.labels)
+            data[col] = values
+        return pd.DataFrame(data)
+
+    def iter_files(self, columns=STORE_COLUMNS):
+        for entry in self.files:
+            yield entry, self._frame(entry, columns)
+
+    def iter_chunks(self, columns=STORE_COLUMNS, chunk_size=500_000, files=None):
+        for entry in self.files if files is None else files:
+            for start in range(0, entry["rows"], chunk_size):
+                yield self._frame(entry, columns, start, start + chunk_size)
+
+    def load(self, columns=STORE_COLUMNS):
+        """
+        Loads the given columns of every file into one DataFrame with the compact store dtypes.
+        """
+        data = {}
+        for col in columns:
+            parts = [self.column(entry, col) for entry in self.files]
+            values = np.concatenate(parts) if parts else np.empty(0, dtype=STORE_SCHEMA.get(col, np.uint8))
+            if col == LABEL_COLUMN:
+                values = pd.Categorical.from_codes(values, categories=self.labels)
+            data[col] = values
+        return pd.DataFrame(data)
+
+
+if __name__ == "__main__":
+    store = sync_store()
+    print(f" Feature store ready: {len(store.files)} files, {store.n_rows} rows, labels {store.labels}")
@@ -0,0 +1,226 @@
+# flow_conversion.py
+import io
+import os
+import gzip
+import shutil
+import subprocess
+import pandas as pd
+import instrumentation
+from silk_io import is_supported
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# === CONFIG ===
+# Converter command template; {input}, {fields} and {delimiter} are filled in per file.
+# Any program that prints rwcut-style delimited text without a title line can be used instead.
+DEFAULT_CONVERTER = ["rwcut", "--fields", "{fields}", "--no-title", "--delimited={delimiter}", "{input}"]
+# Rewrites a SiLK file silk_io cannot decode as uncompressed FT_RWGENERIC records, which it can
+SILK_NORMALIZER = ["rwcat", "--compression-method=none", "--ipv4-output", "--output-path={output}", "{input}"]
+CHUNK_SIZE = 100_000  # Rows parsed per chunk from the converter's stdout
+NUM_WORKERS = os.cpu_count()
+
+
+def converter_command(input_path, fields, delimiter=",", converter=DEFAULT_CONVERTER):
+    return [arg.format(input=input_path, fields=fields, delimiter=delimiter) for arg in converter]
+
+
+class _ConverterProcess:
+    def __init__(self, input_path, fields, delimiter, converter):
+        self.cmd = converter_command(input_path, fields, delimiter, converter)
+        self.proc = subprocess.Popen(self.cmd, stdout=subprocess.PIPE)
+
+    def __enter__(self):
+        return self.proc.stdout
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        returncode = self.proc.wait()
+        if exc_type is None and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, self.cmd)
+
+
+def iter_converter_chunks(input_path, fields, converter=DEFAULT_CONVERTER, delimiter=",", chunk_size=CHUNK_SIZE):
+    """
+    Runs the converter on one flow file and parses its stdout as it is produced.
+
+    No temporary text file is written and at most one chunk of rows is held in memory.
+
+    Parameters:
+        input_path (str): Flow file to convert.
+        fields (str): Comma separated field list, also used as the column names.
+        converter (list): Command template, see DEFAULT_CONVERTER.
+        delimiter (str): Field delimiter the converter emits.
+        chunk_size (int): Rows per yielded DataFrame.
+    """
+    with _ConverterProcess(input_path, fields, delimiter, converter) as stdout:
+        try:
+            reader = pd.read_csv(stdout, names=fields.split(","), sep=delimiter, chunksize=chunk_size)
+            yield from reader
+        except pd.errors.EmptyDataError:
+            return
+
+
+def stream_converter_to_file(input_path, output_path, fields, converter=DEFAULT_CONVERTER, delimiter=",",
+                             block_size=1 << 20):
+    """
+    Copies the converter's stdout to `output_path` in fixed-size blocks, without parsing it.
+    """
+    with _ConverterProcess(input_path, fields, delimiter, converter) as stdout:
+        with open(output_path, "wb") as f:
+            shutil.copyfileobj(stdout, f, block_size)
+
+
+def readable_silk_file(input_path, work_dir, normalizer=SILK_NORMALIZER):
+    """
+    Returns `input_path` if silk_io can read it, otherwise a copy in `work_dir` rewritten by
+    the SiLK tools (other compression methods, record layouts or header versions).
+    """
+    if is_supported(input_path):
+        return input_path
+    os.makedirs(work_dir, exist_ok=True)
+    output_path = os.path.join(work_dir, os.path.basename(input_path) + ".generic.rw")
+    print(f" {input_path} is not readable natively, converting it with {normalizer[0]}")
+    cmd = [arg.format(input=input_path, output=output_path) for arg in normalizer]
+    if os.path.exists(output_path):
+        os.remove(output_path)  # rwcat refuses to overwrite
+    subprocess.run(cmd, check=True)
+    return output_path
+
+
+OUTPUT_FORMATS = {"csv": ".csv", "csv.gz": ".csv.gz", "parquet": ".parquet"}
+
+
+class _ParquetSink:
+    # One row group per chunk; pyarrow is only needed when this format is requested
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._pq = pq
+        self.path = path
+        self.writer = None
+
+    def write(self, df, header):
+        table = self._pa.Table.from_pandas(df, preserve_index=False,
+                                           schema=None if self.writer is None else self.writer.schema)
+        if self.writer is None:
+            self.writer = self._pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _CsvSink:
+    def __init__(self, path, compress=False):
+        if compress:
+            # mtime=0 keeps the gzip header, and so the file, identical across reruns
+            self.file = io.TextIOWrapper(gzip.GzipFile(path, "wb", mtime=0), newline="")
+        else:
+            self.file = open(path, "w", newline="")
+
+    def write(self, df, header):
+        df.to_csv(self.file, index=False, header=header)
+
+    def close(self):
+        self.file.close()
+
+
+def _open_sink(path, fmt):
+    if fmt == "parquet":
+        return _ParquetSink(path)
+    return _CsvSink(path, compress=fmt == "csv.gz")
+
+
+class PartWriter:
+    """
+    Writes a stream of DataFrame chunks to numbered parts of at most `max_rows` rows.
+
+    Parts are named <out_base>_<part_num>_<i><ext>; if the whole stream fits in one part it is
+    renamed to <out_base>_<part_num><ext> on close, so names only depend on the input and
+    reruns produce identical files. Only the chunk being written is held in memory.
+
+    Parameters:
+        out_base (str): Path prefix of the parts.
+        part_num (int): Input file number.
+        max_rows (int): Row limit per part.
+        fmt (str): One of OUTPUT_FORMATS ("parquet" needs pyarrow).
+    """
+
+    def __init__(self, out_base, part_num, max_rows, fmt="csv"):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {fmt!r}, expected one of {list(OUTPUT_FORMATS)}")
+        self.out_base = out_base
+        self.part_num = part_num
+        self.max_rows = max_rows
+        self.fmt = fmt
+        self.ext = OUTPUT_FORMATS[fmt]
+        self.paths = []
+        self._sink = None
+        self._rows_in_part = 0
+
+    def _next_part(self):
+        if self._sink is not None:
+            self._sink.close()
+        path = f"{self.out_base}_{self.part_num}_{len(self.paths)}{self.ext}"
+        self.paths.append(path)
+        self._sink = _open_sink(path, self.fmt)
+        self._rows_in_part = 0
+        return path
+
+    def write(self, df):
+        start = 0
+        while start < len(df):
+            if self._sink is None or self._rows_in_part >= self.max_rows:
+                self._next_part()
+                header = True
+            else:
+                header = False
+            take = min(self.max_rows - self._rows_in_part, len(df) - start)
+            self._sink.write(df.iloc[start:start + take], header)
+            self._rows_in_part += take
+            start += take
+
+    def close(self):
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        if len(self.paths) == 1:
+            single = f"{self.out_base}_{self.part_num}{self.ext}"
+            os.replace(self.paths[0], single)
+            self.paths = [single]
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_parallel(fn, jobs, max_workers=NUM_WORKERS, task="Conversion"):
+    """
+    Runs fn(*job) for every job on a bounded process pool, one input file per task.
+
+    Returns:
+        list: Results in job order (None for jobs that failed; the error is printed).
+    """
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=instrumentation.init_worker,
+                             initargs=(instrumentation.worker_settings(),)) as executor:
+        futures = {executor.submit(_run_job, fn, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i], metrics = future.result()
+                instrumentation.merge(metrics)
+            except Exception as e:
+                print(f" {task} failed for {jobs[i][0]}: {e}")
+    return results
+
+
+def _run_job(fn, job):
+    # Ships the worker's stage timings back with the result
+    return fn(*job), instrumentation.snapshot()
@@ -0,0 +1,143 @@
+# flow_features.py
+import os
+import numpy as np
+import pandas as pd
+import joblib
+
+# Model input layout shared by the Random Forest and Naive Bayes models
+FEATURE_COLS = ["sport", "dport", "proto_enc", "packets", "bytes"]
+RAW_COLS = ["sport", "dport", "proto", "packets", "bytes"]
+PROTO_COL = RAW_COLS.index("proto")
+UNKNOWN_PROTO = -1
+
+
+def feature_transformer_path(model_path):
+    # rf_model.pkl -> rf_feature_transformer.pkl, saved next to the model it was fitted for
+    return model_path.replace("_model.pkl", "_feature_transformer.pkl")
+
+
+def proto_encoder_path(model_path):
+    # nb_model.pkl -> nb_proto_encoder.pkl, the LabelEncoder saved before the shared transformer
+    return model_path.replace("_model.pkl", "_proto_encoder.pkl")
+
+
+class FlowFeatureTransformer:
+    """
+    Maps raw flow columns to the 5-feature float32 matrix used by the RF and NB models.
+
+    proto is encoded through a 256-entry lookup array fitted once at training time, with the
+    same codes a LabelEncoder fitted on the training protocols would give (sorted order), so
+    codes stay stable across files and chunks. The fitted transformer is saved next to the
+    model and loaded at inference time, never refitted.
+    """
+
+    def __init__(self):
+        self.protocols = np.empty(0, dtype=np.int64)
+        self.proto_lut = np.full(256, UNKNOWN_PROTO, dtype=np.float32)
+
+    @classmethod
+    def from_protocols(cls, protocols):
+        # Codes in sorted protocol order, e.g. from the classes_ of a fitted proto LabelEncoder
+        return cls().fit(pd.DataFrame({"proto": np.asarray(protocols)}))
+
+    def fit(self, df):
+        proto = np.asarray(df["proto"])
+        proto = proto[~pd.isna(proto)].astype(np.int64)
+        self.protocols = np.unique(proto)
+        if len(self.protocols) and (self.protocols.min() < 0 or self.protocols.max() > 255):
+            raise ValueError(f"IP protocol numbers must be in 0..255, got {self.protocols}")
+
+        self.proto_lut = np.full(256, UNKNOWN_PROTO, dtype=np.float32)
+        self.proto_lut[self.protocols] = np.arange(len(self.protocols), dtype=np.float32)
+        return self
+
+    def transform(self, df):
+        """
+        Builds the model input for one chunk of flows.
+
+        Parameters:
+            df (pd.DataFrame): Flows with sport, dport, proto, packets and bytes columns.
+
+        Returns:
+            tuple: (X, valid) where X is a C-contiguous float32 array of shape (n_valid, 5)
+                   and valid is a boolean mask over the rows of `df` (None if all rows are valid).
+                   Protocols not seen during fit are encoded as -1.
+        """
+        X = np.empty((len(df), len(RAW_COLS)), dtype=np.float32)
+        may_have_nan = False
+        for j, col in enumerate(RAW_COLS):
+            values = df[col].to_numpy()
+            if values.dtype.kind not in "iuf":
+                values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+            may_have_nan |= values.dtype.kind == "f"
+            X[:, j] = values
+
+        # Integer sources (feature store, native reader) skip the NaN scan entirely
+        valid = None
+        if may_have_nan:
+            nan_rows = np.isnan(X).any(axis=1)
+            if nan_rows.any():
+                valid = ~nan_rows
+                X = X[valid]
+
+        X[:, PROTO_COL] = self.encode_proto(X[:, PROTO_COL])
+        return X, valid
+
+    def encode_proto(self, proto):
+        in_range = (proto >= 0) & (proto <= 255)
+        codes = np.full(len(proto), UNKNOWN_PROTO, dtype=np.float32)
+        codes[in_range] = self.proto_lut[proto[in_range].astype(np.intp)]
+        return codes
+
+    def fit_transform(self, df):
+        return self.fit(df).transform(df)
+
+    def save(self, path):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        return joblib.load(path)
+
+
+class FactorizedFlowFeatureTransformer(FlowFeatureTransformer):
+    """
+    Fallback for models saved without a feature transformer or proto encoder: proto is
+    encoded with pd.factorize on every chunk (first-seen order), as pipeline.py and
+    port_detection.py did before the transformer was persisted. Codes are only consistent
+    within a chunk, so scores can differ from the model's training; run
+    migrate_feature_transformers.py to save the proper transformer.
+    """
+
+    def fit(self, df):
+        return self
+
+    def encode_proto(self, proto):
+        return pd.factorize(proto)[0].astype(np.float32)
+
+
+def load_feature_transformer(model_path):
+    """
+    Loads the feature transformer saved next to a model, with fallbacks for models
+    trained before it was persisted.
+
+    Parameters:
+        model_path (str): Path of the model, e.g. "rf_model.pkl".
+
+    Returns:
+        FlowFeatureTransformer: The saved transformer; else one rebuilt from the model's
+                                proto LabelEncoder (same codes); else a
+                                FactorizedFlowFeatureTransformer.
+    """
+    path = feature_transformer_path(model_path)
+    if os.path.exists(path):
+        return FlowFeatureTransformer.load(path)
+
+    encoder_path = proto_encoder_path(model_path)
+    if os.path.exists(encoder_path):
+        print(f" {path} not found, using the proto encoder {encoder_path}")
+        return FlowFeatureTransformer.from_protocols(joblib.load(encoder_path).classes_)
+
+    print(f" Warning: {path} not found, encoding proto per chunk with pd.factorize "
+          f"(run migrate_feature_transformers.py to save the transformer)")
+    return FactorizedFlowFeatureTransformer()
@@ -0,0 +1,329 @@
+# flow_loader.py
+import os
+import gzip
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow  # noqa: F401  multithreaded CSV engine, also needed for .parquet inputs
+    CSV_ENGINE = "pyarrow"
+except ImportError:  # pandas' C parser, files still read in parallel threads
+    CSV_ENGINE = "c"
+
+# === CONFIG ===
+CHUNK_SIZE = 500_000  # Rows per chunk when streaming
+NUM_WORKERS = os.cpu_count()  # Files read concurrently
+
+# Flow schema shared by every reader; sip/dip are IPv4 addresses as uint32
+FLOW_SCHEMA = {
+    "sip": np.uint32,
+    "dip": np.uint32,
+    "sport": np.uint16,
+    "dport": np.uint16,
+    "proto": np.uint8,
+    "packets": np.uint32,
+    "bytes": np.uint32,
+}
+IP_COLUMNS = ("sip", "dip")
+LABEL_COLUMN = "label"  # Categorical; any other column (stime, etime, ...) is passed through as read
+
+
+def ipv4_to_uint32(values):
+    """
+    Parses dotted-quad IPv4 strings (or plain integers) to uint32 in one vectorized pass.
+
+    Returns:
+        tuple: (uint32 array, boolean mask of the values that parsed)
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        valid = ~np.isnan(values) if values.dtype.kind == "f" else np.ones(len(values), dtype=bool)
+        valid &= (values >= 0) & (values <= 0xFFFFFFFF)
+        return np.where(valid, values, 0).astype(np.uint32), valid
+
+    try:
+        raw = values.astype("S16")
+    except UnicodeEncodeError:
+        raw = pd.Series(values).astype(str).str.encode("ascii", errors="replace").to_numpy().astype("S16")
+    chars = raw.view(np.uint8).reshape(len(raw), 16)
+
+    n = len(raw)
+    ip = np.zeros(n, dtype=np.uint32)
+    octet = np.zeros(n, dtype=np.uint32)
+    run = np.zeros(n, dtype=np.uint8)  # digits in the current octet
+    dots = np.zeros(n, dtype=np.uint8)
+    bad = chars[:, 15] != 0  # more than 15 characters
+    for c in chars[:, :15].T:
+        d = c - np.uint8(48)
+        digit = d < 10
+        dot = c == 46
+        bad |= ~(digit | dot | (c == 0))
+        octet *= np.where(digit, np.uint32(10), np.uint32(1))
+        octet += np.where(digit, d, np.uint8(0))
+        run += digit
+        bad |= dot & ((octet > 255) | (run == 0) | (run > 3))
+        ip = np.where(dot, (ip << np.uint32(8)) | octet, ip)
+        octet[dot] = 0
+        run[dot] = 0
+        dots += dot
+    valid = ~bad & (dots == 3) & (run > 0) & (run <= 3) & (octet <= 255)
+    ip = (ip << np.uint32(8)) | octet
+    plain = ~bad & (dots == 0) & (run > 0)
+    if plain.any():  # addresses written as integers
+        numbers = pd.to_numeric(pd.Series(values[plain]), errors="coerce").to_numpy(np.float64)
+        ok = (numbers >= 0) & (numbers <= 0xFFFFFFFF)
+        ip[plain] = np.where(ok, numbers, 0).astype(np.uint32)
+        valid[np.flatnonzero(plain)[ok]] = True
+    return np.where(valid, ip, 0).astype(np.uint32, copy=False), valid
+
+
+def _to_uint(values, dtype):
+    values = values.to_numpy() if values.dtype.kind in "iuf" else pd.to_numeric(values, errors="coerce").to_numpy(np.float64)
+    info = np.iinfo(dtype)
+    if values.dtype.kind == "f":
+        valid = (values >= 0) & (values <= info.max) & (values == np.floor(values))
+        return np.where(valid, values, 0).astype(dtype), valid
+    valid = (values >= 0) & (values <= info.max)
+    return values.astype(dtype), valid
+
+
+def coerce_flows(df, return_invalid=False):
+    """
+    Casts a raw frame to FLOW_SCHEMA dtypes.
+
+    Rows with a missing or invalid value in a schema column (or a missing label) are
+    dropped, the same rows the feature store drops at ingest. With return_invalid the
+    positions of the dropped rows are returned as well, for callers that must report them
+    or keep their output aligned with the input.
+    """
+    data = {}
+    valid = np.ones(len(df), dtype=bool)
+    for col in df.columns:
+        if col in IP_COLUMNS:
+            data[col], ok = ipv4_to_uint32(df[col].to_numpy())
+        elif col in FLOW_SCHEMA:
+            data[col], ok = _to_uint(df[col], FLOW_SCHEMA[col])
+        elif col == LABEL_COLUMN:
+            data[col], ok = df[col].to_numpy(), df[col].notna().to_numpy()
+        else:
+            data[col], ok = df[col].to_numpy(), None
+        if ok is not None:
+            valid &= ok
+
+    if not valid.all():
+        data = {col: values[valid] for col, values in data.items()}
+    if LABEL_COLUMN in data:
+        data[LABEL_COLUMN] = pd.Categorical(data[LABEL_COLUMN])
+    if return_invalid:
+        return pd.DataFrame(data), np.flatnonzero(~valid)
+    return pd.DataFrame(data)
+
+
+def _iter_raw(source, columns, names, chunk_size, on_bad_lines):
+    if isinstance(source, str) and source.endswith(".parquet"):
+        if chunk_size is None:
+            yield pd.read_parquet(source, columns=columns)
+            return
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    kwargs = dict(names=names, header=None if names else "infer", usecols=columns, on_bad_lines=on_bad_lines)
+    if chunk_size is None:
+        if CSV_ENGINE == "pyarrow" and on_bad_lines == "error":
+            yield pd.read_csv(source, engine="pyarrow", **kwargs)
+        else:
+            yield pd.read_csv(source, low_memory=False, **kwargs)
+    else:
+        with pd.read_csv(source, chunksize=chunk_size, **kwargs) as reader:
+            yield from reader
+
+
+def read_flows(source, columns=None, names=None, chunk_size=None, on_bad_lines="error"):
+    """
+    Reads one flow CSV / .csv.gz / .parquet (path or file-like) with the flow schema dtypes.
+
+    Parameters:
+        source (str or file-like): Input.
+        columns (list or None): Columns to read (pushed down to the parser); None reads all.
+        names (list or None): Column names of a headerless CSV.
+        chunk_size (int or None): Rows per chunk; None returns the whole file as one frame.
+        on_bad_lines (str): Passed to pd.read_csv ("skip" for untrusted network input).
+
+    Returns:
+        pd.DataFrame, or an iterator of DataFrames when chunk_size is set.
+    """
+    chunks = (coerce_flows(df) for df in _iter_raw(source, columns, names, chunk_size, on_bad_lines))
+    if chunk_size is not None:
+        return chunks
+    return next(chunks)
+
+
+def iter_flow_chunks(paths, columns=None, names=None, chunk_size=CHUNK_SIZE, workers=NUM_WORKERS):
+    """
+    Streams typed chunks from several files, reading up to `workers` files concurrently.
+
+    At most 2 * workers chunks are buffered, so memory is bounded by the chunk size and not
+    the size of the file set. Chunks of one file arrive in file order; chunks of different
+    files may interleave.
+    """
+    paths = list(paths)
+    workers = max(1, min(workers or 1, len(paths)))
+    if workers == 1:
+        for path in paths:
+            yield from read_flows(path, columns, names, chunk_size)
+        return
+
+    chunks = queue.Queue(maxsize=2 * workers)
+    pending = queue.Queue()
+    for path in paths:
+        pending.put(path)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def reader():
+        try:
+            while not stop.is_set():
+                try:
+                    path = pending.get_nowait()
+                except queue.Empty:
+                    break
+                for df in read_flows(path, columns, names, chunk_size):
+                    if not put(df):
+                        return
+        except Exception as e:
+            put(e)
+        put(done)
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        finished = 0
+        while finished < workers:
+            item = chunks.get()
+            if item is done:
+                finished += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+
+
+def count_rows(path, header=True):
+    # Upper bound on the rows of a CSV (line count), used to preallocate
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+
+    lines, last = 0, b"\n"
+    with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    lines += last != b"\n"
+    return max(0, lines - header)
+
+
+def _column_names(path, columns, names):
+    if columns is not None:
+        return list(columns)
+    if names is not None:
+        return list(names)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def load_flows(paths, columns=None, names=None, chunk_size=CHUNK_SIZE, workers=NUM_WORKERS):
+    """
+    Loads several flow files into one frame whose columns are allocated once up front.
+
+    Row counts are taken from the files first, then each file is read chunk by chunk on
+    its own thread and copied straight into its slice of the preallocated columns, so peak
+    memory is the final frame plus one chunk per worker. Labels are stored as category
+    codes while reading and become one pd.Categorical with sorted categories.
+
+    Parameters:
+        paths (list): CSV / .csv.gz / .parquet files with the same columns.
+        columns, names: As for read_flows.
+        chunk_size (int): Rows parsed at a time per file.
+        workers (int): Files read concurrently.
+
+    Returns:
+        pd.DataFrame: The flows of every file, in file order.
+    """
+    paths = list(paths)
+    if not paths:
+        return coerce_flows(pd.DataFrame(columns=columns or names or []))
+
+    cols = _column_names(paths[0], columns, names)
+    bounds = [count_rows(path, header=names is None) for path in paths]
+    offsets = np.concatenate([[0], np.cumsum(bounds)]).astype(np.int64)
+
+    def empty(col):
+        if col in FLOW_SCHEMA:
+            return np.empty(offsets[-1], dtype=FLOW_SCHEMA[col])
+        if col == LABEL_COLUMN:
+            return np.empty(offsets[-1], dtype=np.int32)
+        return np.empty(offsets[-1], dtype=object)
+
+    arrays = {col: empty(col) for col in cols}
+    labels, label_lock = [], threading.Lock()
+    rows = [0] * len(paths)
+
+    def read_one(i):
+        pos = offsets[i]
+        for df in read_flows(paths[i], columns, names, chunk_size):
+            end = pos + len(df)
+            if end > offsets[i + 1]:
+                raise ValueError(f"{paths[i]}: more rows than lines")
+            for col in cols:
+                if col == LABEL_COLUMN:
+                    with label_lock:
+                        labels.extend(c for c in df[col].cat.categories if c not in labels)
+                        index = pd.Index(labels)
+                    arrays[col][pos:end] = index.get_indexer(df[col].astype(object))
+                else:
+                    arrays[col][pos:end] = df[col].to_numpy()
+            pos = end
+        rows[i] = pos - offsets[i]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or 1, len(paths)))) as executor:
+        list(executor.map(read_one, range(len(paths))))
+
+    # Close the gaps left by dropped rows (and header / blank lines) so files stay contiguous
+    total = 0
+    for i, n in enumerate(rows):
+        if offsets[i] != total:
+            for values in arrays.values():
+                values[total:total + n] = values[offsets[i]:offsets[i] + n]
+        total += n
+    data = {col: values[:total] for col, values in arrays.items()}
+
+    if LABEL_COLUMN in data:
+        order = np.argsort(labels, kind="stable")
+        remap = np.empty(len(labels), dtype=np.int32)
+        remap[order] = np.arange(len(labels), dtype=np.int32)
+        data[LABEL_COLUMN] = pd.Categorical.from_codes(remap[data[LABEL_COLUMN]],
+                                                       categories=[labels[j] for j in order])
+    return pd.DataFrame(data, copy=False)
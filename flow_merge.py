@@ -0,0 +1,209 @@
+# flow_merge.py
+"""
+Streaming k-way merge of time-ordered flow files, in place of `rwcat ... | rwsort --fields=stime`.
+
+Every input is treated as a run already sorted on the key (stime), so nothing is ever fully
+sorted and no temporary file is written: each input is read one batch at a time, and every
+step emits the rows of all buffered batches up to the smallest "last key" among them, which
+no later row of any input can precede. Memory is bounded by one batch per input.
+
+Inputs are SiLK file paths or any iterable of record batches (structured arrays, as from
+silk_io.iter_record_batches, or DataFrames), so synthetic sorted runs work as well as files.
+A file input that turns out not to be sorted is loaded and sorted in memory, and the merge is
+redone; outputs are written to a temporary file and only renamed into place when complete.
+"""
+import os
+import numpy as np
+import pandas as pd
+from silk_io import FlowWriter, iter_record_batches
+from flow_conversion import NUM_WORKERS, run_parallel
+
+# === CONFIG ===
+BATCH_SIZE = 262_144  # Records buffered per input
+MERGE_KEY = "stime"
+
+
+class UnsortedInputError(ValueError):
+    def __init__(self, index, key):
+        super().__init__(f"Input {index} is not sorted by {key}")
+        self.index = index
+
+
+def _keys(batch, key):
+    return np.asarray(batch[key])
+
+
+def _take(batch, index):
+    return batch.iloc[index] if isinstance(batch, pd.DataFrame) else batch[index]
+
+
+def _concat(parts):
+    if len(parts) == 1:
+        return parts[0]
+    if isinstance(parts[0], pd.DataFrame):
+        return pd.concat(parts, ignore_index=True)
+    return np.concatenate(parts)
+
+
+class RecordRange:
+    """
+    Records start..stop of a SiLK file as an input of merge_sorted.
+
+    With sort_key the range is loaded and sorted in memory first, for small inputs that are
+    not sorted runs themselves (e.g. a slice of concatenated per-attack files).
+    """
+
+    def __init__(self, path, start=0, stop=None, sort_key=None, batch_size=BATCH_SIZE):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.sort_key = sort_key
+        self.batch_size = batch_size
+
+    def _batches(self):
+        pos = 0
+        for records in iter_record_batches(self.path, self.batch_size):
+            lo, hi = max(self.start - pos, 0), len(records) if self.stop is None else min(self.stop - pos, len(records))
+            pos += len(records)
+            if lo < hi:
+                yield records[lo:hi]
+            if self.stop is not None and pos >= self.stop:
+                return
+
+    def __iter__(self):
+        if self.sort_key is None:
+            yield from self._batches()
+            return
+        batches = list(self._batches())
+        if batches:
+            records = _concat(batches)
+            yield records[np.argsort(records[self.sort_key], kind="stable")]
+
+
+def merge_sorted(sources, key=MERGE_KEY):
+    """
+    Merges inputs sorted on `key` into one sorted stream of batches.
+
+    Rows with equal keys keep their input order within a step. Raises UnsortedInputError
+    (a ValueError) if an input turns out not to be sorted.
+
+    Parameters:
+        sources (list): Iterables of record batches, all of the same kind and layout.
+        key (str): Sort field.
+    """
+    iterators = [iter(source) for source in sources]
+    last_key = [None] * len(iterators)
+
+    def refill(i):
+        for batch in iterators[i]:
+            if not len(batch):
+                continue
+            keys = _keys(batch, key)
+            if (last_key[i] is not None and keys[0] < last_key[i]) or (np.diff(keys) < 0).any():
+                raise UnsortedInputError(i, key)
+            last_key[i] = keys[-1]
+            return batch
+        return None
+
+    buffers = {}
+    for i in range(len(iterators)):
+        batch = refill(i)
+        if batch is not None:
+            buffers[i] = batch
+
+    while buffers:
+        # Nothing still unread can sort before the smallest last key among the buffers
+        cutoff = min(_keys(batch, key)[-1] for batch in buffers.values())
+        parts = []
+        for i in sorted(buffers):
+            batch = buffers[i]
+            n = np.searchsorted(_keys(batch, key), cutoff, side="right")
+            if n:
+                parts.append(_take(batch, slice(0, n)))
+            if n < len(batch):
+                buffers[i] = _take(batch, slice(n, None))
+            else:
+                batch = refill(i)
+                if batch is None:
+                    del buffers[i]
+                else:
+                    buffers[i] = batch
+
+        merged = _concat(parts)
+        if len(parts) > 1:
+            merged = _take(merged, np.argsort(_keys(merged, key), kind="stable"))
+        yield merged
+
+
+def _sorted_source(source, key):
+    # The same input, loaded and sorted in memory
+    if isinstance(source, str):
+        return RecordRange(source, sort_key=key)
+    if isinstance(source, RecordRange) and source.sort_key is None:
+        return RecordRange(source.path, source.start, source.stop, key, source.batch_size)
+    return None
+
+
+def _write_merge(sources, output_path, key, batch_size):
+    tmp_path = output_path + ".tmp"
+    try:
+        with FlowWriter(tmp_path) as writer:
+            inputs = []
+            for source in sources:
+                batches = iter_record_batches(source, batch_size) if isinstance(source, str) else source
+                inputs.append(writer.to_records(batch) for batch in batches)
+            for batch in merge_sorted(inputs, key):
+                writer.write(batch)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, output_path)
+    return writer.n_records
+
+
+def merge_files(sources, output_path, key=MERGE_KEY, batch_size=BATCH_SIZE):
+    """
+    Writes the time-ordered merge of `sources` to a new SiLK file.
+
+    An input file that is not sorted on `key` is sorted in memory (one input at a time,
+    as they are found) and the merge is started over. Nothing is left at `output_path`
+    if the merge fails.
+
+    Parameters:
+        sources (list): SiLK file paths or iterables of record batches (see RecordRange).
+        output_path (str): Output file (FT_RWGENERIC v5).
+
+    Returns:
+        int: Records written.
+    """
+    sources = list(sources)
+    while True:
+        try:
+            return _write_merge(sources, output_path, key, batch_size)
+        except UnsortedInputError as e:
+            replacement = _sorted_source(sources[e.index], key)
+            if replacement is None:
+                raise
+            name = sources[e.index] if isinstance(sources[e.index], str) else sources[e.index].path
+            print(f" {name} is not sorted by {key}, sorting it in memory")
+            sources[e.index] = replacement
+
+
+def _merge_job(output_path, sources, key):
+    # run_parallel names a failed task by its first argument
+    return merge_files(sources, output_path, key)
+
+
+def merge_many(jobs, workers=NUM_WORKERS, key=MERGE_KEY):
+    """
+    Runs independent merges on a process pool, one output file per task.
+
+    Parameters:
+        jobs (list): (sources, output_path) pairs; sources must be picklable (paths, RecordRange).
+
+    Returns:
+        list: Records written per job (None for jobs that failed).
+    """
+    return run_parallel(_merge_job, [(output_path, sources, key) for sources, output_path in jobs],
+                        max_workers=workers, task="Merge")
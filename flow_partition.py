@@ -0,0 +1,267 @@
+# flow_partition.py
+"""
+Single-pass partitioner: reads a flow file once and routes every batch to N outputs.
+
+A router maps each row of a batch to an output index (-1 drops the row, INVALID drops and
+reports it) with one vectorized lookup, and each output has its own buffered writer, opened
+on its first row. CSV inputs are routed on the parsed routing field but their rows are
+written back as read, so CSV outputs keep the input's text (dotted-quad IPs, timestamps). This replaces
+one `rwfilter --pass` run per output, e.g.
+
+    per-attack split     rwfilter --dport=<port>            (8 reads of the capture)
+    dataset A/B split    rwfilter --sport=<range set>       (splitting_data.txt, 2 reads)
+
+both of which are configurations in PRESETS:
+
+    python flow_partition.py 03/in-S0_20250401.15 --preset attacks --output-dir temp/split_attacks
+    python flow_partition.py mydataset.rw --preset ab
+    python flow_partition.py labeled.csv --by label --group normal.csv=normal --group attacks.csv=syn_flood,udp_flood
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from silk_io import FlowWriter, iter_record_batches
+from flow_loader import _iter_raw
+from flow_conversion import OUTPUT_FORMATS, _open_sink
+from generate_attacks import ATTACK_PORTS
+
+# === CONFIG ===
+BATCH_SIZE = 262_144  # Records routed at a time
+SINK_BUFFER_SIZE = 1 << 20  # Bytes buffered per .rw output
+INVALID = -2  # Router output of rows whose routing value is missing or does not parse
+
+# name -> (field, {output file: groups}); groups use rwfilter's port list syntax
+PRESETS = {
+    "attacks": ("dport", {f"{name}.rw": str(port) for name, port in ATTACK_PORTS.items()}),
+    "ab": ("sport", {
+        "dataset_A.rw": "5001-5002,5005-5006,5009-5010,5013-5014,5017-5018,5021-5022,5025-5026,5029-5030",
+        "dataset_B.rw": "5003-5004,5007-5008,5011-5012,5015-5016,5019-5020,5023-5024,5027-5028,5031-5032",
+    }),
+}
+
+
+def parse_port_list(value):
+    """
+    Ports in rwfilter syntax ("80,443,5001-5002") or an iterable of ports / (lo, hi) pairs.
+
+    Returns:
+        np.ndarray: The ports, as integers.
+    """
+    if isinstance(value, str):
+        value = [tuple(int(p) for p in part.split("-")) if "-" in part else int(part)
+                 for part in value.split(",") if part.strip()]
+    ports = []
+    for item in value:
+        if isinstance(item, tuple):
+            ports.append(np.arange(item[0], item[1] + 1))
+        else:
+            ports.append(np.array([item]))
+    ports = np.concatenate(ports) if ports else np.empty(0, dtype=np.int64)
+    if ((ports < 0) | (ports > 0xFFFF)).any():
+        raise ValueError(f"Port out of range in {value!r}")
+    return ports
+
+
+class PortRouter:
+    """
+    Routes rows by a 16-bit port field through a 65536-entry lookup table.
+
+    Parameters:
+        field (str): "sport" or "dport".
+        groups (list): Ports per output (see parse_port_list); a port may belong to one output only.
+    """
+
+    def __init__(self, field, groups):
+        self.field = field
+        self.lut = np.full(65536, -1, dtype=np.int16)
+        for i, group in enumerate(groups):
+            ports = parse_port_list(group)
+            taken = ports[self.lut[ports] >= 0]
+            if len(taken):
+                raise ValueError(f"{field} {taken[0]} is routed to more than one output")
+            self.lut[ports] = i
+
+    def __call__(self, batch):
+        values = np.asarray(batch[self.field])
+        if values.dtype.kind in "iu":
+            return self.lut[values.astype(np.uint16)]
+        # Text columns of a CSV: anything that is not a port in 0..65535 is INVALID
+        ports = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(np.float64)
+        valid = (ports >= 0) & (ports <= 0xFFFF) & (ports == np.floor(ports))
+        outputs = np.full(len(ports), INVALID, dtype=np.int16)
+        outputs[valid] = self.lut[ports[valid].astype(np.intp)]
+        return outputs
+
+
+class LabelRouter:
+    """
+    Routes rows by the value of a column (e.g. label).
+
+    Parameters:
+        column (str): Column to route on.
+        groups (list): Values per output, as lists or comma separated strings.
+    """
+
+    def __init__(self, column, groups):
+        self.column = column
+        values, outputs = [], []
+        for i, group in enumerate(groups):
+            group = group.split(",") if isinstance(group, str) else list(group)
+            values += group
+            outputs += [i] * len(group)
+        if len(set(values)) != len(values):
+            raise ValueError(f"A {column} value is routed to more than one output")
+        self.values = pd.Index(values)
+        self.outputs = np.array(outputs + [-1], dtype=np.int16)  # index -1 (unknown value) drops the row
+
+    def __call__(self, batch):
+        values = pd.Series(np.asarray(batch[self.column], dtype=object))
+        outputs = self.outputs[self.values.get_indexer(values)]
+        outputs[(values.isna() | (values == "")).to_numpy()] = INVALID
+        return outputs
+
+
+class _FrameSink:
+    # CSV / csv.gz / parquet output with the write(batch) interface of FlowWriter
+    def __init__(self, path):
+        fmt = next(f for f, ext in OUTPUT_FORMATS.items() if path.endswith(ext))
+        self.sink = _open_sink(path, fmt)
+        self.header = True
+
+    def write(self, df):
+        self.sink.write(df, self.header)
+        self.header = False
+
+    def close(self):
+        self.sink.close()
+
+
+def open_sink(path):
+    if path.endswith(tuple(OUTPUT_FORMATS.values())):
+        return _FrameSink(path)
+    return FlowWriter(path, buffer_size=SINK_BUFFER_SIZE)
+
+
+def _take(batch, index):
+    return batch.iloc[index] if isinstance(batch, pd.DataFrame) else batch[index]
+
+
+class Partitioner:
+    """
+    Writes batches to the output chosen for each row by `router`.
+
+    Rows of one output keep their input order. Outputs are opened when they receive their
+    first row, so outputs without rows are never created. Rows routed to INVALID are
+    counted in `invalid`.
+
+    Parameters:
+        router (callable): batch -> int array of output indices (-1 drops the row).
+        paths (list): Output files; .rw (FlowWriter), .csv, .csv.gz or .parquet.
+        open_sink (callable): path -> writer with write(batch) and close().
+    """
+
+    def __init__(self, router, paths, open_sink=open_sink):
+        self.router = router
+        self.paths = list(paths)
+        self.open_sink = open_sink
+        self.sinks = [None] * len(self.paths)
+        self.counts = np.zeros(len(self.paths), dtype=np.int64)
+        self.invalid = 0
+
+    def write(self, batch):
+        outputs = self.router(batch)
+        if not len(outputs):
+            return
+        self.invalid += int((outputs == INVALID).sum())
+        order = np.argsort(outputs, kind="stable")
+        bounds = np.searchsorted(outputs[order], np.arange(-1, len(self.paths) + 1))
+        for i in range(len(self.paths)):
+            start, stop = bounds[i + 1], bounds[i + 2]
+            if start == stop:
+                continue
+            if self.sinks[i] is None:
+                self.sinks[i] = self.open_sink(self.paths[i])
+            self.sinks[i].write(_take(batch, order[start:stop]))
+            self.counts[i] += stop - start
+
+    def close(self):
+        for sink in self.sinks:
+            if sink is not None:
+                sink.close()
+        return [path for path, n in zip(self.paths, self.counts) if n]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_batches(path, batch_size=BATCH_SIZE):
+    # CSV files as text DataFrames (written back unchanged), parquet as stored, anything else as SiLK records
+    if path.endswith((".csv", ".csv.gz")):
+        return _iter_csv_text(path, batch_size)
+    if path.endswith(".parquet"):
+        return _iter_raw(path, None, None, batch_size, "error")
+    return iter_record_batches(path, batch_size)
+
+
+def _iter_csv_text(path, batch_size):
+    # Every field as the string it was written as; empty fields stay empty instead of NaN
+    with pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=batch_size) as reader:
+        yield from reader
+
+
+def partition_file(input_path, router, output_paths, batch_size=BATCH_SIZE):
+    """
+    Reads `input_path` once and routes it to `output_paths`. Rows whose routing value is
+    missing or invalid are dropped with a warning.
+
+    Returns:
+        dict: Rows written per output, for the outputs that received any.
+    """
+    with Partitioner(router, output_paths) as partitioner:
+        for batch in iter_batches(input_path, batch_size):
+            partitioner.write(batch)
+    if partitioner.invalid:
+        print(f" Warning: dropped {partitioner.invalid} rows of {input_path} with a missing or invalid routing value")
+    return {path: int(n) for path, n in zip(partitioner.paths, partitioner.counts) if n}
+
+
+def make_router(field, groups):
+    if field in ("sport", "dport"):
+        return PortRouter(field, groups)
+    return LabelRouter(field, groups)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Split a flow file into several outputs in one pass")
+    parser.add_argument("input", help="SiLK flow file, or a flow CSV / parquet file")
+    parser.add_argument("--preset", choices=list(PRESETS), default=None)
+    parser.add_argument("--by", default=None, help="Field to route on: sport, dport or a column such as label")
+    parser.add_argument("--group", action="append", default=[], metavar="OUTPUT=VALUES",
+                        help="Output file and its ports (rwfilter syntax) or values, repeatable")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.preset:
+        field, groups = PRESETS[args.preset]
+    elif args.by and args.group:
+        field, groups = args.by, dict(group.split("=", 1) for group in args.group)
+    else:
+        raise SystemExit(" Give --preset, or --by with at least one --group")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = [os.path.join(args.output_dir, name) for name in groups]
+    counts = partition_file(args.input, make_router(field, list(groups.values())), paths, args.batch_size)
+    for path in paths:
+        print(f" {path}: {counts.get(path, 0)} flows")
+
+
+if __name__ == "__main__":
+    main()
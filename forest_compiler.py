@@ -0,0 +1,400 @@
+# forest_compiler.py
+import os
+import sys
+import json
+import importlib
+import time
+import zipfile
+import argparse
+import resource
+import subprocess
+import numpy as np
+import joblib
+
+# === CONFIG ===
+CHUNK_SIZE = 65536  # Samples traversed at once; bounds the (n_trees, chunk) node index arrays
+FORMAT_VERSION = 2  # 2 adds n_features and n_jobs, needed to rebuild the sklearn forest
+EVALUATORS = ("sklearn", "numpy")
+
+
+def _sklearn_normalizes_leaves():
+    # sklearn >= 1.4 stores normalized class fractions in tree_.value and predicts them as-is
+    import sklearn
+    from sklearn.utils.fixes import parse_version
+    return parse_version(sklearn.__version__) < parse_version("1.4")
+
+
+def compiled_path(model_path):
+    # rf_model.pkl -> rf_model.npz, saved next to the pickled model
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+class CompiledForest:
+    """
+    A fitted sklearn forest classifier flattened into contiguous NumPy arrays.
+
+    The arrays load from an uncompressed .npz with no unpickling, and can be scored two
+    ways: to_sklearn() rebuilds the RandomForestClassifier around them, so predict runs
+    sklearn's Cython traversal; predict / predict_proba here are a pure NumPy evaluator
+    over the memory-mapped arrays. The NumPy evaluator needs no sklearn import and keeps
+    the model in shared page cache, but it is 6-8x slower than sklearn (see benchmark()),
+    so it only pays off when many processes hold the model and RSS matters more than
+    throughput.
+
+    All trees share one node table: feature, threshold, children (left, right) and
+    missing_left per node, plus the class distribution sklearn predicts at every node
+    (leaf_proba). roots and depths hold each tree's first node and depth. Leaves have
+    feature 0 and both children pointing to themselves, so walking past a leaf is a no-op.
+
+    predict_proba reproduces sklearn exactly: X is compared as float32 against the float64
+    thresholds, each tree contributes its leaf distribution, trees are summed in order in
+    float64 and the sum is divided by the number of trees.
+    """
+
+    ARRAYS = ["roots", "depths", "feature", "threshold", "children", "missing_left", "leaf_proba", "classes",
+              "n_features", "n_jobs"]
+
+    def __init__(self, roots, depths, feature, threshold, children, missing_left, leaf_proba, classes,
+                 n_features, n_jobs=None):
+        self.roots = roots
+        self.depths = depths
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.leaf_proba = leaf_proba
+        self.classes_ = classes
+        self.n_features = int(n_features)
+        self.n_jobs = n_jobs
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        n_classes = int(forest.n_classes_)
+        normalize = _sklearn_normalizes_leaves()
+        roots, depths, features, thresholds, children, missing, probas = [], [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            is_leaf = tree.children_left < 0
+            nodes = np.arange(n, dtype=np.int64) + offset
+
+            roots.append(offset)
+            depths.append(tree.max_depth)
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(tree.threshold.astype(np.float64))
+            children.append(np.stack([np.where(is_leaf, nodes, tree.children_left + offset),
+                                      np.where(is_leaf, nodes, tree.children_right + offset)], axis=1))
+            missing_left = getattr(tree, "missing_go_to_left", None)
+            missing.append(np.zeros(n, dtype=bool) if missing_left is None else np.asarray(missing_left, dtype=bool))
+
+            proba = np.array(tree.value[:, 0, :n_classes], dtype=np.float64)
+            if normalize:
+                # DecisionTreeClassifier.predict_proba before 1.4 stored counts and normalized them per call
+                normalizer = proba.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                proba /= normalizer
+            probas.append(proba)
+            offset += n
+
+        return cls(np.array(roots, dtype=np.int64), np.array(depths, dtype=np.int64), np.concatenate(features),
+                   np.concatenate(thresholds), np.ascontiguousarray(np.concatenate(children).astype(np.int64)),
+                   np.concatenate(missing), np.ascontiguousarray(np.concatenate(probas)), np.asarray(forest.classes_),
+                   forest.n_features_in_, forest.n_jobs)
+
+    def to_sklearn(self):
+        """
+        Rebuilds the RandomForestClassifier from the arrays. Predictions are those of the
+        forest that was compiled; only the split statistics (impurity, node sample counts)
+        used for feature importances are not kept. Each sklearn Tree copies its node table
+        into private memory, so this trades the page-cache sharing of the NumPy evaluator
+        for sklearn's speed, while still skipping the unpickling.
+        """
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.tree import DecisionTreeClassifier
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+
+        n_classes = len(self.classes_)
+        bounds = np.append(self.roots, self.n_nodes)
+        estimators = []
+        for t in range(self.n_trees):
+            start, stop = int(bounds[t]), int(bounds[t + 1])
+            children = self.children[start:stop] - start
+            leaf = children[:, 0] == np.arange(stop - start)
+            nodes = np.zeros(stop - start, dtype=NODE_DTYPE)
+            nodes["left_child"] = np.where(leaf, -1, children[:, 0])
+            nodes["right_child"] = np.where(leaf, -1, children[:, 1])
+            nodes["feature"] = np.where(leaf, -2, self.feature[start:stop])
+            nodes["threshold"] = self.threshold[start:stop]
+            if "missing_go_to_left" in NODE_DTYPE.names:  # sklearn >= 1.3
+                nodes["missing_go_to_left"] = self.missing_left[start:stop]
+
+            tree = Tree(self.n_features, np.array([n_classes], dtype=np.intp), 1)
+            tree.__setstate__({"max_depth": int(self.depths[t]), "node_count": stop - start, "nodes": nodes,
+                               "values": np.ascontiguousarray(self.leaf_proba[start:stop, np.newaxis, :])})
+            estimator = DecisionTreeClassifier()
+            estimator.tree_ = tree
+            estimator.n_features_in_ = self.n_features
+            estimator.n_outputs_ = 1
+            estimator.n_classes_ = n_classes
+            estimator.classes_ = np.arange(n_classes, dtype=np.float64)
+            estimators.append(estimator)
+
+        forest = RandomForestClassifier(n_estimators=self.n_trees, n_jobs=self.n_jobs)
+        forest.estimator_ = DecisionTreeClassifier()
+        forest.estimators_ = estimators
+        forest.n_features_in_ = self.n_features
+        forest.n_outputs_ = 1
+        forest.classes_ = np.array(self.classes_)
+        forest.n_classes_ = n_classes
+        return forest
+
+    # === Persistence ===
+
+    def save(self, path):
+        # Uncompressed, so every member can be memory-mapped straight out of the zip
+        np.savez(path, format_version=np.array(FORMAT_VERSION), **{name: self._array(name) for name in self.ARRAYS})
+
+    def _array(self, name):
+        if name == "classes":
+            return self.classes_
+        if name == "n_jobs":
+            return np.array(0 if self.n_jobs is None else self.n_jobs)  # 0 stands for None
+        return getattr(self, name)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Loads a compiled forest. With mmap_mode="r" every array is a read-only memory map of
+        the .npz member, so processes loading the same file share its page-cache pages.
+        """
+        arrays = _load_npz(path, mmap_mode)
+        if int(arrays["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported compiled forest format {int(arrays['format_version'])}, "
+                             f"recompile with `python forest_compiler.py`")
+        compiled = cls(*(arrays[name] for name in cls.ARRAYS))
+        compiled.n_jobs = int(compiled.n_jobs) or None
+        return compiled
+
+    # === Inference ===
+
+    def apply(self, X):
+        """
+        Leaf index of every (tree, sample), shape (n_trees, n_samples).
+
+        Each tree is walked one level per step for all samples at once: gather the split
+        feature of every sample's node, compare, then gather the chosen child.
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n = len(X)
+        # Feature-major copy so a split reads X_t[feature * n + sample]
+        flat_X = np.ascontiguousarray(X.T).ravel()
+        samples = np.arange(n, dtype=np.int64)
+        has_nan = bool(np.isnan(flat_X).any())
+        children = self.children.ravel()
+
+        leaves = np.empty((self.n_trees, n), dtype=np.int64)
+        for t in range(self.n_trees):
+            node = np.full(n, self.roots[t], dtype=np.int64)
+            for _ in range(int(self.depths[t])):
+                x = flat_X[self.feature[node] * n + samples]
+                go_right = x > self.threshold[node]
+                if has_nan:
+                    missing = np.isnan(x)
+                    go_right[missing] = ~self.missing_left[node[missing]]
+                node = children[2 * node + go_right]
+            leaves[t] = node
+        return leaves
+
+    def predict_proba(self, X, chunk_size=CHUNK_SIZE):
+        X = np.asarray(X)
+        proba = np.zeros((len(X), self.leaf_proba.shape[1]), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            leaves = self.apply(X[start:start + chunk_size])
+            out = proba[start:start + chunk_size]
+            for tree_leaves in leaves:
+                out += self.leaf_proba[tree_leaves]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X, chunk_size=CHUNK_SIZE):
+        return self.classes_.take(np.argmax(self.predict_proba(X, chunk_size), axis=1), axis=0)
+
+
+def _load_npz(path, mmap_mode):
+    if mmap_mode is None:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+
+    # Locate each uncompressed .npy member inside the zip and map it in place
+    arrays = {}
+    with zipfile.ZipFile(path) as zf, open(path, "rb") as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: member {info.filename} is compressed and cannot be memory-mapped")
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_len = int.from_bytes(local_header[26:28], "little")
+            extra_len = int.from_bytes(local_header[28:30], "little")
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError(f"{path}: member {name} holds Python objects")
+            if not shape or 0 in shape:
+                arrays[name] = np.lib.format.read_array(zf.open(info)) if not shape else np.empty(shape, dtype)
+            else:
+                arrays[name] = np.memmap(f.name, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+def load_classifier(model_path, mmap_mode=None, evaluator="sklearn"):
+    """
+    Loads a pickled classifier, or its compiled forest when a .npz at least as new as the
+    pickle sits next to it (see `python forest_compiler.py <model.pkl>`).
+
+    Parameters:
+        model_path (str): Path of the pickled forest, e.g. "rf_model.pkl".
+        mmap_mode (str or None): Passed to joblib.load; the .npz arrays are always memory-mapped.
+        evaluator (str): "sklearn" rebuilds the sklearn forest from the .npz (fast scoring),
+            "numpy" scores with CompiledForest itself (shared pages, lowest RSS).
+
+    Returns:
+        RandomForestClassifier or CompiledForest
+    """
+    if evaluator not in EVALUATORS:
+        raise ValueError(f"evaluator must be one of {EVALUATORS}, got {evaluator!r}")
+    npz_path = compiled_path(model_path)
+    if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(model_path):
+        compiled = CompiledForest.load(npz_path, mmap_mode="r" if mmap_mode is None else mmap_mode)
+        return compiled.to_sklearn() if evaluator == "sklearn" else compiled
+    return joblib.load(model_path, mmap_mode=mmap_mode)
+
+
+def compile_model(model_path):
+    forest = joblib.load(model_path)
+    compiled = CompiledForest.from_sklearn(forest)
+    out_path = compiled_path(model_path)
+    compiled.save(out_path)
+    print(f" Compiled {model_path}: {compiled.n_trees} trees, {compiled.n_nodes} nodes -> {out_path}")
+    return compiled
+
+
+# === Benchmarks ===
+
+def _load_probe(path, evaluator):
+    # Runs in a fresh interpreter: load time and peak RSS of a process that loads one artifact.
+    # sklearn is imported first and timed apart, it is loaded anyway wherever sklearn scores
+    start = time.perf_counter()
+    if evaluator == "sklearn":
+        importlib.import_module("sklearn.ensemble")
+    import_s = time.perf_counter() - start
+    start = time.perf_counter()
+    if path.endswith(".npz"):
+        model = CompiledForest.load(path)
+        model = model.to_sklearn() if evaluator == "sklearn" else model
+    else:
+        model = joblib.load(path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"import_s": import_s, "load_s": elapsed, "max_rss_mb": _peak_rss_mb(), "type": type(model).__name__}))
+
+
+def _peak_rss_mb():
+    # VmHWM is reset by exec; ru_maxrss would still include the forking parent's pages
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure_load(path, evaluator="sklearn"):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--load-probe", path, "--evaluator", evaluator],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark_inputs(model_path, n_rows):
+    """
+    Test inputs for a model: the feature store flows through the model's feature transformer
+    (rf_model.pkl) or the DDoS2Vec embedding (ddos2vec_classifier.pkl).
+    """
+    from feature_store import sync_store
+    store = sync_store()
+    df = store.load()[:n_rows]
+    if "ddos2vec" in model_path:
+        from gensim.models import Word2Vec
+        from ddos2vec_features import FlowEmbedder
+        return FlowEmbedder(Word2Vec.load("ddos2vec_embedding.model")).transform(df)
+    from flow_features import FlowFeatureTransformer, feature_transformer_path
+    X, _ = FlowFeatureTransformer.load(feature_transformer_path(model_path)).transform(df)
+    return X
+
+
+def benchmark(model_path, n_rows=200_000):
+    """
+    Load time and peak RSS (each in a fresh process), flows/s and outputs of the pickled
+    forest against the compiled .npz, scored through sklearn and through the NumPy evaluator.
+    """
+    forest = joblib.load(model_path)
+    compiled = CompiledForest.load(compiled_path(model_path))
+    X = benchmark_inputs(model_path, n_rows)
+    candidates = [("pickle", forest, model_path, "sklearn"),
+                  ("npz+sklearn", compiled.to_sklearn(), compiled_path(model_path), "sklearn"),
+                  ("npz+numpy", compiled, compiled_path(model_path), "numpy")]
+
+    results = {"model": model_path, "rows": len(X)}
+    reference = None
+    for name, model, path, evaluator in candidates:
+        start = time.perf_counter()
+        proba = model.predict_proba(X)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = (proba, model.predict(X))
+        results[name] = {"flows_per_s": len(X) / elapsed, **measure_load(path, evaluator),
+                         "bit_identical": bool(np.array_equal(proba, reference[0])),
+                         "predictions_identical": bool(np.array_equal(model.predict(X), reference[1]))}
+        r = results[name]
+        print(f" {model_path} [{name:>11}] import {r['import_s']:.3f}s + load {r['load_s']:.3f}s, peak RSS {r['max_rss_mb']:.0f} MB, "
+              f"{r['flows_per_s']:,.0f} flows/s, probabilities bit-identical: {r['bit_identical']}, "
+              f"predictions identical: {r['predictions_identical']}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compile fitted sklearn forests into memory-mappable .npz arrays")
+    parser.add_argument("models", nargs="*", default=["rf_model.pkl", "ddos2vec_classifier.pkl"])
+    parser.add_argument("--benchmark", action="store_true", help="Compare load time, RSS, flows/s and outputs with sklearn")
+    parser.add_argument("--rows", type=int, default=200_000, help="Flows used by --benchmark")
+    parser.add_argument("--load-probe", help=argparse.SUPPRESS)
+    parser.add_argument("--evaluator", choices=EVALUATORS, default="sklearn", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.load_probe:
+        _load_probe(args.load_probe, args.evaluator)
+        sys.exit(0)
+
+    for model_path in args.models:
+        compile_model(model_path)
+        if args.benchmark:
+            benchmark(model_path, args.rows)
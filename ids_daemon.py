@@ -0,0 +1,347 @@
+# ids_daemon.py
+"""
+Long-running flow-ingest IDS.
+
+Wire format: line-delimited CSV, one flow per line, no header, fields in the order of
+port_detection.COLUMNS (the same layout csv_converter.py writes to attack_data/):
+
+    sip,dip,sport,dport,proto,packets,bytes,stime,etime
+    10.0.0.1,10.0.0.2,40312,6007,6,1,60,2024/01/01T00:00:00.000,2024/01/01T00:00:00.001
+
+Over UDP each datagram carries one or more complete lines. Over TCP a connection streams
+lines. Received lines are queued, micro-batched by size or deadline and scored with the
+RF, NB and DDoS2Vec artifacts. The per-port attack summary and latency stats are
+rewritten in OUTPUT_FOLDER every REPORT_INTERVAL seconds.
+
+Backpressure: the queue is bounded. TCP readers block when it is full, so the
+kernel's flow control slows the senders down. UDP cannot be slowed down, so datagrams
+that arrive while the queue is full are dropped and counted.
+
+Malformed input never stops the daemon: lines that do not parse are rejected and counted,
+and a batch whose scoring fails is logged and counted before the loop moves on.
+"""
+import io
+import os
+import json
+import collections
+import time
+import queue
+import socket
+import argparse
+import threading
+import numpy as np
+import port_detection
+import instrumentation
+from instrumentation import stage
+from forest_compiler import EVALUATORS
+from model_registry import MODELS, DEFAULT_MODELS, parse_model_keys
+from port_aggregation import PortAttackSummary
+from flow_loader import read_flows
+
+# === CONFIG ===
+HOST = "127.0.0.1"
+PORT = 9995
+BATCH_SIZE = 5000          # Score once this many flows are pending...
+BATCH_TIMEOUT = 0.5        # ...or once the oldest pending flow has waited this long (seconds)
+QUEUE_SIZE = 1000          # Received datagrams / TCP reads waiting to be batched
+REPORT_INTERVAL = 10.0     # Seconds between summary / stats updates
+OUTPUT_FOLDER = "results_ids_daemon"
+UDP_RCVBUF = 8 << 20
+LATENCY_WINDOW = 10_000    # Most recent received datagrams / TCP reads used for the latency percentiles
+
+
+N_FIELDS = len(port_detection.COLUMNS)
+
+
+def _well_formed(line):
+    # The wire format has no quoting, so a quote can only be garbage that would swallow the next lines
+    return line.count(b",") == N_FIELDS - 1 and b'"' not in line
+
+
+def _read_lines(lines):
+    text = b"\n".join(lines).decode("utf-8", errors="replace")
+    return read_flows(io.StringIO(text), port_detection.READ_COLUMNS, names=port_detection.COLUMNS,
+                      on_bad_lines="skip")
+
+
+def _parses(line):
+    try:
+        _read_lines([line])
+    except Exception:
+        return False
+    return True
+
+
+def parse_lines(lines):
+    """
+    Parses received lines into typed flows.
+
+    Lines without exactly N_FIELDS fields or with quotes are rejected up front, and invalid
+    UTF-8 is replaced so it fails type coercion like any other bad value. Should the batch
+    still not parse, every line is tried on its own and only the failing ones are rejected.
+
+    Returns:
+        tuple: (DataFrame of the valid flows, number of rejected lines)
+    """
+    good = [line for line in lines if _well_formed(line)]
+    if not good:
+        return None, len(lines)
+    try:
+        df = _read_lines(good)
+    except Exception:
+        good = [line for line in good if _parses(line)]
+        if not good:
+            return None, len(lines)
+        df = _read_lines(good)
+    return df, len(lines) - len(df)
+
+
+def _write_atomic(path, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _dump_json(obj, path):
+    with open(path, "w") as f:
+        json.dump(obj, f, indent=2)
+
+
+class IDSDaemon:
+    """
+    Receives flows on a socket and scores them in micro-batches.
+
+    Parameters:
+        batch_size (int): Flows per scoring batch.
+        batch_timeout (float): Max seconds a received flow waits before its batch is scored.
+        queue_size (int): Bound of the receive queue.
+        report_interval (float): Seconds between reports.
+        output_folder (str): Where port_attack_summary.csv and stats.json are written.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, batch_timeout=BATCH_TIMEOUT, queue_size=QUEUE_SIZE,
+                 report_interval=REPORT_INTERVAL, output_folder=OUTPUT_FOLDER):
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.report_interval = report_interval
+        self.output_folder = output_folder
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.summary = PortAttackSummary()
+
+        self.flows_received = 0
+        self.flows_scored = 0
+        self.batches = 0
+        self.dropped_datagrams = 0
+        self.dropped_flows = 0
+        self.rejected_lines = 0
+        self.failed_batches = 0
+        self.failed_flows = 0
+        self._latencies = collections.deque(maxlen=LATENCY_WINDOW)  # (latency, flows) per received item
+        self._started = time.time()
+        self._last_report = time.perf_counter()
+        self._last_report_scored = 0
+
+    # === Receivers ===
+
+    def _enqueue(self, lines, block):
+        item = (time.perf_counter(), lines)
+        try:
+            self.queue.put(item, block=block)
+        except queue.Full:
+            self.dropped_datagrams += 1
+            self.dropped_flows += len(lines)
+            instrumentation.count("dropped_flows", len(lines))
+            return
+        self.flows_received += len(lines)
+
+    def serve_udp(self, host, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF)
+        sock.bind((host, port))
+        sock.settimeout(0.5)
+        with sock:
+            while not self.stop_event.is_set():
+                try:
+                    data = sock.recv(65535)
+                except socket.timeout:
+                    continue
+                lines = [line for line in data.split(b"\n") if line]
+                if lines:
+                    self._enqueue(lines, block=False)
+
+    def serve_tcp(self, host, port):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen()
+        server.settimeout(0.5)
+        with server:
+            while not self.stop_event.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._read_tcp, args=(conn,), daemon=True).start()
+
+    def _read_tcp(self, conn):
+        rest = b""
+        with conn:
+            while not self.stop_event.is_set():
+                data = conn.recv(1 << 16)
+                if not data:
+                    break
+                *lines, rest = (rest + data).split(b"\n")
+                lines = [line for line in lines if line]
+                if lines:
+                    self._enqueue(lines, block=True)
+        if rest.strip():
+            self._enqueue([rest], block=True)
+
+    # === Batching / scoring ===
+
+    def score_batch(self, items):
+        lines = [line for _, batch in items for line in batch]
+        with stage("parse", rows=len(lines)):
+            df, rejected = parse_lines(lines)
+        if df is not None and len(df):
+            port_detection.score_flows(df, self.summary, "stream")
+            self.flows_scored += len(df)
+        # Counted once scoring went through: if it raises, run() counts every line as failed
+        self.rejected_lines += rejected
+        instrumentation.count("rejected_lines", rejected)
+
+        done = time.perf_counter()
+        self._latencies.extend((done - received, len(batch)) for received, batch in items)
+        self.batches += 1
+
+    def run(self):
+        """
+        Batching loop; runs until stop_event is set and the queue has been drained.
+        """
+        pending, pending_flows, deadline = [], 0, None
+        while not (self.stop_event.is_set() and self.queue.empty() and not pending):
+            timeout = self.batch_timeout if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                item = self.queue.get(timeout=timeout)
+                pending.append(item)
+                pending_flows += len(item[1])
+                if deadline is None:
+                    deadline = item[0] + self.batch_timeout
+            except queue.Empty:
+                pass
+
+            if pending and (pending_flows >= self.batch_size or time.perf_counter() >= deadline
+                            or self.stop_event.is_set()):
+                try:
+                    self.score_batch(pending)
+                except Exception as e:  # a bad batch is lost, the daemon is not
+                    self.failed_batches += 1
+                    self.failed_flows += pending_flows
+                    instrumentation.count("failed_flows", pending_flows)
+                    print(f" [ids] batch of {pending_flows} flows failed: {e}")
+                pending, pending_flows, deadline = [], 0, None
+
+            if time.perf_counter() - self._last_report >= self.report_interval:
+                self.report()
+        self.report()
+
+    # === Reporting ===
+
+    def latency_percentiles(self):
+        if not self._latencies:
+            return None, None
+        # Flow-weighted percentiles: the first latency whose cumulative flow count reaches q
+        latency, weight = np.array(self._latencies).T
+        order = np.argsort(latency, kind="stable")
+        cumulative = np.cumsum(weight[order])
+        idx = np.searchsorted(cumulative, np.array([0.50, 0.99]) * cumulative[-1], side="left")
+        p50, p99 = latency[order[np.minimum(idx, len(order) - 1)]]
+        return p50, p99
+
+    def report(self):
+        now = time.perf_counter()
+        elapsed = now - self._last_report
+        rate = (self.flows_scored - self._last_report_scored) / elapsed if elapsed > 0 else 0.0
+        p50, p99 = self.latency_percentiles()
+
+        stats = {
+            "time": time.time(),
+            "uptime_s": time.time() - self._started,
+            "flows_received": self.flows_received,
+            "flows_scored": self.flows_scored,
+            "batches": self.batches,
+            "queue_depth": self.queue.qsize(),
+            "dropped_datagrams": self.dropped_datagrams,
+            "dropped_flows": self.dropped_flows,
+            "rejected_lines": self.rejected_lines,
+            "failed_batches": self.failed_batches,
+            "failed_flows": self.failed_flows,
+            "flows_per_s": rate,
+            "latency_p50_s": p50,
+            "latency_p99_s": p99,
+        }
+        with stage("write"):
+            os.makedirs(self.output_folder, exist_ok=True)
+            _write_atomic(os.path.join(self.output_folder, "stats.json"), lambda path: _dump_json(stats, path))
+            final_df = self.summary.to_frame()
+            if not final_df.empty:
+                _write_atomic(os.path.join(self.output_folder, "port_attack_summary.csv"),
+                              lambda path: final_df.to_csv(path, index=False))
+        instrumentation.flush()  # the metrics report follows stats.json instead of waiting for exit
+
+        latency = "n/a" if p50 is None else f"p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms"
+        print(f" [ids] scored {self.flows_scored} flows ({rate:,.0f}/s), queue {self.queue.qsize()}, "
+              f"dropped {self.dropped_flows}, rejected {self.rejected_lines + self.failed_flows}, latency {latency}")
+
+        self._last_report = now
+        self._last_report_scored = self.flows_scored
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Real-time IDS: score flows streamed over UDP or TCP")
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--batch-timeout", type=float, default=BATCH_TIMEOUT)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--report-interval", type=float, default=REPORT_INTERVAL)
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER)
+    parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+    parser.add_argument("--models", type=parse_model_keys, default=DEFAULT_MODELS,
+                        help=f"Comma separated models to score with ({', '.join(MODELS)}) or all")
+    parser.add_argument("--no-mmap", action="store_true")
+    parser.add_argument("--compiled-forests", nargs="?", const="sklearn", choices=EVALUATORS,
+                        help="Load RF and DDoS2Vec from their forest_compiler .npz when up to date")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    instrumentation.configure_from_args(args, "ids_daemon")
+    port_detection.load_models(args.models, None if args.no_mmap else "r", args.compiled_forests)
+
+    daemon = IDSDaemon(args.batch_size, args.batch_timeout, args.queue_size, args.report_interval,
+                       args.output_folder)
+    serve = daemon.serve_udp if args.protocol == "udp" else daemon.serve_tcp
+    receiver = threading.Thread(target=serve, args=(args.host, args.port), daemon=True)
+    receiver.start()
+    if args.duration is not None:
+        timer = threading.Timer(args.duration, daemon.stop_event.set)
+        timer.daemon = True
+        timer.start()
+
+    print(f" Listening for flows on {args.protocol}://{args.host}:{args.port}")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop_event.set()
+        daemon.run()  # drain what is already queued
+    receiver.join(timeout=1)
+    instrumentation.write_report()
+
+
+if __name__ == "__main__":
+    main()
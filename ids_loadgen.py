@@ -0,0 +1,135 @@
+# ids_loadgen.py
+"""
+Replays a labeled CSV (training_data/ layout) into ids_daemon.py and checks the result.
+
+After sending, waits for the daemon's stats.json to account for every flow (scored or
+dropped) and prints the daemon's latency percentiles next to the send rate.
+"""
+import os
+import json
+import time
+import socket
+import argparse
+from flow_loader import IP_COLUMNS, LABEL_COLUMN, _column_names, count_rows, read_flows
+from ids_daemon import HOST, PORT, OUTPUT_FOLDER
+from port_detection import COLUMNS
+from silk_io import ipv4_to_str
+
+# === CONFIG ===
+LINES_PER_DATAGRAM = 100  # Keeps datagrams well under the 64 KiB UDP limit
+
+
+def load_lines(csv_path, limit=None):
+    """
+    Reads the flows of `csv_path` (the first `limit` rows if set) as wire-format lines.
+    Rows the flow loader cannot type are not sent; their number is printed.
+
+    Returns:
+        tuple: (list of encoded lines, label counts or None if the CSV has no label column)
+    """
+    columns = COLUMNS + [LABEL_COLUMN] if LABEL_COLUMN in _column_names(csv_path, None, None) else COLUMNS
+    if limit is None:
+        df = read_flows(csv_path, columns)
+    else:
+        df = next(read_flows(csv_path, columns, chunk_size=limit))
+    read = count_rows(csv_path) if limit is None else min(limit, count_rows(csv_path))
+    if read > len(df):
+        print(f" Warning: skipped {read - len(df)} rows of {csv_path} with a missing or invalid flow field")
+
+    for col in IP_COLUMNS:
+        df[col] = ipv4_to_str(df[col]).to_numpy()
+    text = df[COLUMNS].to_csv(index=False, header=False)
+    labels = df[LABEL_COLUMN].value_counts() if LABEL_COLUMN in df else None
+    return [line.encode() for line in text.splitlines()], labels
+
+
+def send_lines(lines, protocol, host, port, rate=None, lines_per_datagram=LINES_PER_DATAGRAM):
+    """
+    Sends lines in groups of `lines_per_datagram`, optionally paced to `rate` flows/s.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM if protocol == "udp" else socket.SOCK_STREAM)
+    if protocol == "tcp":
+        sock.connect((host, port))
+
+    start = time.perf_counter()
+    with sock:
+        for i in range(0, len(lines), lines_per_datagram):
+            payload = b"\n".join(lines[i:i + lines_per_datagram]) + b"\n"
+            if protocol == "udp":
+                sock.sendto(payload, (host, port))
+            else:
+                sock.sendall(payload)
+            if rate:
+                delay = start + (i + lines_per_datagram) / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    return time.perf_counter() - start
+
+
+def read_stats(output_folder):
+    path = os.path.join(output_folder, "stats.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def accounted_flows(stats):
+    # Flows the daemon is done with: scored, dropped on a full queue, or rejected as malformed
+    return (stats["flows_scored"] + stats["dropped_flows"] + stats.get("rejected_lines", 0)
+            + stats.get("failed_flows", 0))
+
+
+def wait_for_stats(output_folder, expected, baseline, timeout):
+    # Polls until the daemon has accounted for everything sent since `baseline`
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        stats = read_stats(output_folder)
+        if stats is not None:
+            done = accounted_flows(stats) - baseline
+            if done >= expected:
+                return stats
+        time.sleep(0.2)
+    return read_stats(output_folder)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay a labeled CSV into ids_daemon.py")
+    parser.add_argument("csv", help="Labeled CSV, e.g. training_data/<file>.csv")
+    parser.add_argument("--protocol", choices=["udp", "tcp"], default="udp")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--rate", type=float, default=None, help="Flows per second (default: as fast as possible)")
+    parser.add_argument("--limit", type=int, default=None, help="Send only the first N flows")
+    parser.add_argument("--output-folder", default=OUTPUT_FOLDER, help="Daemon output folder holding stats.json")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for the daemon to catch up")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    lines, labels = load_lines(args.csv, args.limit)
+    before = read_stats(args.output_folder)
+    baseline = 0 if before is None else accounted_flows(before)
+
+    elapsed = send_lines(lines, args.protocol, args.host, args.port, args.rate)
+    print(f" Sent {len(lines)} flows over {args.protocol} in {elapsed:.2f}s ({len(lines) / elapsed:,.0f} flows/s)")
+    if labels is not None:
+        print(" Labels sent:\n" + labels.to_string())
+
+    stats = wait_for_stats(args.output_folder, len(lines), baseline, args.timeout)
+    if stats is None:
+        print(f" No stats.json in {args.output_folder}/ - is ids_daemon.py running?")
+        raise SystemExit(1)
+
+    done = accounted_flows(stats) - baseline
+    print(f" Daemon: scored {stats['flows_scored']}, dropped {stats['dropped_flows']}, "
+          f"rejected {stats.get('rejected_lines', 0) + stats.get('failed_flows', 0)}, "
+          f"latency p50 {stats['latency_p50_s']}, p99 {stats['latency_p99_s']}")
+    if done < len(lines):
+        print(f" Daemon accounted for only {done} of {len(lines)} flows within {args.timeout}s")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# incremental_training.py
+import os
+import math
+import tempfile
+import hashlib
+import numpy as np
+from sklearn.preprocessing import LabelEncoder
+from streaming_metrics import ConfusionMatrix
+from npy_writer import NpyWriter
+from flow_features import FlowFeatureTransformer, RAW_COLS
+from feature_store import LABEL_COLUMN
+from instrumentation import stage, iter_stage
+
+# === CONFIG ===
+CHUNK_SIZE = 500_000  # Rows per chunk (and roughly per RF bag); bounds peak memory
+TEST_SIZE = 0.25
+SPLIT_SEED = 42
+
+
+def _splitmix64(x):
+    with np.errstate(over="ignore"):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def row_hashes(entry, start, stop, seed=SPLIT_SEED):
+    """
+    64-bit hash of rows start..stop of one feature store file.
+
+    Depends only on the seed, the file and the row position, so the split of a row is the
+    same in every pass, for every chunk size, and when other files are added to the store.
+    """
+    salt = int.from_bytes(hashlib.sha256(f"{seed}:{entry['dir']}".encode()).digest()[:8], "little")
+    return _splitmix64(np.arange(start, stop, dtype=np.uint64) + np.uint64(salt))
+
+
+class StreamingDataset:
+    """
+    The labeled flows of a feature store as RF/NB model inputs, read one chunk at a time.
+
+    Rows are assigned to the test set by hash (about `test_size` of them) instead of
+    train_test_split, so no pass ever needs the whole dataset in memory. The feature
+    transformer and label encoder are fitted from the store without loading it: the
+    protocols from one pass over the proto column, the classes from the store labels.
+
+    Parameters:
+        store (FeatureStore): Source flows.
+        chunk_size (int): Rows read per step.
+        test_size (float): Fraction of rows held out for evaluation.
+        seed (int): Hash seed of the split.
+    """
+
+    def __init__(self, store, chunk_size=CHUNK_SIZE, test_size=TEST_SIZE, seed=SPLIT_SEED):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.test_size = test_size
+        self.seed = seed
+
+        self.features = FlowFeatureTransformer.from_protocols(store.unique_values("proto"))
+
+        self.label_encoder = LabelEncoder().fit(store.present_labels())
+        self.n_classes = len(self.label_encoder.classes_)
+        self.store_to_label = store.label_codes({label: i for i, label in enumerate(self.label_encoder.classes_)})
+
+    def _iter_subset(self, subset):
+        # (X, y, row hashes) of the rows of `subset` in each chunk
+        for entry in self.store.files:
+            chunks = self.store.iter_chunks(RAW_COLS + [LABEL_COLUMN], chunk_size=self.chunk_size, files=[entry])
+            for i, df in enumerate(iter_stage("load", chunks)):
+                start = i * self.chunk_size
+                hashes = row_hashes(entry, start, start + len(df), self.seed)
+                test = (hashes >> np.uint64(11)).astype(np.float64) * 2.0 ** -53 < self.test_size
+                keep = test if subset == "test" else ~test
+
+                if keep.any():
+                    df = df[keep]
+                    with stage("featurize", rows=len(df)):
+                        X, _ = self.features.transform(df)
+                    yield X, self.store_to_label[df[LABEL_COLUMN].cat.codes.to_numpy()], hashes[keep]
+
+    def iter_chunks(self, subset="train"):
+        """
+        Yields (X, y) for the rows of `subset` ("train" or "test") in each chunk.
+        """
+        for X, y, _ in self._iter_subset(subset):
+            yield X, y
+
+    def spill_bags(self, n_bags, work_dir):
+        """
+        Splits the training rows into `n_bags` hash bags in one pass over the store.
+
+        Each chunk is routed to every bag at once and the bags are appended to
+        <work_dir>/bag_<i>_X.npy / bag_<i>_y.npy, so the store is read once however many bags
+        there are, at the cost of one copy of the training features on disk (28 bytes a row).
+        Rows keep their store order within a bag.
+
+        Returns:
+            list: (X path, y path) of every bag.
+        """
+        paths = [(os.path.join(work_dir, f"bag_{b}_X.npy"), os.path.join(work_dir, f"bag_{b}_y.npy"))
+                 for b in range(n_bags)]
+        writers = [(NpyWriter(X_path, np.float32, (len(RAW_COLS),)), NpyWriter(y_path, np.int64))
+                   for X_path, y_path in paths]
+        try:
+            for X, y, hashes in self._iter_subset("train"):
+                with stage("spill", rows=len(y)):
+                    bags = ((hashes & np.uint64(0xFFFFFFFF)) % np.uint64(n_bags)).astype(np.intp)
+                    order = np.argsort(bags, kind="stable")
+                    bounds = np.searchsorted(bags[order], np.arange(n_bags + 1))
+                    for (X_writer, y_writer), lo, hi in zip(writers, bounds[:-1], bounds[1:]):
+                        if hi > lo:
+                            X_writer.write(X[order[lo:hi]])
+                            y_writer.write(y[order[lo:hi]])
+        finally:
+            for X_writer, y_writer in writers:
+                X_writer.close()
+                y_writer.close()
+        return paths
+
+    def load_train(self):
+        # All training rows in memory, for a single bag
+        X, y = [], []
+        for X_chunk, y_chunk in self.iter_chunks("train"):
+            X.append(X_chunk)
+            y.append(y_chunk)
+        if not X:
+            return np.empty((0, len(RAW_COLS)), dtype=np.float32), np.empty(0, dtype=np.int64)
+        return np.concatenate(X), np.concatenate(y)
+
+
+def train_naive_bayes(dataset, model):
+    # One pass of GaussianNB.partial_fit over the training chunks
+    classes = np.arange(dataset.n_classes)
+    for X, y in dataset.iter_chunks("train"):
+        with stage("train", rows=len(y)):
+            model.partial_fit(X, y, classes=classes)
+    return model
+
+
+def train_random_forest(dataset, model, work_dir=None):
+    """
+    Grows `model` (a RandomForestClassifier) with warm_start, one batch of trees per bag.
+
+    The training rows are split by hash into bags of about chunk_size rows, so every bag is
+    a uniform sample of the whole store and only one bag is in memory at a time. The
+    model's n_estimators trees are spread evenly over the bags. With several bags, the
+    store is read once and the bags are spilled to a temporary folder in `work_dir`
+    (see StreamingDataset.spill_bags).
+    """
+    n_estimators = model.n_estimators
+    n_train = dataset.store.n_rows * (1 - dataset.test_size)
+    n_bags = max(1, min(n_estimators, math.ceil(n_train / dataset.chunk_size)))
+    trees = np.diff(np.linspace(0, n_estimators, n_bags + 1).round().astype(int))
+
+    with tempfile.TemporaryDirectory(prefix="rf_bags_", dir=work_dir) as tmp:
+        bag_paths = dataset.spill_bags(n_bags, tmp) if n_bags > 1 else None
+
+        model.set_params(warm_start=True)
+        grown = 0
+        for bag, n_trees in enumerate(trees):
+            if bag_paths is None:
+                X, y = dataset.load_train()
+            else:
+                with stage("load_bag") as s:
+                    X, y = np.load(bag_paths[bag][0]), np.load(bag_paths[bag][1])
+                    s.add_rows(len(y))
+            # Every bag must have every class, or the trees would disagree on the class layout
+            missing = np.setdiff1d(np.arange(dataset.n_classes), y)
+            if len(missing):
+                raise ValueError(f"Bag {bag} has no rows of {list(dataset.label_encoder.classes_[missing])}; "
+                                 f"use a larger chunk size")
+
+            grown += n_trees
+            model.set_params(n_estimators=grown)
+            with stage("train", rows=len(y)):
+                model.fit(X, y)
+            print(f" Bag {bag + 1}/{n_bags}: {len(y)} rows, {grown} trees")
+
+    model.set_params(warm_start=False)
+    return model
+
+
+def evaluate(model, dataset):
+    cm = ConfusionMatrix(dataset.n_classes)
+    for X, y in dataset.iter_chunks("test"):
+        with stage("predict", rows=len(y)):
+            y_pred = model.predict(X)
+        with stage("aggregate", rows=len(y)):
+            cm.update(y, y_pred)
+    return cm
@@ -0,0 +1,354 @@
+# instrumentation.py
+"""
+Per-stage timers, row counters and peak-RSS sampling for the pipeline scripts.
+
+Entry points call configure() (usually through add_arguments / configure_from_args) and
+write_report() at the end of main(); services that never end call flush() periodically. Until configure() is called every helper is a no-op:
+stage() hands back one shared null context and iter_stage() returns the iterable unchanged,
+so instrumented code pays one function call per chunk when metrics are off.
+
+    with stage("predict", rows=len(X)):
+        y_pred = model.predict(X)
+
+    for df in iter_stage("load", read_chunks(path)):   # times each next() and counts len(df)
+        ...
+
+The report is JSON, or a Prometheus textfile when the path ends in .prom. Stages named in
+--profile (or "all") also run under cProfile; their stats go to <report>.<stage>.prof.
+cProfile, pstats and json are imported on first use, so a run without metrics does not pay
+for them either.
+"""
+import os
+import sys
+import time
+import atexit
+import resource
+import threading
+
+# === CONFIG ===
+METRICS_ENV = "FLOW_METRICS"  # Default report path when --metrics is not given
+PROFILE_ENV = "FLOW_PROFILE"  # Default stages to profile
+PROFILE_TOP = 15              # Functions listed per profiled stage in the JSON report
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _rss_mb():
+    # (current, peak) resident set size of this process in MB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * PAGE_SIZE / 1048576
+    except OSError:  # no procfs: the peak is the best estimate available
+        current = peak
+    return current, peak
+
+
+def _empty_stats():
+    import pstats
+
+    return pstats.Stats()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_rows(self, n):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, recorder, name, rows):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows or 0
+        self.profiler = None
+
+    def add_rows(self, n):
+        self.rows += n
+
+    def __enter__(self):
+        if self.recorder.profiles(self.name):
+            import cProfile
+
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:  # another profiler is already active on this thread (nested stage)
+                self.profiler = None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.recorder.record(self.name, elapsed, self.rows, self.profiler)
+        return False
+
+    def cancel(self):
+        # Leaves the stage without recording it
+        if self.profiler is not None:
+            self.profiler.disable()
+
+
+class Recorder:
+    """
+    Collects per-stage seconds, calls and rows plus named counters for one process.
+
+    Parameters:
+        script (str): Name of the entry point, used as a label in the report.
+        output (str or None): Report path (.json or .prom).
+        profile (set): Stage names to run under cProfile, or {"all"}.
+    """
+
+    def __init__(self, script, output=None, profile=()):
+        self.script = script
+        self.output = output
+        self.profile = set(profile)
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.peak_rss_mb = 0.0
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def profiles(self, name):
+        return name in self.profile or "all" in self.profile
+
+    def record(self, name, seconds, rows=0, profiler=None):
+        current, peak = _rss_mb()
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0, "max_rss_mb": 0.0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+            entry["rows"] += rows
+            entry["max_rss_mb"] = max(entry["max_rss_mb"], current)
+            self.peak_rss_mb = max(self.peak_rss_mb, peak)
+            if profiler is not None:
+                import pstats
+
+                if name in self._profiles:
+                    self._profiles[name].add(profiler)
+                else:
+                    self._profiles[name] = pstats.Stats(profiler)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self):
+        """
+        Returns and resets the stage and counter totals, for shipping from a worker process
+        to the parent (see merge).
+        """
+        with self._lock:
+            snap = {"stages": self.stages, "counters": self.counters, "peak_rss_mb": _rss_mb()[1],
+                    "profiles": {name: stats.stats for name, stats in self._profiles.items()}}
+            self.stages, self.counters, self._profiles = {}, {}, {}
+        return snap
+
+    def merge(self, snap):
+        with self._lock:
+            for name, other in snap["stages"].items():
+                entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0, "rows": 0, "max_rss_mb": 0.0})
+                for key in ("seconds", "calls", "rows"):
+                    entry[key] += other[key]
+                entry["max_rss_mb"] = max(entry["max_rss_mb"], other["max_rss_mb"])
+            for name, n in snap["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            self.peak_rss_mb = max(self.peak_rss_mb, snap["peak_rss_mb"])
+            for name, raw in snap["profiles"].items():
+                stats = _empty_stats()
+                stats.stats = raw
+                if name in self._profiles:
+                    self._profiles[name].add(stats)
+                else:
+                    self._profiles[name] = stats
+
+    def report(self):
+        self.peak_rss_mb = max(self.peak_rss_mb, _rss_mb()[1])
+        stages = {}
+        for name, entry in self.stages.items():
+            stages[name] = dict(entry, seconds=round(entry["seconds"], 6), max_rss_mb=round(entry["max_rss_mb"], 1))
+            if entry["rows"] and entry["seconds"] > 0:
+                stages[name]["rows_per_s"] = round(entry["rows"] / entry["seconds"], 1)
+        report = {
+            "script": self.script,
+            "pid": os.getpid(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(self.started)),
+            "wall_s": round(time.perf_counter() - self.start, 6),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "stages": stages,
+            "counters": dict(self.counters),
+        }
+        if self._profiles:
+            report["profiles"] = {name: self._top_functions(stats) for name, stats in self._profiles.items()}
+        return report
+
+    @staticmethod
+    def _top_functions(stats):
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        return [{"function": f"{path}:{line}({func})", "calls": calls, "cumulative_s": round(cumtime, 6)}
+                for (path, line, func), (_, calls, _, cumtime, _) in rows]
+
+    def prometheus(self, report):
+        labels = f'script="{self.script}"'
+        lines = [
+            "# TYPE flow_run_seconds gauge", f"flow_run_seconds{{{labels}}} {report['wall_s']}",
+            "# TYPE flow_peak_rss_bytes gauge", f"flow_peak_rss_bytes{{{labels}}} {int(report['peak_rss_mb'] * 1048576)}",
+        ]
+        for metric, key in (("flow_stage_seconds_total", "seconds"), ("flow_stage_calls_total", "calls"),
+                            ("flow_stage_rows_total", "rows")):
+            lines.append(f"# TYPE {metric} counter")
+            lines += [f'{metric}{{{labels},stage="{name}"}} {entry[key]}' for name, entry in report["stages"].items()]
+        lines.append("# TYPE flow_counter_total counter")
+        lines += [f'flow_counter_total{{{labels},name="{name}"}} {n}' for name, n in report["counters"].items()]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        if not self.output:
+            return None
+        import json
+
+        report = self.report()
+        tmp_path = self.output + ".tmp"
+        with open(tmp_path, "w") as f:
+            if self.output.endswith(".prom"):
+                f.write(self.prometheus(report))
+            else:
+                json.dump(report, f, indent=2)
+        os.replace(tmp_path, self.output)  # textfile collectors never read a partial file
+
+        base = os.path.splitext(self.output)[0]
+        for name, stats in self._profiles.items():
+            stats.dump_stats(f"{base}.{name}.prof")
+        return self.output
+
+
+recorder = None
+
+
+def configure(script=None, output=None, profile=None):
+    """
+    Turns instrumentation on for this process. Without an output path (argument or
+    FLOW_METRICS) and profile stages (argument or FLOW_PROFILE) it stays off.
+    """
+    global recorder
+    output = output or os.environ.get(METRICS_ENV)
+    profile = profile if profile is not None else os.environ.get(PROFILE_ENV, "")
+    stages = {s for s in profile.split(",") if s} if isinstance(profile, str) else set(profile)
+    if not output and not stages:
+        recorder = None
+        return None
+    if output is None:  # profiling only: keep the .prof files next to the working directory
+        output = f"{script or 'run'}_metrics.json"
+    recorder = Recorder(script or os.path.splitext(os.path.basename(sys.argv[0]))[0], output, stages)
+    atexit.register(recorder.write)
+    return recorder
+
+
+def worker_settings():
+    # Picklable settings for init_worker in pool workers; None when instrumentation is off
+    return None if recorder is None else sorted(recorder.profile)
+
+
+def init_worker(settings):
+    """
+    Pool initializer counterpart of configure(). Worker recorders never write a report;
+    their totals go back to the parent with snapshot() / merge().
+    """
+    global recorder
+    recorder = None if settings is None else Recorder(f"worker-{os.getpid()}", None, settings)
+
+
+def add_arguments(parser):
+    parser.add_argument("--metrics", default=None, metavar="PATH",
+                        help=f"Write per-stage timings to PATH (.json, or .prom for a Prometheus textfile); "
+                             f"default ${METRICS_ENV}")
+    parser.add_argument("--profile", default=None, metavar="STAGES",
+                        help=f"Comma separated stages to run under cProfile, or all; default ${PROFILE_ENV}")
+
+
+def configure_from_args(args, script=None):
+    return configure(script, args.metrics, args.profile)
+
+
+def stage(name, rows=None):
+    if recorder is None:
+        return _NULL_STAGE
+    return _Stage(recorder, name, rows)
+
+
+def timed(name):
+    # Decorator form of stage()
+    def wrap(func):
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return wrap
+
+
+def iter_stage(name, iterable):
+    """
+    Times every next() of `iterable` as stage `name` and counts len() of each item as rows.
+    """
+    if recorder is None:
+        return iterable
+    return _iter_stage(name, iterable)
+
+
+def _iter_stage(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        s = stage(name).__enter__()
+        try:
+            item = next(iterator)
+        except StopIteration:  # the end of the iterable is not a step
+            s.cancel()
+            return
+        except BaseException:
+            s.cancel()
+            raise
+        s.add_rows(len(item) if hasattr(item, "__len__") else 1)
+        s.__exit__(None, None, None)
+        yield item
+
+
+def count(name, n=1):
+    if recorder is not None:
+        recorder.count(name, n)
+
+
+def snapshot():
+    return recorder.snapshot() if recorder is not None else None
+
+
+def merge(snap):
+    if recorder is not None and snap is not None:
+        recorder.merge(snap)
+
+
+def flush():
+    # Rewrites the report of a long-running service without ending the run
+    return recorder.write() if recorder is not None else None
+
+
+def write_report():
+    if recorder is None:
+        return None
+    path = recorder.write()
+    atexit.unregister(recorder.write)
+    print(f" Metrics written to: {path}")
+    return path
@@ -0,0 +1,78 @@
+# migrate_feature_transformers.py
+"""
+Writes rf_/nb_feature_transformer.pkl for models trained before the feature transformer
+was saved with them, so inference uses the proto codes the model was trained with.
+
+- nb: rebuilt from nb_proto_encoder.pkl (the LabelEncoder the model was trained with).
+- rf: the proto encoder was never saved; its codes were LabelEncoder codes of the training
+  protocols, so the transformer is fitted on the protocols of the training feature store.
+  This is exact as long as training_data/ still holds the files the model was trained on.
+
+Models that already have a transformer are left alone unless --force is given.
+"""
+import os
+import argparse
+import joblib
+from feature_store import sync_store
+from flow_features import FlowFeatureTransformer, feature_transformer_path, proto_encoder_path
+
+# === CONFIG ===
+MODEL_PATHS = ["rf_model.pkl", "nb_model.pkl"]
+TRAINING_DATA_FOLDER = "training_data"
+
+
+def migrate(model_path, protocols_from_store, force=False):
+    """
+    Parameters:
+        model_path (str): Path of the model, e.g. "rf_model.pkl".
+        protocols_from_store (callable): Returns the protocols of the training feature store.
+        force (bool): Overwrite an existing transformer.
+
+    Returns:
+        str or None: Path of the written transformer, None if nothing was written.
+    """
+    path = feature_transformer_path(model_path)
+    if not os.path.exists(model_path):
+        print(f" {model_path} not found, skipping")
+        return None
+    if os.path.exists(path) and not force:
+        print(f" {path} already exists, skipping")
+        return None
+
+    encoder_path = proto_encoder_path(model_path)
+    if os.path.exists(encoder_path):
+        protocols = joblib.load(encoder_path).classes_
+        source = encoder_path
+    else:
+        protocols = protocols_from_store()
+        source = "the training feature store"
+
+    FlowFeatureTransformer.from_protocols(protocols).save(path)
+    print(f" Wrote {path} from {source} (protocols {[int(p) for p in protocols]})")
+    return path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Save feature transformers for models trained without one")
+    parser.add_argument("--models", nargs="+", default=MODEL_PATHS)
+    parser.add_argument("--training-data", default=TRAINING_DATA_FOLDER)
+    parser.add_argument("--force", action="store_true", help="Overwrite existing transformers")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    store = []
+
+    def protocols_from_store():
+        if not store:
+            store.append(sync_store(args.training_data))
+        return store[0].unique_values("proto")
+
+    for model_path in args.models:
+        migrate(model_path, protocols_from_store, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# model_registry.py
+import os
+import time
+import argparse
+import threading
+import joblib
+import numpy as np
+from ddos2vec_features import FlowEmbedder, SENTENCE_COLS
+from flow_features import FactorizedFlowFeatureTransformer, load_feature_transformer, RAW_COLS
+from forest_compiler import EVALUATORS, load_classifier
+from instrumentation import stage
+
+# === CONFIG ===
+MMAP_MODE = "r"  # Memory-map model arrays so forked workers share the page cache
+
+# Registry keys (used on the command line) and the display names used in reports
+MODELS = {
+    "rf": "Random Forest",
+    "nb": "Naive Bayes",
+    "ddos2vec": "DDoS2Vec",
+    "lstm": "DDoS2Vec LSTM",
+}
+DEFAULT_MODELS = ["rf", "nb", "ddos2vec"]  # lstm needs keras, so it is only scored when asked for
+EMBEDDING_PATH = "ddos2vec_embedding.model"
+LABEL_MAP_PATH = "ddos2vec_label_map.pkl"
+LSTM_PATH = "ddos2vec_lstm.h5"
+
+
+class ScoringModel:
+    """
+    A loaded classifier together with the input transform it was trained with.
+
+    Parameters:
+        name (str): Display name used in reports.
+        model: Fitted classifier (sklearn estimator, CompiledForest or anything with the same predict()).
+        class_names (np.ndarray): Class name of every label code the model predicts.
+        transform (callable): df -> (X, valid), valid being a row mask or None if all rows are valid.
+        input_columns (list): Flow columns read by `transform`.
+        transform_stage (str): Instrumentation stage `transform` is timed as ("featurize" or "embed").
+        transform_key (hashable or None): Models with equal keys build the same input from a chunk,
+                                          so it is built once per chunk (see ChunkInputs).
+    """
+
+    def __init__(self, name, model, class_names, transform, input_columns, transform_stage="featurize",
+                 transform_key=None):
+        self.name = name
+        self.model = model
+        self.class_names = np.asarray(class_names, dtype=object)
+        self.transform = transform
+        self.input_columns = list(input_columns)
+        self.transform_stage = transform_stage
+        self.transform_key = transform_key
+
+    def label_map(self):
+        return {label: code for code, label in enumerate(self.class_names)}
+
+    def prepare(self, df, inputs=None):
+        # Returns the rows of df the model can score and their model input
+        if inputs is not None and self.transform_key is not None:
+            return inputs.get(self)
+        with stage(self.transform_stage, rows=len(df)):
+            X, valid = self.transform(df)
+            if valid is not None:
+                df = df[valid]
+        return df, X
+
+    def predict(self, X):
+        with stage("predict", rows=len(X)):
+            return self.model.predict(X)
+
+
+class ChunkInputs:
+    """
+    Model inputs of one chunk, shared by every model scoring it.
+
+    The first model asking for an input builds it; models with the same transform_key
+    (RF and NB with the same protocol codes, DDoS2Vec and its LSTM on the same embedding)
+    get the same (rows, X) back, so the chunk is featurized and embedded once.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._inputs = {}
+
+    def get(self, model):
+        prepared = self._inputs.get(model.transform_key)
+        if prepared is None:
+            prepared = self._inputs[model.transform_key] = model.prepare(self.df)
+        return prepared
+
+
+class _SequenceClassifier:
+    # Keras model over (n, 1, dim) sequences of one flow embedding, with the predict() of a classifier
+    def __init__(self, model, batch_size=4096):
+        self.model = model
+        self.batch_size = batch_size
+
+    def predict(self, X):
+        if not len(X):
+            return np.empty(0, dtype=np.int64)
+        scores = self.model.predict(X.reshape((X.shape[0], 1, X.shape[1])), batch_size=self.batch_size, verbose=0)
+        return np.argmax(scores, axis=1)
+
+
+def _embedding_transform(embedder):
+    def transform(df):
+        valid = df[SENTENCE_COLS].notna().all(axis=1).to_numpy()
+        if valid.all():
+            return embedder.transform(df), None
+        return embedder.transform(df[valid]), valid
+    return transform
+
+
+class ModelRegistry:
+    """
+    Loads models by registry key on first use and keeps them for the life of the process.
+
+    Nothing is read from disk until a model is asked for, so a run that scores with a
+    subset of MODELS never pays for the others (gensim is not even imported unless
+    DDoS2Vec is used). With mmap_mode="r" the arrays inside the joblib pickles and the
+    Word2Vec matrices are read-only memory maps shared by every process on the host.
+
+    Parameters:
+        mmap_mode (str or None): Passed to joblib.load / Word2Vec.load.
+        compiled_forests (str or None): Load the RF and DDoS2Vec classifiers from their
+            forest_compiler .npz when one is up to date, scored by this evaluator
+            ("sklearn" or "numpy", see forest_compiler.CompiledForest).
+    """
+
+    def __init__(self, mmap_mode=MMAP_MODE, compiled_forests=None):
+        if compiled_forests is not None and compiled_forests not in EVALUATORS:
+            raise ValueError(f"compiled_forests must be None or one of {EVALUATORS}, got {compiled_forests!r}")
+        self.mmap_mode = mmap_mode
+        self.compiled_forests = compiled_forests
+        self._models = {}
+        self._embedding = None
+        self._lock = threading.Lock()
+        self._loaders = {"rf": self._load_rf, "nb": self._load_nb, "ddos2vec": self._load_ddos2vec,
+                         "lstm": self._load_lstm}
+
+    def _load_forest(self, path):
+        if self.compiled_forests:
+            return load_classifier(path, mmap_mode=self.mmap_mode, evaluator=self.compiled_forests)
+        return joblib.load(path, mmap_mode=self.mmap_mode)
+
+    def _load_sklearn(self, key, model_path, label_encoder_path, load_model):
+        features = load_feature_transformer(model_path)
+        label_encoder = joblib.load(label_encoder_path)
+        model = load_model(model_path)
+        if isinstance(features, FactorizedFlowFeatureTransformer):
+            transform_key = ("features", "factorize")
+        else:
+            transform_key = ("features", features.protocols.tobytes())
+        return ScoringModel(MODELS[key], model, label_encoder.classes_, features.transform,
+                            RAW_COLS, transform_key=transform_key)
+
+    def _load_rf(self):
+        return self._load_sklearn("rf", "rf_model.pkl", "rf_label_encoder.pkl", self._load_forest)
+
+    def _load_nb(self):
+        return self._load_sklearn("nb", "nb_model.pkl", "nb_label_encoder.pkl",
+                                  lambda path: joblib.load(path, mmap_mode=self.mmap_mode))
+
+    def _load_embedding(self):
+        # (transform, class names) shared by the classifiers trained on the DDoS2Vec embedding
+        if self._embedding is None:
+            from gensim.models import Word2Vec
+
+            w2v = Word2Vec.load(EMBEDDING_PATH, mmap=self.mmap_mode)
+            label_map = joblib.load(LABEL_MAP_PATH)
+            inv_label_map = {v: k for k, v in label_map.items()}
+            class_names = [inv_label_map[i] for i in range(max(inv_label_map) + 1)]
+            self._embedding = _embedding_transform(FlowEmbedder(w2v)), class_names
+        return self._embedding
+
+    def _load_embedding_model(self, key, model):
+        transform, class_names = self._load_embedding()
+        return ScoringModel(MODELS[key], model, class_names, transform, SENTENCE_COLS, transform_stage="embed",
+                            transform_key=("embed", EMBEDDING_PATH))
+
+    def _load_ddos2vec(self):
+        return self._load_embedding_model("ddos2vec", self._load_forest("ddos2vec_classifier.pkl"))
+
+    def _load_lstm(self):
+        from keras.models import load_model
+
+        return self._load_embedding_model("lstm", _SequenceClassifier(load_model(LSTM_PATH)))
+
+    def get(self, key):
+        """
+        Returns the ScoringModel for `key`, loading it on first use.
+        """
+        model = self._models.get(key)
+        if model is None:
+            with self._lock:  # threads asking for the same model wait for one load
+                model = self._models.get(key)
+                if model is None:
+                    start = time.perf_counter()
+                    with stage("load_model"):
+                        model = self._models[key] = self._loaders[key]()
+                    print(f" Loaded {model.name} in {time.perf_counter() - start:.2f}s (pid {os.getpid()})")
+        return model
+
+    def preload(self, keys):
+        for key in keys:
+            self.get(key)
+
+
+def parse_model_keys(value):
+    """
+    argparse type for --models: a comma separated list of MODELS keys, or "all".
+    """
+    if value == "all":
+        return list(MODELS)
+    keys = [k.strip() for k in value.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in MODELS]
+    if unknown or not keys:
+        raise argparse.ArgumentTypeError(f"unknown model(s) {unknown}, choose from {', '.join(MODELS)} or all")
+    return keys
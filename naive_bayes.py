@@ -1,54 +1,99 @@
-import pandas as pd
-import glob
+import argparse
 from sklearn.model_selection import train_test_split
 from sklearn.naive_bayes import GaussianNB
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
+import instrumentation
+from instrumentation import stage
+from feature_store import sync_store
+from flow_features import FlowFeatureTransformer, feature_transformer_path
+from incremental_training import CHUNK_SIZE, StreamingDataset, train_naive_bayes, evaluate
 
-#  Load and Combine CSVs 
-csv_files = glob.glob("training_data/*.csv")
-print(f" Found {len(csv_files)} CSV files")
 
-df_list = [pd.read_csv(f) for f in csv_files]
-df = pd.concat(df_list, ignore_index=True)
-df.dropna(inplace=True)
+def train_in_memory(store):
+    with stage("load") as s:
+        df = store.load()
+        s.add_rows(len(df))
 
-# Optional: Sample down to 1M rows if dataset too large
-# df = df.sample(n=1_000_000, random_state=42)
+    #  Build features (SKIP sip/dip for optimization); proto goes through the transformer's lookup table
+    with stage("featurize", rows=len(df)):
+        features = FlowFeatureTransformer()
+        X, _ = features.fit_transform(df)
 
-#  Encode protocol field only
-proto_encoder = LabelEncoder()
-df["proto_enc"] = proto_encoder.fit_transform(df["proto"])
+        #  Label encode target
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform(df["label"])
 
-# Select features (SKIP sip/dip for optimization) 
-feature_cols = ["sport", "dport", "proto_enc", "packets", "bytes"]
-X = df[feature_cols]
+    #  Split train/test
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
 
-#  Label encode target 
-label_encoder = LabelEncoder()
-y = label_encoder.fit_transform(df["label"])
+    #  Train Naive Bayes
+    print(" Training Gaussian Naive Bayes...")
+    model = GaussianNB()
+    with stage("train", rows=len(y_train)):
+        model.fit(X_train, y_train)
 
-#  Split train/test 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42)
+    #  Evaluate
+    with stage("predict", rows=len(y_test)):
+        y_pred = model.predict(X_test)
 
-#  Train Naive Bayes 
-print(" Training Gaussian Naive Bayes...")
-model = GaussianNB()
-model.fit(X_train, y_train)
+    print(" Classification Report:")
+    print(classification_report(y_test, y_pred, target_names=label_encoder.classes_))
 
-#  Evaluate 
-y_pred = model.predict(X_test)
+    print(" Confusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+    return model, label_encoder, features
 
-print(" Classification Report:")
-print(classification_report(y_test, y_pred, target_names=label_encoder.classes_))
 
-print(" Confusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
+def train_out_of_core(store, chunk_size):
+    # GaussianNB.partial_fit over hash-split chunks; memory does not grow with the store
+    dataset = StreamingDataset(store, chunk_size)
 
-# === Save model and encoders ===
-joblib.dump(model, "nb_model.pkl")
-joblib.dump(label_encoder, "nb_label_encoder.pkl")
-joblib.dump(proto_encoder, "nb_proto_encoder.pkl")
+    print(" Training Gaussian Naive Bayes (out of core)...")
+    model = train_naive_bayes(dataset, GaussianNB())
 
-print("\n Naive Bayes model and encoders saved!")
+    cm = evaluate(model, dataset)
+    print(" Classification Report:")
+    print(cm.report(dataset.label_encoder.classes_))
+
+    print(" Confusion Matrix:")
+    print(cm.matrix)
+    return model, dataset.label_encoder, dataset.features
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the Gaussian Naive Bayes flow classifier")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Stream the store in chunks instead of loading it into memory")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    instrumentation.configure_from_args(args, "naive_bayes")
+
+    #  Load the columnar feature store (rows with missing values are dropped at ingest)
+    with stage("sync_store"):
+        store = sync_store("training_data")
+    print(f" Found {len(store.files)} CSV files")
+
+    if args.out_of_core:
+        model, label_encoder, features = train_out_of_core(store, args.chunk_size)
+    else:
+        model, label_encoder, features = train_in_memory(store)
+
+    # === Save model and encoders ===
+    with stage("write"):
+        joblib.dump(model, "nb_model.pkl")
+        joblib.dump(label_encoder, "nb_label_encoder.pkl")
+        features.save(feature_transformer_path("nb_model.pkl"))
+
+    print("\n Naive Bayes model and encoders saved!")
+    instrumentation.write_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# npy_writer.py
+import os
+import numpy as np
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+HEADER_LEN = 128  # Fixed header size, large enough for any 2-D shape; rewritten on close
+
+
+def _npy_header(dtype, shape):
+    header = repr({"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                   "shape": tuple(shape)}).encode("latin1")
+    body_len = HEADER_LEN - len(NPY_MAGIC) - 2
+    if len(header) + 1 > body_len:
+        raise ValueError(f"npy header for shape {shape} does not fit in {HEADER_LEN} bytes")
+    header = header.ljust(body_len - 1) + b"\n"
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
+
+
+class NpyWriter:
+    """
+    Appends rows to a .npy file whose final length is not known in advance.
+
+    The header is written with a fixed padded length and rewritten with the real row count
+    on close, so the result is a plain .npy that np.load(path, mmap_mode="r") opens
+    without pickle. Rows are appended straight to disk; nothing is kept in memory.
+
+    Parameters:
+        path (str): Output .npy file.
+        dtype: Element dtype.
+        row_shape (tuple): Shape of one row, e.g. (15,).
+    """
+
+    def __init__(self, path, dtype, row_shape=()):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.n_rows = 0
+        self._file = open(path + ".tmp", "wb")
+        self._file.write(_npy_header(self.dtype, (0,) + self.row_shape))
+
+    def write(self, rows):
+        rows = np.ascontiguousarray(rows, dtype=self.dtype)
+        if rows.shape[1:] != self.row_shape:
+            raise ValueError(f"Expected rows of shape {self.row_shape}, got {rows.shape[1:]}")
+        self._file.write(rows.tobytes())
+        self.n_rows += len(rows)
+
+    def close(self):
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.write(_npy_header(self.dtype, (self.n_rows,) + self.row_shape))
+        self._file.close()
+        self._file = None
+        os.replace(self.path + ".tmp", self.path)  # a crashed run never leaves a truncated .npy behind
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,102 @@
+# port_aggregation.py
+import numpy as np
+import pandas as pd
+
+# rwcut's default timestamp rendering, e.g. 2025/04/01T15:00:00.123
+STIME_FORMAT = "%Y/%m/%dT%H:%M:%S.%f"
+
+
+def parse_stime(values):
+    stime = pd.to_datetime(pd.Series(values), format=STIME_FORMAT, errors="coerce")
+    if stime.isna().all() and len(stime):
+        stime = pd.to_datetime(pd.Series(values), errors="coerce")
+    return stime.to_numpy(dtype="datetime64[ns]")
+
+
+def _merge_tables(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    merged = pd.concat([a, b])
+    return merged.groupby(level=["port", "label"], sort=False).agg(
+        {"count": "sum", "first_stime": "min", "last_stime": "max"}
+    )
+
+
+class PortAttackSummary:
+    """
+    Mergeable per-model, per-port attack detection counts.
+
+    Each model keeps one small table indexed by (port, attack label) holding the number of
+    flows predicted as that attack plus the first and last stime seen. Tables are built with
+    one vectorized groupby per chunk and combined with merge(), so partial summaries from
+    chunks, files and worker processes reduce into one without keeping any per-file frames.
+    """
+
+    def __init__(self):
+        self.tables = {}
+
+    def add(self, model_name, class_names, codes, dport, stime=None):
+        """
+        Adds one chunk of predictions.
+
+        Parameters:
+            model_name (str): Model the predictions came from.
+            class_names (array-like): Class name for every encoded label code.
+            codes (array-like): Encoded predicted labels, one per flow.
+            dport (array-like): Destination port of each flow.
+            stime (array-like or None): Flow start times (strings or datetimes).
+        """
+        class_names = np.asarray(class_names).astype(str)
+        codes = np.asarray(codes, dtype=np.int64)
+        attack_classes = np.char.lower(class_names) != "normal"
+
+        attack = attack_classes[codes]
+        if not attack.any():
+            return self
+
+        if stime is None:
+            stime = np.full(len(codes), np.datetime64("NaT"), dtype="datetime64[ns]")
+        else:
+            stime = parse_stime(stime)
+
+        chunk = pd.DataFrame({
+            "port": np.asarray(dport)[attack].astype(np.int64),
+            "label": class_names[codes[attack]],
+            "first_stime": stime[attack],
+        })
+        chunk["last_stime"] = chunk["first_stime"]
+        table = chunk.groupby(["port", "label"], sort=False).agg(
+            count=("first_stime", "size"), first_stime=("first_stime", "min"), last_stime=("last_stime", "max")
+        )
+        self.tables[model_name] = _merge_tables(self.tables.get(model_name), table)
+        return self
+
+    def merge(self, other):
+        for model_name, table in other.tables.items():
+            self.tables[model_name] = _merge_tables(self.tables.get(model_name), table)
+        return self
+
+    def to_frame(self):
+        """
+        Final reduce: one row per model and port with the total attack count, one count
+        column per attack class and the first/last stime of the detected flows.
+        """
+        frames = []
+        for model_name, table in self.tables.items():
+            per_class = table["count"].unstack("label", fill_value=0)
+            times = table.groupby(level="port").agg({"first_stime": "min", "last_stime": "max"})
+            frame = per_class.join(times)
+            frame.insert(0, "attack_count", per_class.sum(axis=1))
+            frame.insert(0, "model", model_name)
+            frames.append(frame.reset_index())
+
+        if not frames:
+            return pd.DataFrame(columns=["model", "port", "attack_count", "first_stime", "last_stime"])
+
+        summary = pd.concat(frames, ignore_index=True)
+        class_cols = [c for c in summary.columns if c not in ("model", "port", "attack_count", "first_stime", "last_stime")]
+        summary[class_cols] = summary[class_cols].fillna(0).astype(np.int64)
+        summary = summary[["model", "port", "attack_count"] + sorted(class_cols) + ["first_stime", "last_stime"]]
+        return summary.sort_values(by=["model", "attack_count"], ascending=[True, False], ignore_index=True)
@@ -1,135 +1,202 @@
 import os
 import glob
-import pandas as pd
-import numpy as np
-from collections import defaultdict
-from gensim.models import Word2Vec
-import joblib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+import argparse
+from port_aggregation import PortAttackSummary
+from flow_loader import read_flows
+from forest_compiler import EVALUATORS
+from model_registry import MODELS, DEFAULT_MODELS, ChunkInputs, ModelRegistry, parse_model_keys
+import instrumentation
+from instrumentation import stage, iter_stage
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 # === CONFIG ===
 ATTACK_DATA_FOLDER = "attack_data"  # Folder with test data (no labels)
 OUTPUT_FOLDER = "results_attack_eval"
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 NUM_THREADS = 20
+NUM_WORKERS = os.cpu_count()  # Worker processes in process mode
+CHUNK_SIZE = None  # Rows per read_csv chunk, None reads each file in one go
+COLUMNS = ["sip", "dip", "sport", "dport", "proto", "packets", "bytes", "stime", "etime"]
+READ_COLUMNS = ["sport", "dport", "proto", "packets", "bytes", "stime"]  # Model inputs plus stime for the summary
 
-# === Load Models ===
-print(" Loading models...")
+# === Models (set up by init_models, loaded on first use) ===
+registry = None
+model_keys = list(DEFAULT_MODELS)
 
-rf_model = joblib.load("rf_model.pkl")
-rf_label_encoder = joblib.load("rf_label_encoder.pkl")
 
-nb_model = joblib.load("nb_model.pkl")
-nb_label_encoder = joblib.load("nb_label_encoder.pkl")
+def init_models(keys=None, mmap_mode=None, compiled_forests=None):
+    """
+    Sets up the model registry for this process. Models are loaded on first use.
 
-ddos2vec_model = joblib.load("ddos2vec_classifier.pkl")
-ddos2vec_w2v = Word2Vec.load("ddos2vec_embedding.model")
-ddos2vec_label_map = joblib.load("ddos2vec_label_map.pkl")
-ddos2vec_inv_label_map = {v: k for k, v in ddos2vec_label_map.items()}
+    Used once in the main process for thread mode, and as the pool initializer in
+    process mode so each worker loads each selected model at most once. With mmap_mode="r"
+    the numpy arrays inside the joblib pickles (tree nodes, class distributions) and
+    the Word2Vec embedding matrix are memory-mapped read-only, so all workers share
+    the same page-cache pages instead of holding private copies.
 
-# === Helpers ===
-
-def sentence_to_vec(sentence, w2v_model):
-    words = sentence.split()
-    vecs = [w2v_model.wv[w] for w in words if w in w2v_model.wv]
-    if not vecs:
-        return np.zeros(w2v_model.vector_size)
-    return np.mean(vecs, axis=0)
-
-def analyze_port_detections(model_name, predictions_df):
-    attack_counts_by_port = defaultdict(int)
-    for _, row in predictions_df.iterrows():
-        if row["predicted_label"].lower() != "normal":
-            attack_counts_by_port[row["dport"]] += 1
-    return pd.DataFrame(
-        [{"model": model_name, "port": port, "attack_count": count} for port, count in attack_counts_by_port.items()]
-    )
-
-def run_ddos2vec(df):
-    df = df.dropna(subset=["proto", "sport", "dport"])
-    df["sentence"] = df["proto"].astype(str) + "_" + df["sport"].astype(str) + "_" + df["dport"].astype(str)
-    X = np.array([sentence_to_vec(s, ddos2vec_w2v) for s in df["sentence"]])
-    if X.size == 0:
-        raise ValueError("No valid vector inputs for DDoS2Vec.")
-    y_pred = ddos2vec_model.predict(X)
-    df["predicted_label"] = [ddos2vec_inv_label_map[i] for i in y_pred]
-    return df
-
-
-def run_ml_model(df, model, label_encoder):
-    df["proto_enc"] = pd.factorize(df["proto"])[0]
-    feature_cols = ["sport", "dport", "proto_enc", "packets", "bytes"]
-
-    # Remove rows with missing or invalid values in any feature column
-    df = df.dropna(subset=feature_cols)
-    df = df[feature_cols].apply(pd.to_numeric, errors="coerce")  # force all to numeric
-    df = df.dropna()
+    Parameters:
+        keys (list or None): MODELS keys to score with (default: DEFAULT_MODELS).
+        mmap_mode (str or None): Passed to joblib.load / Word2Vec.load.
+        compiled_forests (str or None): Evaluator of the forest_compiler .npz of the RF and
+                                        DDoS2Vec classifiers, None to load the pickles.
+    """
+    global registry, model_keys
+    registry = ModelRegistry(mmap_mode, compiled_forests)
+    model_keys = list(DEFAULT_MODELS) if keys is None else list(keys)
 
-    if df.empty:
-        raise ValueError("No valid rows after cleaning for model input.")
 
-    X = df[feature_cols]
-    y_pred = model.predict(X)
-    df["predicted_label"] = label_encoder.inverse_transform(y_pred)
-    return df
+def init_worker(keys, mmap_mode, compiled_forests, metrics):
+    # Pool initializer of process mode: fresh instrumentation recorder, then the models
+    instrumentation.init_worker(metrics)
+    init_models(keys, mmap_mode, compiled_forests)
 
 
-# === Parallel Processing Function ===
-def process_file_parallel(file_path):
-    result_list = []
+def load_models(keys=None, mmap_mode=None, compiled_forests=None):
+    # Same as init_models, but loads the selected models right away
+    init_models(keys, mmap_mode, compiled_forests)
+    registry.preload(model_keys)
 
-    try:
-        columns = ["sip", "dip", "sport", "dport", "proto", "packets", "bytes", "stime", "etime"]
-        df = pd.read_csv(file_path, names=columns, header=None, low_memory=False)
-    except Exception as e:
-        print(f" Failed to read {file_path}: {e}")
-        return []
 
-    try:
-        df_rf = run_ml_model(df.copy(), rf_model, rf_label_encoder)
-        rf_res = analyze_port_detections("Random Forest", df_rf)
-        result_list.append(rf_res)
-    except Exception as e:
-        print(f" RF error in {file_path}: {e}")
+# === Helpers ===
 
-    try:
-        df_nb = run_ml_model(df.copy(), nb_model, nb_label_encoder)
-        nb_res = analyze_port_detections("Naive Bayes", df_nb)
-        result_list.append(nb_res)
-    except Exception as e:
-        print(f" NB error in {file_path}: {e}")
+def run_model(df, model, inputs=None):
+    # Rows with missing or non-numeric input values are dropped by the model's transform
+    df, X = model.prepare(df, inputs)
+    if df.empty:
+        raise ValueError("No valid rows after cleaning for model input.")
 
-    try:
-        df_vec = run_ddos2vec(df.copy())
-        ddos_res = analyze_port_detections("DDoS2Vec", df_vec)
-        result_list.append(ddos_res)
-    except Exception as e:
-        print(f" DDoS2Vec error in {file_path}: {e}")
+    return df, model.predict(X)
 
-    return result_list
 
-# === Run with ThreadPool ===
-file_paths = glob.glob(os.path.join(ATTACK_DATA_FOLDER, "*.csv"))
-all_results = []
+def read_attack_file(file_path, chunk_size=None):
+    # Only the columns the models and the summary use are parsed, straight into the flow schema dtypes
+    if chunk_size is None:
+        with stage("load") as s:
+            df = read_flows(file_path, READ_COLUMNS, names=COLUMNS)
+            s.add_rows(len(df))
+        yield df
+    else:
+        yield from iter_stage("load", read_flows(file_path, READ_COLUMNS, names=COLUMNS, chunk_size=chunk_size))
 
-print(f"\n Starting threaded processing with {NUM_THREADS} threads...")
 
-with ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
-    futures = {executor.submit(process_file_parallel, path): path for path in file_paths}
-    for future in as_completed(futures):
+def score_flows(df, summary, source):
+    """
+    Scores one chunk of flows with every selected model and adds the verdicts to `summary`.
+    A failing model is reported and skipped so the others still run. Models sharing an
+    input transform share its output, so the chunk is featurized / embedded once.
+    """
+    inputs = ChunkInputs(df)
+    for key in model_keys:
         try:
-            result = future.result()
-            if result:
-                all_results.extend(result)
+            model = registry.get(key)
+            df_model, y_pred = run_model(df, model, inputs)
+            with stage("aggregate", rows=len(y_pred)):
+                summary.add(model.name, model.class_names, y_pred, df_model["dport"], df_model["stime"])
         except Exception as e:
-            print(f" Thread error for {futures[future]}: {e}")
-
-# === Save Output ===
-if all_results:
-    final_df = pd.concat(all_results, ignore_index=True)
-    final_df = final_df.sort_values(by=["model", "attack_count"], ascending=[True, False])
-    output_file = os.path.join(OUTPUT_FOLDER, "port_attack_summary.csv")
-    final_df.to_csv(output_file, index=False)
-    print(f"\n Saved threaded port-based attack summary to: {output_file}")
-else:
-    print(" No predictions made. Check for errors.")
+            print(f" {MODELS[key]} error in {source}: {e}")
+            instrumentation.count("model_errors")
+
+
+# === Parallel Processing Function ===
+def process_file_parallel(file_path, chunk_size=None, ship_metrics=False):
+    """
+    Scores one attack file with every model.
+
+    Returns:
+        tuple: (PortAttackSummary for the file, number of flows scored, instrumentation
+               snapshot or None). Only the small per-port aggregates leave the worker;
+               with ship_metrics (process mode) so do the worker's stage timings.
+               A file that fails part way is dropped whole: (None, 0, ...).
+    """
+    summary = PortAttackSummary()
+    n_flows = 0
+
+    try:
+        for df in read_attack_file(file_path, chunk_size):
+            n_flows += len(df)
+            score_flows(df, summary, file_path)
+    except Exception as e:
+        print(f" Failed to read {file_path}: {e}")
+        summary, n_flows = None, 0
+        instrumentation.count("read_errors")
+
+    return summary, n_flows, instrumentation.snapshot() if ship_metrics else None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Per-port attack detection over attack_data/*.csv")
+    parser.add_argument("--executor", choices=["thread", "process"], default="process",
+                        help="thread: shared-memory ThreadPool (GIL bound), process: one model copy per worker")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Pool size (default {NUM_THREADS} threads / {NUM_WORKERS} processes)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Rows per read_csv chunk inside each file (default: whole file)")
+    parser.add_argument("--models", type=parse_model_keys, default=DEFAULT_MODELS,
+                        help=f"Comma separated models to score with ({', '.join(MODELS)}) or all")
+    parser.add_argument("--compiled-forests", nargs="?", const="sklearn", choices=EVALUATORS,
+                        help="Load RF and DDoS2Vec from their forest_compiler .npz when up to date, "
+                             "scored by sklearn (default) or the NumPy evaluator")
+    parser.add_argument("--no-mmap", action="store_true",
+                        help="Load model arrays into private memory instead of memory-mapping them")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+# === Main ===
+def main():
+    args = parse_args()
+    instrumentation.configure_from_args(args, "port_detection")
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+    file_paths = glob.glob(os.path.join(ATTACK_DATA_FOLDER, "*.csv"))
+    summary = PortAttackSummary()
+    total_flows = 0
+    mmap_mode = None if args.no_mmap else "r"
+
+    if args.executor == "thread":
+        workers = args.workers or NUM_THREADS
+        init_models(args.models, mmap_mode, args.compiled_forests)
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        workers = args.workers or NUM_WORKERS
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                       initargs=(args.models, mmap_mode, args.compiled_forests,
+                                                 instrumentation.worker_settings()))
+
+    print(f"\n Starting {args.executor} processing with {workers} workers...")
+    start = time.perf_counter()
+
+    with executor:
+        ship_metrics = args.executor == "process"
+        futures = {executor.submit(process_file_parallel, path, args.chunk_size, ship_metrics): path
+                   for path in file_paths}
+        for future in as_completed(futures):
+            try:
+                result, n_flows, metrics = future.result()
+                instrumentation.merge(metrics)
+                total_flows += n_flows
+                if result is not None:
+                    summary.merge(result)
+            except Exception as e:
+                print(f" Worker error for {futures[future]}: {e}")
+
+    elapsed = time.perf_counter() - start
+    if elapsed > 0:
+        print(f" Throughput: {len(file_paths) / elapsed:.2f} files/s, {total_flows / elapsed:,.0f} flows/s "
+              f"({len(file_paths)} files, {total_flows} flows in {elapsed:.1f}s)")
+
+    # === Save Output ===
+    with stage("write"):
+        final_df = summary.to_frame()
+        if not final_df.empty:
+            output_file = os.path.join(OUTPUT_FOLDER, "port_attack_summary.csv")
+            final_df.to_csv(output_file, index=False)
+            print(f"\n Saved port-based attack summary to: {output_file}")
+        else:
+            print(" No predictions made. Check for errors.")
+    instrumentation.count("flows", total_flows)
+    instrumentation.write_report()
+
+
+if __name__ == "__main__":
+    main()
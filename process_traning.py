@@ -1,7 +1,14 @@
-import subprocess
-import pandas as pd
 import os
+import shlex
+import argparse
+import numpy as np
+import pandas as pd
 from glob import glob
+import instrumentation
+from instrumentation import stage, iter_stage
+from silk_io import iter_rwcut_batches
+from flow_conversion import (DEFAULT_CONVERTER, NUM_WORKERS, OUTPUT_FORMATS, PartWriter, iter_converter_chunks,
+                             run_parallel)
 
 # === CONFIG ===
 input_folder = "final_dataset_01"      # Folder with .rw files
@@ -26,45 +33,83 @@ fields = "sip,dip,sport,dport,stime,etime,proto,packets,bytes"
 # Max rows per output CSV 
 max_rows_per_csv = 100_000
 
+# Rows read at a time; bounds memory per worker
+CHUNK_SIZE = 50_000
+
+# Output parts: "csv", "csv.gz" or "parquet"
+output_format = "csv"
+
+# dport -> label code lookup table, code 0 is "normal"
+LABELS = ["normal"] + list(attack_port_map.values())
+PORT_LABEL_LUT = np.zeros(65536, dtype=np.uint8)
+PORT_LABEL_LUT[list(attack_port_map)] = np.arange(1, len(LABELS), dtype=np.uint8)
+
+
+def read_chunks(input_rw, converter=DEFAULT_CONVERTER):
+    # converter=None reads the SiLK file natively instead of spawning rwcut
+    if converter is None:
+        return iter_rwcut_batches(input_rw, fields, batch_size=CHUNK_SIZE)
+    return iter_converter_chunks(input_rw, fields, converter, chunk_size=CHUNK_SIZE)
+
 
-def convert_and_label(input_rw, output_prefix, part_num):
-    temp_csv = f"{output_prefix}_raw.csv"
+def label_chunks(chunks):
+    for df in chunks:
+        with stage("label", rows=len(df)):
+            dport = pd.to_numeric(df["dport"], errors="coerce").to_numpy(dtype=np.float64)
+            in_range = (dport >= 0) & (dport < len(PORT_LABEL_LUT))  # False for NaN
+            codes = np.zeros(len(df), dtype=np.uint8)
+            codes[in_range] = PORT_LABEL_LUT[dport[in_range].astype(np.intp)]
+            df["label"] = pd.Categorical.from_codes(codes, categories=LABELS)
+        yield df
+
+
+def write_parts(chunks, out_base, part_num, fmt=output_format):
+    with PartWriter(out_base, part_num, max_rows_per_csv, fmt) as writer:
+        for df in chunks:
+            with stage("write", rows=len(df)):
+                writer.write(df)
+    return writer.paths
+
+
+def convert_and_label(input_rw, output_prefix, part_num, converter=DEFAULT_CONVERTER, fmt=output_format):
+    """
+    Converts, labels and splits one .rw file, one chunk at a time.
+
+    Returns:
+        list: Written part files, deterministically named after part_num.
+    """
     out_base = f"{output_prefix}_part"
+    chunks = iter_stage("load", read_chunks(input_rw, converter))
+    return write_parts(label_chunks(chunks), out_base, part_num, fmt)
+
 
-    # 1. Convert .rw to CSV using rwcut
-    with open(temp_csv, "w") as f:
-        subprocess.run([
-            "rwcut",
-            "--fields", fields,
-            "--no-title",
-            "--delimited=,",
-            input_rw
-        ], stdout=f)
-
-    # 2. Read and label
-    cols = ["sip", "dip", "sport", "dport", "stime", "etime", "proto", "packets", "bytes"]
-    df = pd.read_csv(temp_csv, names=cols)
-    df["label"] = df["dport"].map(attack_port_map).fillna("normal")
-
-    # 3. Split if necessary
-    if len(df) <= max_rows_per_csv:
-        out_file = f"{out_base}_{part_num}.csv"
-        df.to_csv(out_file, index=False)
-    else:
-        for i, start in enumerate(range(0, len(df), max_rows_per_csv)):
-            part_df = df.iloc[start:start + max_rows_per_csv]
-            part_df.to_csv(f"{out_base}_{part_num}_{i}.csv", index=False)
-
-    os.remove(temp_csv)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert and label .rw files into training CSVs")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Converters running at once")
+    parser.add_argument("--converter", default=shlex.join(DEFAULT_CONVERTER),
+                        help="Converter command template with {input}, {fields} and {delimiter} placeholders")
+    parser.add_argument("--native", action="store_true",
+                        help="Read the .rw files directly with silk_io instead of running a converter")
+    parser.add_argument("--format", choices=list(OUTPUT_FORMATS), default=output_format,
+                        help="Output format of the labeled parts")
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
 
 
 # === Main ===
 if __name__ == "__main__":
+    args = parse_args()
+    instrumentation.configure_from_args(args, "process_traning")
+    converter = None if args.native else shlex.split(args.converter)
     rw_files = sorted(glob(os.path.join(input_folder, "*")))
+    jobs = []
     for idx, rw_file in enumerate(rw_files):
         file_name = os.path.basename(rw_file).replace(".", "_")
         output_prefix = os.path.join(output_folder, file_name)
         print(f"📄 Processing {rw_file} -> {output_prefix}")
-        convert_and_label(rw_file, output_prefix, idx)
+        jobs.append((rw_file, output_prefix, idx, converter, args.format))
+    results = run_parallel(convert_and_label, jobs, max_workers=args.workers)
+    instrumentation.count("failed_files", sum(result is None for result in results))
 
     print(f"\n All done! Labeled CSVs saved in '{output_folder}/'")
+    instrumentation.write_report()
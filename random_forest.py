@@ -1,60 +1,110 @@
-import pandas as pd
-import glob
-import os
+import argparse
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
+import instrumentation
+from instrumentation import stage
+from feature_store import sync_store
+from flow_features import FlowFeatureTransformer, feature_transformer_path
+from incremental_training import CHUNK_SIZE, StreamingDataset, train_random_forest, evaluate
 
-# Load all CSVs 
-csv_files = glob.glob("training_data/*.csv")
-print(f" Found {len(csv_files)} CSV files")
 
-df_list = [pd.read_csv(f) for f in csv_files]
-df = pd.concat(df_list, ignore_index=True)
+def make_model():
+    return RandomForestClassifier(
+        n_estimators=50,
+        max_depth=15,
+        n_jobs=-1,
+        random_state=42
+    )
 
-print(f" Combined dataset shape: {df.shape}")
 
-# Preprocess 
-df.dropna(inplace=True)
+def train_in_memory(store):
+    with stage("load") as s:
+        df = store.load()
+        s.add_rows(len(df))
 
-# Label encode only necessary fields
-le_proto = LabelEncoder()
-df["proto_enc"] = le_proto.fit_transform(df["proto"])
+    print(f" Combined dataset shape: {df.shape}")
 
-# Define feature columns (skip sip/dip)
-feature_cols = ["sport", "dport", "proto_enc", "packets", "bytes"]
-X = df[feature_cols]
-y = df["label"]
+    # Build the 5-feature float32 matrix (skip sip/dip); the fitted transformer is saved with the model
+    with stage("featurize", rows=len(df)):
+        features = FlowFeatureTransformer()
+        X, _ = features.fit_transform(df)
+        y = df["label"]
 
-# Encode labels
-le_label = LabelEncoder()
-y_encoded = le_label.fit_transform(y)
+        # Encode labels
+        le_label = LabelEncoder()
+        y_encoded = le_label.fit_transform(y)
 
-# Train/test split 
-X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.25, random_state=42)
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.25, random_state=42)
 
-# Train Random Forest optimized
-print(" Training Random Forest...")
-clf = RandomForestClassifier(
-    n_estimators=50,
-    max_depth=15,
-    n_jobs=-1,
-    random_state=42
-)
-clf.fit(X_train, y_train)
+    # Train Random Forest optimized
+    print(" Training Random Forest...")
+    clf = make_model()
+    with stage("train", rows=len(y_train)):
+        clf.fit(X_train, y_train)
 
-# Evaluate
-y_pred = clf.predict(X_test)
+    # Evaluate
+    with stage("predict", rows=len(y_test)):
+        y_pred = clf.predict(X_test)
 
-print(" Classification Report:")
-print(classification_report(y_test, y_pred, target_names=le_label.classes_))
+    print(" Classification Report:")
+    print(classification_report(y_test, y_pred, target_names=le_label.classes_))
 
-print(" Confusion Matrix:")
-print(confusion_matrix(y_test, y_pred))
+    print(" Confusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+    return clf, le_label, features
 
-# Save model
-joblib.dump(clf, "rf_model.pkl")
-joblib.dump(le_label, "rf_label_encoder.pkl")
-print("\n Model and encoders saved!")
+
+def train_out_of_core(store, chunk_size):
+    # Hash-split bags of ~chunk_size rows; memory does not grow with the store
+    dataset = StreamingDataset(store, chunk_size)
+
+    print(" Training Random Forest (out of core)...")
+    clf = train_random_forest(dataset, make_model())
+
+    cm = evaluate(clf, dataset)
+    print(" Classification Report:")
+    print(cm.report(dataset.label_encoder.classes_))
+
+    print(" Confusion Matrix:")
+    print(cm.matrix)
+    return clf, dataset.label_encoder, dataset.features
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the Random Forest flow classifier")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="Stream the store in chunks instead of loading it into memory")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    instrumentation.configure_from_args(args, "random_forest")
+
+    # Load the columnar feature store (only new or changed CSVs are re-ingested)
+    with stage("sync_store"):
+        store = sync_store("training_data")
+    print(f" Found {len(store.files)} CSV files")
+
+    if args.out_of_core:
+        clf, le_label, features = train_out_of_core(store, args.chunk_size)
+    else:
+        clf, le_label, features = train_in_memory(store)
+
+    # Save model
+    with stage("write"):
+        joblib.dump(clf, "rf_model.pkl")
+        joblib.dump(le_label, "rf_label_encoder.pkl")
+        features.save(feature_transformer_path("rf_model.pkl"))
+    print("\n Model and encoders saved!")
+    instrumentation.write_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
-import subprocess
 import random
 import os
+import shlex
+import argparse
+import time
+import numpy as np
+import pandas as pd
 from glob import glob
+from functools import partial
+from silk_io import FlowWriter, iter_flow_batches, iter_record_batches, records_to_frame
+from flow_loader import ipv4_to_uint32
+from flow_conversion import DEFAULT_CONVERTER, NUM_WORKERS, iter_converter_chunks, readable_silk_file, run_parallel
+from flow_merge import RecordRange, merge_many
+from flow_partition import PortRouter, partition_file
 
 # === Configuration ===
 NORMAL_DATASET_DIR = "01"
@@ -12,6 +22,10 @@ ATTACK_DATASET_FILES = [
 OUTPUT_FOLDER = "final_dataset_chunks"
 TEMP_DIR = "temp"
 BYTE_SPLIT_LIMIT = 512000  # 500 KB per split chunk
+IP_CHUNK_SIZE = 1_000_000  # Flows read at a time when collecting the normal IPs
+IP_REDUCE_SIZE = 8_000_000  # Pending addresses per file before they are merged with np.unique
+REMAP_BATCH_SIZE = 1_000_000  # Attack flows remapped at a time
+REMAP_SEED = 42
 
 # === Attack Labels – Destination ports per attack ===
 ATTACK_PORTS = {
@@ -30,87 +44,281 @@ def get_all_silk_files(directory):
     return sorted([f for f in glob(os.path.join(directory, "*")) if os.path.isfile(f)])
 
 
-def extract_common_ips(dataset_files):
-    print(" Extracting common IPs from normal dataset...")
-    all_ips = set()
+def native_ip_source(path, chunk_size=IP_CHUNK_SIZE):
+    # sip/dip straight from the SiLK file as uint32, no rwcut
+    for df in iter_flow_batches(path, chunk_size, columns=["sip", "dip"]):
+        yield df["sip"].to_numpy(), df["dip"].to_numpy()
 
-    for f in dataset_files:
-        cmd = f"rwcut {f} --fields=sip,dip --no-title --delimited"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
 
-        for line in result.stdout.splitlines():
-            parts = line.strip().split('|')
-            if len(parts) == 2:
-                all_ips.add(parts[0].strip())
-                all_ips.add(parts[1].strip())
+def converter_ip_source(path, converter=DEFAULT_CONVERTER, chunk_size=IP_CHUNK_SIZE):
+    # sip/dip parsed from the converter's (rwcut) stdout as it streams
+    for df in iter_converter_chunks(path, "sip,dip", converter, chunk_size=chunk_size):
+        sip, sip_ok = ipv4_to_uint32(df["sip"].to_numpy())
+        dip, dip_ok = ipv4_to_uint32(df["dip"].to_numpy())
+        yield sip[sip_ok], dip[dip_ok]
 
-    return list(all_ips)
 
+def file_unique_ips(path, source=converter_ip_source):
+    """
+    Distinct addresses (sip and dip) of one flow file.
 
-def modify_attack_ips(input_file, output_text_file, common_ips):
-    print(f" Rewriting IPs in: {input_file}")
-    ip_map = {}
+    Parameters:
+        path (str): Flow file.
+        source (callable): path -> iterable of (sip, dip) uint32 array pairs.
+
+    Returns:
+        np.ndarray: Sorted unique uint32 addresses.
+    """
+    pending, n_pending = [], 0
+    for sip, dip in source(path):
+        pending.append(np.unique(np.concatenate([sip, dip]).astype(np.uint32, copy=False)))
+        n_pending += len(pending[-1])
+        if n_pending > IP_REDUCE_SIZE:
+            pending = [np.unique(np.concatenate(pending))]
+            n_pending = len(pending[0])
+    if not pending:
+        return np.empty(0, dtype=np.uint32)
+    return np.unique(np.concatenate(pending))
 
-    rwcut_cmd = f"rwcut --fields=sip,dip,sport,dport,stime,etime,bytes,packets --no-title --delimited --input-path={input_file}"
-    result = subprocess.run(rwcut_cmd, shell=True, capture_output=True, text=True)
 
+def extract_common_ips(dataset_files, source=converter_ip_source, workers=NUM_WORKERS):
+    """
+    Collects every address seen in the normal traffic, reading up to `workers` files at once.
+
+    Returns:
+        np.ndarray: Sorted unique uint32 addresses, the pool attack IPs are drawn from.
+    """
+    print(" Extracting common IPs from normal dataset...")
+    per_file = run_parallel(file_unique_ips, [(f, source) for f in dataset_files], max_workers=workers,
+                            task="IP collection")
+    per_file = [ips for ips in per_file if ips is not None]
+    if not per_file:
+        return np.empty(0, dtype=np.uint32)
+    common_ips = np.unique(np.concatenate(per_file))
+    print(f" Found {len(common_ips)} distinct IPs")
+    return common_ips
+
+
+class IPRemapper:
+    """
+    Replaces IPv4 addresses with addresses drawn from a pool, consistently.
+
+    The first time an address is seen it gets a replacement drawn uniformly (with
+    replacement) from `pool`; afterwards it keeps that replacement in both sip and dip,
+    in every batch and every attack file remapped with this instance. Each batch is
+    factorized once and all of its new addresses are drawn in one seeded call, so the
+    result is reproducible for a given seed and input.
+
+    Parameters:
+        pool (np.ndarray): uint32 replacement addresses (see extract_common_ips).
+        seed (int): Seed of the replacement draws.
+    """
+
+    def __init__(self, pool, seed=REMAP_SEED):
+        self.pool = np.asarray(pool, dtype=np.uint32)
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0, dtype=np.uint32)    # addresses seen so far, sorted
+        self.values = np.empty(0, dtype=np.uint32)  # their replacements
+
+    def _lookup(self, ips):
+        pos = np.searchsorted(self.keys, ips)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == ips[found]
+        return pos, found
+
+    def remap(self, ips):
+        codes, uniques = pd.factorize(np.asarray(ips, dtype=np.uint32))
+        pos, found = self._lookup(uniques)
+        if not found.all():
+            new = np.sort(uniques[~found])
+            draws = self.pool[self.rng.integers(0, len(self.pool), len(new))]
+            at = np.searchsorted(self.keys, new)
+            self.keys = np.insert(self.keys, at, new)
+            self.values = np.insert(self.values, at, draws)
+            pos, _ = self._lookup(uniques)
+        return self.values[pos][codes]
+
+    def remap_flows(self, flows):
+        # sip and dip of a record array or DataFrame, replaced in place through one lookup
+        n = len(flows)
+        ips = self.remap(np.concatenate([np.asarray(flows["sip"]), np.asarray(flows["dip"])]))
+        flows["sip"] = ips[:n]
+        flows["dip"] = ips[n:]
+        return flows
+
+
+def remap_attack_files(port_files, writer, remapper, batch_size=REMAP_BATCH_SIZE):
+    """
+    Streams flow files into `writer` with their addresses replaced by `remapper`.
+
+    Records already in the writer's layout are copied and patched as raw records, so every
+    other field is kept bit for bit; other layouts go through records_to_frame.
+
+    Parameters:
+        port_files (list): Input SiLK flow files.
+        writer (FlowWriter): Merged output.
+        remapper (IPRemapper): Shared by every file, so an address maps the same everywhere.
+        batch_size (int): Records remapped at a time.
+
+    Returns:
+        int: Flows written.
+    """
+    n_flows = 0
+    for path in port_files:
+        print(f" Rewriting IPs in: {path}")
+        for records in iter_record_batches(path, batch_size):
+            flows = records.copy() if records.dtype == writer.dtype else records_to_frame(records)
+            writer.write(remapper.remap_flows(flows))
+            n_flows += len(flows)
+    return n_flows
+
+
+def _legacy_remap_lines(lines, common_ips):
+    # The former per-line rewrite (rwcut text, dict and random.choice), kept as the benchmark baseline
+    ip_map = {}
     modified_lines = []
-    for line in result.stdout.splitlines():
+    for line in lines:
         parts = line.strip().split('|')
         if len(parts) < 8:
             continue
-        # Replace source and destination IPs
         for i in [0, 1]:  # sip and dip
             ip = parts[i]
             if ip not in ip_map:
                 ip_map[ip] = random.choice(common_ips)
             parts[i] = ip_map[ip]
         modified_lines.append('|'.join(parts))
-
-    with open(output_text_file, "w") as f:
-        f.write("\n".join(modified_lines))
-
-    return output_text_file
+    return modified_lines
+
+
+def benchmark_remap(n_flows, pool_size=100_000, seed=REMAP_SEED):
+    """
+    Prints the throughput of the former text path and of remap_attack_files on the same
+    synthetic attack flows. rwcut's output is stood in for by silk_io.iter_rwcut_batches
+    (same text), so no SiLK tools are needed; the rwload step of the old path is not timed.
+    """
+    import tempfile
+    from benchmark_suite import synthetic_flows
+    from silk_io import iter_rwcut_batches, ipv4_to_str
+
+    fields = "sip,dip,sport,dport,stime,etime,bytes,packets"
+    rng = np.random.default_rng(seed)
+    pool = np.unique(rng.integers(0x0A000000, 0x0B000000, pool_size, dtype=np.uint32))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        input_rw = os.path.join(tmp, "attacks.rw")
+        with FlowWriter(input_rw) as writer:
+            writer.write(synthetic_flows(n_flows, seed, 0))
+
+        start = time.perf_counter()
+        lines = []
+        for df in iter_rwcut_batches(input_rw, fields):
+            lines += df.to_csv(sep="|", header=False, index=False).splitlines()
+        text = time.perf_counter() - start
+        start = time.perf_counter()
+        pool_strs = list(ipv4_to_str(pool))
+        with open(os.path.join(tmp, "attacks.txt"), "w") as f:
+            f.write("\n".join(_legacy_remap_lines(lines, pool_strs)))
+        legacy = time.perf_counter() - start
+        del lines
+
+        start = time.perf_counter()
+        with FlowWriter(os.path.join(tmp, "remapped.rw")) as writer:
+            remap_attack_files([input_rw], writer, IPRemapper(pool, seed))
+        vectorized = time.perf_counter() - start
+
+    print(f" {n_flows:,} flows, pool of {len(pool):,} addresses")
+    print(f"  text path    {text + legacy:8.2f}s {n_flows / (text + legacy):>14,.0f} flows/s "
+          f"(rwcut stand-in {text:.2f}s, line rewrite {legacy:.2f}s)")
+    print(f"  vectorized   {vectorized:8.2f}s {n_flows / vectorized:>14,.0f} flows/s  "
+          f"x{(text + legacy) / vectorized:.1f}")
+
+
+def readable_files(paths, workers=NUM_WORKERS):
+    # The inputs silk_io reads as they are, the others rewritten by the SiLK tools into TEMP_DIR (None if that failed)
+    converted = os.path.join(TEMP_DIR, "converted")
+    return run_parallel(readable_silk_file, [(path, converted) for path in paths], max_workers=workers,
+                        task="SiLK conversion")
 
 
 def split_attacks_by_port(attack_file, output_dir):
+    # One read of the capture, routed to one file per attack by dport (was one rwfilter run per port)
     os.makedirs(output_dir, exist_ok=True)
-    port_files = []
-
-    for attack_name, port in ATTACK_PORTS.items():
-        output_file = os.path.join(output_dir, f"{attack_name}.rw")
-        cmd = f"rwfilter --input-path={attack_file} --dport={port} --pass-destination={output_file}"
-        subprocess.run(cmd, shell=True)
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            port_files.append(output_file)
-
-    return port_files
-
-
-def merge_and_sort_multiple(normal_files, attack_rw_file, output_dir):
+    attack_file = readable_silk_file(attack_file, os.path.join(TEMP_DIR, "converted"))
+    paths = [os.path.join(output_dir, f"{attack_name}.rw") for attack_name in ATTACK_PORTS]
+    router = PortRouter("dport", [[port] for port in ATTACK_PORTS.values()])
+    counts = partition_file(attack_file, router, paths)
+    return [path for path in paths if path in counts]
+
+
+def attack_chunk_ranges(attack_rw_file, byte_limit=BYTE_SPLIT_LIMIT):
+    """
+    (start, stop) record ranges cut the way rwsplit --byte-limit cuts its subfiles: a chunk
+    takes flows until the sum of their bytes field reaches byte_limit, the flow that reaches
+    it included. Only the bytes column is read.
+    """
+    sizes = [np.asarray(records["bytes"], dtype=np.uint64) for records in iter_record_batches(attack_rw_file)]
+    if not sizes:
+        return []
+    total = np.cumsum(np.concatenate(sizes))
+    ranges, start, base = [], 0, 0
+    while start < len(total):
+        # First flow at which the chunk's running sum reaches the limit
+        stop = min(int(np.searchsorted(total, base + byte_limit, side="left")) + 1, len(total))
+        ranges.append((start, stop))
+        base = int(total[stop - 1])
+        start = stop
+    return ranges
+
+
+def merge_and_sort_multiple(normal_files, attack_rw_file, output_dir, workers=NUM_WORKERS):
+    """
+    Merges every normal file with one chunk of the attack flows, ordered by stime.
+
+    The normal files are sorted runs and are streamed through flow_merge's k-way merge; an
+    attack chunk is a few thousand records and is sorted in memory (so is a normal file that
+    turns out not to be sorted). The output files are independent and are written in parallel.
+
+    Returns:
+        int: Number of output files that could not be written.
+    """
     os.makedirs(output_dir, exist_ok=True)
 
-    print(f" Splitting attack data using rwsplit...")
-    split_prefix = os.path.join(TEMP_DIR, "attack_chunk_")
-    subprocess.run(f"rwsplit --basename={split_prefix} --byte-limit={BYTE_SPLIT_LIMIT} {attack_rw_file}", shell=True)
-
-    attack_chunks = sorted(glob(f"{split_prefix}*.rw"))
+    chunks = attack_chunk_ranges(attack_rw_file)
+    print(f" Merging {len(normal_files)} normal files with {len(chunks)} attack chunks...")
 
+    jobs = []
     for i, normal_file in enumerate(normal_files):
-        chunk_file = attack_chunks[i % len(attack_chunks)] if attack_chunks else None
-        output_file = os.path.join(output_dir, f"merged_{i:02d}.rw")
-
-        if chunk_file:
-            temp_merge = os.path.join(TEMP_DIR, f"temp_merge_{i}.rw")
-            subprocess.run(f"rwcat {normal_file} {chunk_file} > {temp_merge}", shell=True)
-            subprocess.run(f"rwsort --fields=stime {temp_merge} > {output_file}", shell=True)
-            os.remove(temp_merge)
-        else:
-            subprocess.run(f"rwsort --fields=stime {normal_file} > {output_file}", shell=True)
+        sources = [normal_file]
+        if chunks:
+            start, stop = chunks[i % len(chunks)]
+            sources.append(RecordRange(attack_rw_file, start, stop, sort_key="stime"))
+        jobs.append((sources, os.path.join(output_dir, f"merged_{i:02d}.rw")))
+
+    counts = merge_many(jobs, workers)
+    print(f" {sum(n for n in counts if n)} flows written to {sum(n is not None for n in counts)} files")
+    return sum(n is None for n in counts)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge relabeled attack flows into the normal SiLK dataset")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="Normal files read or merged at once")
+    parser.add_argument("--converter", default=shlex.join(DEFAULT_CONVERTER),
+                        help="Converter command template with {input}, {fields} and {delimiter} placeholders")
+    parser.add_argument("--native", action="store_true",
+                        help="Read the normal .rw files directly with silk_io instead of running a converter")
+    parser.add_argument("--seed", type=int, default=REMAP_SEED, help="Seed of the attack IP replacements")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="N",
+                        help="Only compare the old text rewrite and the vectorized remap on N synthetic flows")
+    return parser.parse_args()
 
 
 # MAIN SCRIPT 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark:
+        benchmark_remap(args.benchmark, seed=args.seed)
+        raise SystemExit
+
     os.makedirs(TEMP_DIR, exist_ok=True)
 
     print(" Gathering normal dataset files...")
@@ -118,44 +326,37 @@ if __name__ == "__main__":
     if not normal_files:
         print(" No normal dataset files found in folder '01/'. Exiting.")
         exit(1)
+    normal_files = readable_files(normal_files, args.workers)
+    if None in normal_files:
+        print(" Some normal dataset files could not be converted for reading. Exiting.")
+        exit(1)
 
-    common_ips = extract_common_ips(normal_files)
-    if not common_ips:
+    source = native_ip_source if args.native else partial(converter_ip_source, converter=shlex.split(args.converter))
+    common_ips = extract_common_ips(normal_files, source, args.workers)
+    if len(common_ips) == 0:
         print(" Failed to extract IPs from normal data. Exiting.")
         exit(1)
 
-    processed_text_files = []
-
-    for attack_file in ATTACK_DATASET_FILES:
-        print(f"\n Processing attack file: {attack_file}")
-        port_files = split_attacks_by_port(attack_file, os.path.join(TEMP_DIR, "split_attacks"))
-
-        for port_file in port_files:
-            attack_name = os.path.splitext(os.path.basename(port_file))[0]
-            text_output = os.path.join(TEMP_DIR, f"{attack_name}.txt")
-            processed_file = modify_attack_ips(port_file, text_output, common_ips)
-            processed_text_files.append(processed_file)
-
-    if not processed_text_files:
+    # Port files are remapped as soon as they are split (the next attack file reuses the
+    # split directory) and streamed straight into one binary file, no text round trip
+    remapper = IPRemapper(common_ips, args.seed)
+    merged_rw = os.path.join(TEMP_DIR, "merged_attacks.rw")
+    n_attack_flows = 0
+    with FlowWriter(merged_rw) as writer:
+        for attack_file in ATTACK_DATASET_FILES:
+            print(f"\n Processing attack file: {attack_file}")
+            port_files = split_attacks_by_port(attack_file, os.path.join(TEMP_DIR, "split_attacks"))
+            n_attack_flows += remap_attack_files(port_files, writer, remapper)
+
+    if n_attack_flows == 0:
         print(" No usable attack files after IP modification. Exiting.")
         exit(1)
-
-    print("\n Merging all modified attack flows into one text file...")
-    merged_txt = os.path.join(TEMP_DIR, "all_attacks.txt")
-    with open(merged_txt, "w") as outfile:
-        for txt_file in processed_text_files:
-            with open(txt_file) as infile:
-                outfile.write(infile.read() + "\n")
-
-    print(" Converting merged text attack flows to binary .rw format...")
-    merged_rw = os.path.join(TEMP_DIR, "merged_attacks.rw")
-    subprocess.run(
-        f"rwload --fields=sip,dip,sport,dport,stime,etime,bytes,packets "
-        f"--input-path={merged_txt} --output-path={merged_rw}",
-        shell=True
-    )
+    print(f" {n_attack_flows} attack flows written to: {merged_rw}")
 
     print("\n Merging attack flows with normal dataset...")
-    merge_and_sort_multiple(normal_files, merged_rw, OUTPUT_FOLDER)
+    failed = merge_and_sort_multiple(normal_files, merged_rw, OUTPUT_FOLDER, args.workers)
+    if failed:
+        print(f"\n {failed} merged files could not be written, see the errors above. Exiting.")
+        exit(1)
 
     print(f"\n✅ DONE! Merged dataset saved in: {OUTPUT_FOLDER}/")
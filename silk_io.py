@@ -0,0 +1,375 @@
+# silk_io.py
+import os
+import zlib
+import struct
+import numpy as np
+import pandas as pd
+
+# === SiLK flow file constants ===
+SILK_MAGIC = b"\xde\xad\xbe\xef"
+HEADER_START = struct.Struct(">4sBBBBIHH")  # magic, flags, format, file version, compression, silk version, rec size, rec version
+HEADER_ENTRY = struct.Struct(">II")          # entry id, entry length (including these 8 bytes)
+BLOCK_HEADER = struct.Struct(">II")          # compressed size, uncompressed size
+FLAG_BIG_ENDIAN = 0x01
+TCPSTATE_IPV6 = 0x80
+
+FT_RWIPV6ROUTING = 0x0C
+FT_RWGENERIC = 0x16
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+
+# Fields shared by the FT_RWGENERIC v5 and FT_RWIPV6ROUTING v1 record layouts (bytes 0-39)
+_COMMON_FIELDS = [
+    ("stime", "i8"),        # Flow start time, milliseconds since the UNIX epoch
+    ("elapsed", "u4"),      # Duration in milliseconds
+    ("sport", "u2"),
+    ("dport", "u2"),
+    ("proto", "u1"),
+    ("flow_type", "u1"),
+    ("sensor", "u2"),
+    ("flags", "u1"),        # OR of all TCP flags
+    ("init_flags", "u1"),
+    ("rest_flags", "u1"),
+    ("tcp_state", "u1"),
+    ("application", "u2"),
+    ("memo", "u2"),
+    ("input", "u2"),
+    ("output", "u2"),
+    ("packets", "u4"),
+    ("bytes", "u4"),
+]
+
+# (file format, record version) -> record fields
+RECORD_LAYOUTS = {
+    (FT_RWGENERIC, 5): _COMMON_FIELDS + [("sip", "u4"), ("dip", "u4"), ("nhip", "u4")],
+    (FT_RWIPV6ROUTING, 1): _COMMON_FIELDS + [("sip", "V16"), ("dip", "V16"), ("nhip", "V16")],
+}
+
+# Columns of the DataFrames produced by iter_flow_batches, with their dtypes
+FLOW_COLUMNS = {
+    "sip": np.uint32,
+    "dip": np.uint32,
+    "sport": np.uint16,
+    "dport": np.uint16,
+    "proto": np.uint8,
+    "packets": np.uint32,
+    "bytes": np.uint32,
+    "stime": np.int64,      # milliseconds since the UNIX epoch
+    "etime": np.int64,
+    "duration": np.uint32,  # milliseconds
+    "sensor": np.uint16,
+    "flags": np.uint8,
+    "init_flags": np.uint8,
+    "rest_flags": np.uint8,
+    "tcp_state": np.uint8,
+    "nhip": np.uint32,
+    "application": np.uint16,
+    "input": np.uint16,
+    "output": np.uint16,
+    "flow_type": np.uint8,
+}
+
+SUPPORTED_COMPRESSION = (COMPRESSION_NONE, COMPRESSION_ZLIB)
+
+TCP_FLAG_BITS = {"fin": 0x01, "syn": 0x02, "rst": 0x04, "psh": 0x08, "ack": 0x10, "urg": 0x20, "ece": 0x40, "cwr": 0x80}
+
+
+class UnsupportedFormatError(ValueError):
+    """
+    A valid SiLK file this reader cannot decode (record layout, compression method or
+    header version); the SiLK tools can still convert it (see flow_conversion.readable_silk_file).
+    """
+
+
+class SilkHeader:
+    """
+    Parsed SiLK file header (file version 16 and later).
+
+    Parameters:
+        byte_order (str): "<" or ">" for the records that follow the header.
+        file_format (int): SiLK file format id, e.g. FT_RWGENERIC.
+        record_version (int): Version of the record layout.
+        record_size (int): Size of one record in bytes.
+        compression (int): Block compression method.
+        header_length (int): Offset of the first record (or compressed block).
+    """
+
+    def __init__(self, byte_order, file_format, record_version, record_size, compression, header_length, entries):
+        self.byte_order = byte_order
+        self.file_format = file_format
+        self.record_version = record_version
+        self.record_size = record_size
+        self.compression = compression
+        self.header_length = header_length
+        self.entries = entries
+
+    @property
+    def record_dtype(self):
+        layout = RECORD_LAYOUTS.get((self.file_format, self.record_version))
+        if layout is None:
+            raise UnsupportedFormatError(
+                f"Unsupported SiLK record layout: format 0x{self.file_format:02x} version {self.record_version} "
+                f"(supported: {', '.join(f'0x{f:02x} v{v}' for f, v in RECORD_LAYOUTS)})"
+            )
+        dtype = np.dtype([(name, self.byte_order + t if t[0] != "V" else t) for name, t in layout])
+        if dtype.itemsize != self.record_size:
+            raise ValueError(f"Record size {self.record_size} does not match layout size {dtype.itemsize}")
+        return dtype
+
+    def check_supported(self):
+        # Raises UnsupportedFormatError before any record is read
+        self.record_dtype
+        if self.compression not in SUPPORTED_COMPRESSION:
+            raise UnsupportedFormatError(f"Unsupported SiLK compression method {self.compression} (only none and zlib)")
+
+
+def read_header(f):
+    """
+    Reads the SiLK header from a binary file object positioned at offset 0.
+
+    Returns:
+        SilkHeader: The parsed header; the file is left positioned at the first record.
+    """
+    start = f.read(HEADER_START.size)
+    if len(start) < HEADER_START.size or start[:4] != SILK_MAGIC:
+        raise ValueError("Not a SiLK flow file (bad magic number)")
+    magic, flags, file_format, file_version, compression, _, record_size, record_version = HEADER_START.unpack(start)
+    if file_version < 16:
+        raise UnsupportedFormatError(f"Unsupported SiLK header version {file_version}")
+
+    entries = []
+    length = HEADER_START.size
+    while True:
+        spec = f.read(HEADER_ENTRY.size)
+        if len(spec) < HEADER_ENTRY.size:
+            raise ValueError("Truncated SiLK header")
+        entry_id, entry_length = HEADER_ENTRY.unpack(spec)
+        body = f.read(entry_length - HEADER_ENTRY.size)
+        length += entry_length
+        if entry_id == 0:  # end-of-header marker, its body is padding
+            break
+        entries.append((entry_id, body))
+
+    byte_order = ">" if flags & FLAG_BIG_ENDIAN else "<"
+    return SilkHeader(byte_order, file_format, record_version, record_size, compression, length, entries)
+
+
+def _iter_blocks(f, compression):
+    while True:
+        spec = f.read(BLOCK_HEADER.size)
+        if len(spec) < BLOCK_HEADER.size:
+            return
+        comp_size, uncomp_size = BLOCK_HEADER.unpack(spec)
+        data = f.read(comp_size)
+        if compression == COMPRESSION_ZLIB:
+            yield zlib.decompress(data, bufsize=uncomp_size)
+        else:
+            raise UnsupportedFormatError(f"Unsupported SiLK compression method {compression} (only none and zlib)")
+
+
+def iter_record_batches(path, batch_size=65536):
+    """
+    Yields the raw records of a SiLK flow file as structured NumPy arrays.
+
+    Uncompressed files are memory-mapped and every batch is a zero-copy view; zlib
+    compressed files are decoded one block at a time.
+
+    Parameters:
+        path (str): SiLK flow file.
+        batch_size (int): Maximum records per batch.
+    """
+    with open(path, "rb") as f:
+        header = read_header(f)
+        header.check_supported()
+        dtype = header.record_dtype
+
+        if header.compression == COMPRESSION_NONE:
+            n_records = (os.fstat(f.fileno()).st_size - header.header_length) // dtype.itemsize
+            if n_records <= 0:
+                return
+            records = np.memmap(f, dtype=dtype, mode="r", offset=header.header_length, shape=(n_records,))
+            for start in range(0, n_records, batch_size):
+                yield records[start:start + batch_size]
+            return
+
+        pending = b""
+        for block in _iter_blocks(f, header.compression):
+            data = pending + block
+            n_records = len(data) // dtype.itemsize
+            usable = n_records * dtype.itemsize
+            records = np.frombuffer(data, dtype=dtype, count=n_records)
+            pending = data[usable:]
+            for start in range(0, n_records, batch_size):
+                yield records[start:start + batch_size]
+
+
+def is_supported(path):
+    # True if iter_record_batches can decode `path`; a file that is not SiLK at all still raises ValueError
+    with open(path, "rb") as f:
+        try:
+            read_header(f).check_supported()
+        except UnsupportedFormatError:
+            return False
+    return True
+
+
+def _ipv4_column(values, tcp_state):
+    if values.dtype.kind != "V":
+        return values.astype(np.uint32)
+    # 16-byte network-order addresses; IPv4 flows are stored IPv4-mapped, keep the low 32 bits
+    raw = np.frombuffer(values.tobytes(), dtype=np.uint8).reshape(-1, 16)
+    ipv4 = raw[:, 12:16].copy().view(">u4").ravel().astype(np.uint32)
+    if (tcp_state & TCPSTATE_IPV6).any():
+        ipv4[(tcp_state & TCPSTATE_IPV6) != 0] = 0
+    return ipv4
+
+
+def records_to_frame(records, columns=None):
+    """
+    Converts a batch of raw records to a DataFrame with the FLOW_COLUMNS names and dtypes.
+
+    Addresses are IPv4 as uint32; true IPv6 flows get 0 addresses (see tcp_state & 0x80).
+    """
+    columns = list(FLOW_COLUMNS) if columns is None else columns
+    tcp_state = records["tcp_state"]
+    data = {}
+    for col in columns:
+        if col in ("sip", "dip", "nhip"):
+            data[col] = _ipv4_column(records[col], tcp_state)
+        elif col == "duration":
+            data[col] = records["elapsed"].astype(np.uint32)
+        elif col == "etime":
+            data[col] = records["stime"].astype(np.int64) + records["elapsed"]
+        else:
+            data[col] = records[col].astype(FLOW_COLUMNS[col])
+    return pd.DataFrame(data)
+
+
+def iter_flow_batches(path, batch_size=65536, columns=None):
+    """
+    Streams a SiLK flow file as DataFrames of typed columns, without rwcut.
+
+    Parameters:
+        path (str): SiLK flow file (FT_RWGENERIC v5 or FT_RWIPV6ROUTING v1, uncompressed or zlib).
+        batch_size (int): Maximum rows per DataFrame.
+        columns (list or None): Subset of FLOW_COLUMNS to decode.
+    """
+    for records in iter_record_batches(path, batch_size):
+        yield records_to_frame(records, columns)
+
+
+def read_flows(path, columns=None):
+    batches = list(iter_flow_batches(path, batch_size=1 << 22, columns=columns))
+    if not batches:
+        return pd.DataFrame({c: np.empty(0, dtype=FLOW_COLUMNS[c]) for c in (columns or FLOW_COLUMNS)})
+    return pd.concat(batches, ignore_index=True)
+
+
+# === Text rendering matching rwcut ===
+
+def ipv4_to_str(ips):
+    ips = np.asarray(ips, dtype=np.uint32)
+    octets = [pd.Series((ips >> shift) & 0xFF).astype(str) for shift in (24, 16, 8, 0)]
+    return octets[0] + "." + octets[1] + "." + octets[2] + "." + octets[3]
+
+
+def str_to_ipv4(values):
+    parts = pd.Series(values).astype(str).str.strip().str.split(".", expand=True).to_numpy(dtype=np.uint32)
+    return (parts[:, 0] << 24) | (parts[:, 1] << 16) | (parts[:, 2] << 8) | parts[:, 3]
+
+
+def ms_to_rwcut_time(ms):
+    # rwcut's default timestamp format, e.g. 2025/04/01T15:00:00.123
+    times = pd.to_datetime(pd.Series(np.asarray(ms, dtype=np.int64)), unit="ms")
+    return times.dt.strftime("%Y/%m/%dT%H:%M:%S.%f").str[:-3]
+
+
+def iter_rwcut_batches(path, fields, batch_size=65536):
+    """
+    Drop-in replacement for parsing `rwcut --fields <fields> --delimited` output.
+
+    Yields DataFrames with the same column names and values pandas would read from the
+    rwcut text (dotted-quad addresses, rwcut timestamps), straight from the binary file.
+
+    Parameters:
+        path (str): SiLK flow file.
+        fields (str or list): rwcut field list, e.g. "sip,dip,sport,dport,stime,etime,proto,packets,bytes".
+    """
+    fields = fields.split(",") if isinstance(fields, str) else list(fields)
+    for flows in iter_flow_batches(path, batch_size, columns=fields):
+        for col in fields:
+            if col in ("sip", "dip", "nhip"):
+                flows[col] = ipv4_to_str(flows[col]).to_numpy()
+            elif col in ("stime", "etime"):
+                flows[col] = ms_to_rwcut_time(flows[col]).to_numpy()
+        yield flows
+
+
+# === Writer ===
+
+class FlowWriter:
+    """
+    Buffered writer for uncompressed FT_RWGENERIC v5 files readable by the SiLK tools.
+
+    Parameters:
+        path (str): Output file.
+        buffer_size (int): Bytes buffered before hitting the disk.
+    """
+
+    FILE_FORMAT = FT_RWGENERIC
+    RECORD_VERSION = 5
+    SILK_VERSION = 3019002
+
+    def __init__(self, path, buffer_size=1 << 20):
+        self.path = path
+        self.dtype = SilkHeader("<", self.FILE_FORMAT, self.RECORD_VERSION, 52, COMPRESSION_NONE, 0, []).record_dtype
+        self.n_records = 0
+        self._file = open(path, "wb", buffering=buffer_size)
+        self._file.write(self._header())
+
+    def _header(self):
+        start = HEADER_START.pack(SILK_MAGIC, 0, self.FILE_FORMAT, 16, COMPRESSION_NONE,
+                                  self.SILK_VERSION, self.dtype.itemsize, self.RECORD_VERSION)
+        # End-of-header entry, padded so the header is a whole number of records
+        length = len(start) + HEADER_ENTRY.size
+        padding = -length % self.dtype.itemsize
+        return start + HEADER_ENTRY.pack(0, HEADER_ENTRY.size + padding) + b"\0" * padding
+
+    def to_records(self, flows):
+        """
+        Converts a DataFrame (FLOW_COLUMNS names) or a structured record array of any layout
+        to records of this writer's layout; records already in it are returned as they are.
+        """
+        if isinstance(flows, np.ndarray) and flows.dtype.names:
+            if flows.dtype == self.dtype:
+                return flows
+            flows = records_to_frame(flows)
+
+        records = np.zeros(len(flows), dtype=self.dtype)
+        for name in self.dtype.names:
+            if name == "elapsed":
+                if "duration" in flows:
+                    records[name] = flows["duration"]
+                elif "etime" in flows and "stime" in flows:
+                    records[name] = np.asarray(flows["etime"], dtype=np.int64) - np.asarray(flows["stime"], dtype=np.int64)
+            elif name in flows:
+                records[name] = flows[name]
+        return records
+
+    def write(self, flows):
+        """
+        Appends flows given as a DataFrame (FLOW_COLUMNS names) or a structured record array.
+        """
+        records = self.to_records(flows)
+        self._file.write(records.tobytes())
+        self.n_records += len(records)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,107 @@
+# streaming_metrics.py
+import numpy as np
+
+
+class ConfusionMatrix:
+    """
+    Incrementally updated (n_classes x n_classes) confusion matrix.
+
+    Rows are true classes and columns are predicted classes. Memory use is fixed by the
+    number of classes, so arbitrarily many chunks of labels can be fed through update()
+    and the usual classification metrics computed at the end.
+
+    Parameters:
+        n_classes (int): Number of encoded classes (labels are 0..n_classes-1).
+    """
+
+    def __init__(self, n_classes):
+        self.n_classes = n_classes
+        self.matrix = np.zeros((n_classes, n_classes), dtype=np.int64)
+
+    @property
+    def total(self):
+        return int(self.matrix.sum())
+
+    def update(self, y_true, y_pred):
+        y_true = np.asarray(y_true, dtype=np.int64)
+        y_pred = np.asarray(y_pred, dtype=np.int64)
+        n = self.n_classes
+        self.matrix += np.bincount(y_true * n + y_pred, minlength=n * n).reshape(n, n)
+
+    def merge(self, other):
+        self.matrix += other.matrix
+        return self
+
+    def per_class_scores(self):
+        """
+        Returns:
+            tuple: (precision, recall, f1, support) arrays with one entry per class.
+                   Undefined ratios are reported as 0, like sklearn's zero_division default.
+        """
+        tp = np.diag(self.matrix).astype(np.float64)
+        predicted = self.matrix.sum(axis=0)
+        support = self.matrix.sum(axis=1)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(predicted > 0, tp / predicted, 0.0)
+            recall = np.where(support > 0, tp / support, 0.0)
+            f1_denom = predicted + support
+            f1 = np.where(f1_denom > 0, 2 * tp / f1_denom, 0.0)
+
+        return precision, recall, f1, support
+
+    def weighted_scores(self):
+        """
+        Support-weighted averages, matching precision_recall_fscore_support(average='weighted').
+
+        Returns:
+            tuple: (precision, recall, f1, None); support is None as in sklearn.
+        """
+        precision, recall, f1, support = self.per_class_scores()
+        weights = support.sum()
+        if weights == 0:
+            return 0.0, 0.0, 0.0, None
+        return (
+            np.average(precision, weights=support),
+            np.average(recall, weights=support),
+            np.average(f1, weights=support),
+            None,
+        )
+
+    def report_dict(self, target_names):
+        """
+        Per-class scores keyed by class name, in the layout of classification_report(output_dict=True).
+        """
+        precision, recall, f1, support = self.per_class_scores()
+        report = {}
+        for i, name in enumerate(target_names):
+            report[str(name)] = {
+                "precision": precision[i],
+                "recall": recall[i],
+                "f1-score": f1[i],
+                "support": int(support[i]),
+            }
+        return report
+
+    def report(self, target_names, digits=2):
+        """
+        Text report in the same layout as sklearn's classification_report.
+        """
+        precision, recall, f1, support = self.per_class_scores()
+        total = support.sum()
+        names = [str(n) for n in target_names]
+        headers = ["precision", "recall", "f1-score", "support"]
+        width = max([len(n) for n in names] + [len("weighted avg"), digits])
+
+        lines = [f"{'':>{width}} " + "".join(f" {h:>9}" for h in headers), ""]
+        row_fmt = f"{{:>{width}}} " + " {:>9.{d}f}" * 3 + " {:>9}"
+        for i, name in enumerate(names):
+            lines.append(row_fmt.format(name, precision[i], recall[i], f1[i], int(support[i]), d=digits))
+        lines.append("")
+
+        accuracy = np.trace(self.matrix) / total if total else 0.0
+        lines.append(f"{'accuracy':>{width}} " + " " * 20 + f" {accuracy:>9.{digits}f} {int(total):>9}")
+        lines.append(row_fmt.format("macro avg", precision.mean(), recall.mean(), f1.mean(), int(total), d=digits))
+        w_precision, w_recall, w_f1, _ = self.weighted_scores()
+        lines.append(row_fmt.format("weighted avg", w_precision, w_recall, w_f1, int(total), d=digits))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,25 @@
+# fake_rwcut.py
+"""
+Stand-in for rwcut in converter tests: the "flow file" is a text file in the layout of
+flows.rwcut.txt (its 9 fields, no title) and the requested fields are printed from it.
+
+    python fake_rwcut.py --fields sip,dport --no-title --delimited=, flows.rwcut.txt
+"""
+import sys
+import argparse
+
+ALL_FIELDS = "sip,dip,sport,dport,proto,packets,bytes,stime,etime".split(",")
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--fields", required=True)
+parser.add_argument("--no-title", action="store_true")
+parser.add_argument("--delimited", default="|")
+parser.add_argument("input")
+args = parser.parse_args()
+
+index = [ALL_FIELDS.index(field) for field in args.fields.split(",")]
+with open(args.input) as f:
+    for line in f:
+        values = line.rstrip("\n").split(",")
+        sys.stdout.write(args.delimited.join(values[i] for i in index) + "\n")
+sys.exit(3 if args.input.endswith(".fail") else 0)
@@ -0,0 +1,102 @@
+# make_silk_fixtures.py
+"""
+Writes the SiLK fixtures of test_silk_io.py with struct, independently of silk_io.
+
+    python tests/data/make_silk_fixtures.py
+
+Every fixture holds FLOWS, in FT_RWGENERIC v5 or FT_RWIPV6ROUTING v1 records, uncompressed or
+zlib compressed in blocks of BLOCK_RECORDS records, with one header entry besides the
+end-of-header marker. flows.rwcut.txt is what
+`rwcut --fields=sip,dip,sport,dport,proto,packets,bytes,stime,etime --no-title --delimited=,`
+prints for them.
+"""
+import os
+import zlib
+import socket
+import struct
+import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BLOCK_RECORDS = 3
+RWCUT_FIELDS = "sip,dip,sport,dport,proto,packets,bytes,stime,etime"
+
+# sip, dip, sport, dport, proto, packets, bytes, stime (ms since the epoch), elapsed (ms), sensor, flags
+FLOWS = [
+    ("10.0.0.1", "10.0.0.2", 40312, 6007, 6, 1, 60, 1743519600123, 1, 3, 0x02),
+    ("192.168.1.20", "172.16.5.4", 53, 33000, 17, 2, 180, 1743519600500, 0, 3, 0),
+    ("10.0.0.1", "8.8.8.8", 0, 0, 1, 10, 840, 1743519601000, 9000, 7, 0),
+    ("255.255.255.255", "0.0.0.0", 65535, 65535, 6, 4294967295, 4294967295, 1743523199999, 4294967295, 65535, 0xFF),
+    ("1.2.3.4", "5.6.7.8", 5001, 6003, 1, 300, 25200, 1743520000000, 59999, 1, 0),
+    ("203.0.113.9", "198.51.100.7", 443, 51515, 6, 12, 6500, 1743521234567, 250, 2, 0x1B),
+    ("10.1.2.3", "10.3.2.1", 6008, 6008, 6, 1, 40, 1743519600123, 0, 3, 0x10),
+]
+
+COMMON = "qIHHBBHBBBBHHHHII"  # stime .. bytes, 40 bytes
+FORMATS = {
+    # name: (file format, record version, record size)
+    "generic_v5": (0x16, 5, 52),
+    "ipv6routing_v1": (0x0C, 1, 88),
+}
+
+
+def ipv4(text):
+    return socket.inet_aton(text)
+
+
+def record(flow, file_format, order):
+    sip, dip, sport, dport, proto, packets, n_bytes, stime, elapsed, sensor, flags = flow
+    common = struct.pack(order + COMMON, stime, elapsed, sport, dport, proto, 0, sensor, flags, flags, 0, 0,
+                         0, 0, 0, 0, packets, n_bytes)
+    if file_format == 0x16:
+        addresses = struct.pack(order + "III", *(struct.unpack(">I", ipv4(ip))[0] for ip in (sip, dip, "0.0.0.0")))
+    else:  # IPv4-mapped IPv6 addresses, always in network byte order
+        addresses = b"".join(b"\0" * 10 + b"\xff\xff" + ipv4(ip) for ip in (sip, dip, "0.0.0.0"))
+    return common + addresses
+
+
+def header(file_format, record_version, record_size, compression, order):
+    flags = 0x01 if order == ">" else 0x00
+    start = struct.pack(">4sBBBBIHH", b"\xde\xad\xbe\xef", flags, file_format, 16, compression, 3019002,
+                        record_size, record_version)
+    note = b"silk_io test fixture\0"
+    entry = struct.pack(">II", 4, 8 + len(note)) + note  # annotation entry, skipped by readers
+    length = len(start) + len(entry) + 8
+    padding = -length % record_size
+    return start + entry + struct.pack(">II", 0, 8 + padding) + b"\0" * padding
+
+
+def write_fixture(name, file_format, record_version, record_size, compression, order="<"):
+    records = [record(flow, file_format, order) for flow in FLOWS]
+    assert all(len(r) == record_size for r in records)
+    body = b"".join(records)
+    if compression == 1:
+        blocks = []
+        for i in range(0, len(records), BLOCK_RECORDS):
+            raw = b"".join(records[i:i + BLOCK_RECORDS])
+            data = zlib.compress(raw)
+            blocks.append(struct.pack(">II", len(data), len(raw)) + data)
+        body = b"".join(blocks)
+    with open(os.path.join(HERE, name), "wb") as f:
+        f.write(header(file_format, record_version, record_size, compression, order) + body)
+
+
+def rwcut_time(ms):
+    t = datetime.datetime(1970, 1, 1) + datetime.timedelta(milliseconds=ms)
+    return t.strftime("%Y/%m/%dT%H:%M:%S.") + f"{ms % 1000:03d}"
+
+
+def write_expected():
+    lines = []
+    for sip, dip, sport, dport, proto, packets, n_bytes, stime, elapsed, _, _ in FLOWS:
+        values = [sip, dip, sport, dport, proto, packets, n_bytes, rwcut_time(stime), rwcut_time(stime + elapsed)]
+        lines.append(",".join(str(v) for v in values))
+    with open(os.path.join(HERE, "flows.rwcut.txt"), "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+if __name__ == "__main__":
+    for name, (file_format, record_version, record_size) in FORMATS.items():
+        write_fixture(f"{name}.rw", file_format, record_version, record_size, 0)
+        write_fixture(f"{name}_zlib.rw", file_format, record_version, record_size, 1)
+    write_fixture("generic_v5_big_endian.rw", 0x16, 5, 52, 0, order=">")
+    write_expected()
@@ -0,0 +1,50 @@
+import os
+import sys
+import numpy as np
+from functools import partial
+from silk_io import str_to_ipv4
+from silk_attack_data_merger import converter_ip_source, extract_common_ips, file_unique_ips, native_ip_source
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CONVERTER = [sys.executable, os.path.join(DATA, "fake_rwcut.py"), "--fields", "{fields}", "--no-title",
+             "--delimited={delimiter}", "{input}"]
+FIXTURE_IPS = ["0.0.0.0", "1.2.3.4", "5.6.7.8", "8.8.8.8", "10.0.0.1", "10.0.0.2", "10.1.2.3", "10.3.2.1",
+               "172.16.5.4", "192.168.1.20", "198.51.100.7", "203.0.113.9", "255.255.255.255"]
+
+
+def synthetic_source(files):
+    # Stand-in flow source: path -> its (sip, dip) batches, no file is read
+    return lambda path: iter(files[path])
+
+
+def as_ips(values):
+    return np.asarray(values, dtype=np.uint32)
+
+
+def test_file_unique_ips_from_stand_in_source(monkeypatch):
+    monkeypatch.setattr("silk_attack_data_merger.IP_REDUCE_SIZE", 3)  # force intermediate reductions
+    source = synthetic_source({"a": [(as_ips([5, 1, 5]), as_ips([2, 2, 9])), (as_ips([9]), as_ips([0])),
+                                     (as_ips([]), as_ips([]))]})
+    ips = file_unique_ips("a", source)
+    assert ips.dtype == np.uint32
+    assert ips.tolist() == [0, 1, 2, 5, 9]
+
+
+def test_file_unique_ips_empty():
+    assert file_unique_ips("a", synthetic_source({"a": []})).tolist() == []
+
+
+def test_sources_agree_on_fixtures():
+    expected = np.sort(str_to_ipv4(np.array(FIXTURE_IPS, dtype=object)))
+    for name in ("generic_v5.rw", "ipv6routing_v1_zlib.rw"):
+        assert file_unique_ips(os.path.join(DATA, name), native_ip_source).tolist() == expected.tolist()
+    converter = partial(converter_ip_source, converter=CONVERTER)
+    assert file_unique_ips(os.path.join(DATA, "flows.rwcut.txt"), converter).tolist() == expected.tolist()
+
+
+def test_extract_common_ips_in_parallel():
+    paths = [os.path.join(DATA, name) for name in ("generic_v5.rw", "generic_v5_zlib.rw", "ipv6routing_v1.rw")]
+    pool = extract_common_ips(paths, native_ip_source, workers=2)
+    assert pool.dtype == np.uint32
+    assert pool.tolist() == sorted(str_to_ipv4(np.array(FIXTURE_IPS, dtype=object)).tolist())
+
@@ -0,0 +1,139 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from ddos2vec_predict import DDoS2VecModels
+from ddos2vec_service import BatchScorer, ModelHolder, parse_flows
+
+
+class StandInModel:
+    # Predicts class `dport` for every flow and records the size of each predict call
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, X, verbose=0):
+        self.calls.append(len(X))
+        return np.eye(100)[X[:, 0, 0].astype(int)]
+
+
+class StandInEmbedder:
+    def transform(self, df):
+        return df[["dport"]].to_numpy(np.float32)
+
+
+def stand_in_loader():
+    return DDoS2VecModels(StandInEmbedder(), StandInModel(), np.array([f"c{i}" for i in range(100)], dtype=object))
+
+
+def flows(*dports):
+    return pd.DataFrame({"proto": [6] * len(dports), "sport": [40000] * len(dports), "dport": list(dports)})
+
+
+def results(futures):
+    return [(labels.tolist(), version) for labels, version in (f.result(timeout=1) for f in futures)]
+
+
+def test_requests_are_coalesced_into_one_predict():
+    holder = ModelHolder(stand_in_loader, [])
+    scorer = BatchScorer(holder, max_batch_rows=16, max_wait_ms=0)
+    futures = [scorer.submit(flows(1, 2)), scorer.submit(flows(3, 4, 5)), scorer.submit(flows(6))]
+
+    batch = scorer._next_batch()
+    assert len(batch) == 3
+    scorer._score(batch)
+
+    assert holder.models.model.calls == [6]
+    assert results(futures) == [(["c1", "c2"], 1), (["c3", "c4", "c5"], 1), (["c6"], 1)]
+    assert scorer.metrics()["requests_per_batch"]["count"] == 1
+
+
+def test_request_over_the_row_limit_is_carried_to_the_next_batch():
+    holder = ModelHolder(stand_in_loader, [])
+    scorer = BatchScorer(holder, max_batch_rows=4, max_wait_ms=0)
+    futures = [scorer.submit(flows(1, 2, 3)), scorer.submit(flows(4, 5)), scorer.submit(flows(6))]
+
+    first = scorer._next_batch()
+    assert [len(df) for _, df, _ in first] == [3]
+    assert scorer.metrics()["queue_depth"] == 2  # the carried request still counts as queued
+    scorer._score(first)
+    second = scorer._next_batch()
+    assert [len(df) for _, df, _ in second] == [2, 1]
+    scorer._score(second)
+
+    assert holder.models.model.calls == [3, 3]
+    assert results(futures) == [(["c1", "c2", "c3"], 1), (["c4", "c5"], 1), (["c6"], 1)]
+
+
+def csv_request(text):
+    return SimpleNamespace(is_json=False, get_data=lambda: text.encode())
+
+
+def test_invalid_rows_reject_the_request():
+    assert parse_flows(csv_request("proto,sport,dport\n6,1,80\n17,2,53\n"))["dport"].tolist() == [80, 53]
+    with pytest.raises(ValueError, match="invalid proto/sport/dport in 2 rows: 1, 2"):
+        parse_flows(csv_request("proto,sport,dport\n6,1,80\n6,1,http\n,2,53\n"))
+    with pytest.raises(ValueError, match=r"missing columns \['dport'\]"):
+        parse_flows(SimpleNamespace(is_json=True, get_json=lambda: {"flows": [{"proto": 6, "sport": 1}]}))
+
+
+def test_invalid_rows_are_answered_with_400():
+    pytest.importorskip("flask")
+    from ddos2vec_service import create_app
+
+    scorer = BatchScorer(ModelHolder(stand_in_loader, []))
+    client = create_app(scorer).test_client()
+    response = client.post("/predict", data="proto,sport,dport\n6,1,80\n6,1,http\n", content_type="text/csv")
+    assert response.status_code == 400
+    assert "rows: 1" in json.loads(response.data)["error"]
+    assert scorer.queue.empty()  # nothing was scored
+
+
+def touch(path, mtime_ns):
+    path.write_bytes(b"")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reload_waits_for_artifacts_to_settle(tmp_path):
+    paths = [tmp_path / "embedding.model", tmp_path / "lstm.h5"]
+    for path in paths:
+        touch(path, 1_000_000_000)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return len(loads)
+
+    holder = ModelHolder(loader, paths)
+    assert holder.check() is False  # unchanged
+
+    touch(paths[0], 2_000_000_000)
+    assert holder.check() is False  # changed since the last poll, may still be written
+    touch(paths[1], 2_000_000_000)
+    assert holder.check() is False  # changed again
+    assert (holder.models, holder.version) == (1, 1)
+
+    assert holder.check() is True  # stable for one full poll
+    assert (holder.models, holder.version) == (2, 2)
+    assert holder.check() is False
+    assert len(loads) == 2
+
+
+def test_failed_reload_keeps_serving_the_old_models(tmp_path):
+    path = tmp_path / "lstm.h5"
+    touch(path, 1_000_000_000)
+    outcomes = iter(["v1", RuntimeError("truncated file")])
+
+    def loader():
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    holder = ModelHolder(loader, [path])
+    touch(path, 2_000_000_000)
+    assert holder.check() is False
+    assert holder.check() is False  # load failed
+    assert (holder.models, holder.version, holder.reload_errors) == ("v1", 1, 1)
+    assert holder.check() is False  # the same broken files are not retried
@@ -0,0 +1,52 @@
+import os
+import json
+import pandas as pd
+from feature_store import MANIFEST_FILE, sync_store
+
+
+def write_flows(path, sport, label):
+    df = pd.DataFrame({"sip": [1, 2], "dip": [3, 4], "sport": [sport, sport], "dport": [80, 443],
+                       "proto": [6, 17], "packets": [1, 2], "bytes": [60, 120], "label": [label, label]})
+    df.to_csv(path, index=False)
+
+
+def stored(store):
+    return {entry["dir"]: (int(store.column(entry, "sport")[0]), entry["rows"]) for entry in store.files}
+
+
+def test_same_stem_different_extension(tmp_path):
+    csv_folder, store_dir = tmp_path / "training_data", str(tmp_path / "store")
+    csv_folder.mkdir()
+    write_flows(csv_folder / "x.csv", 1000, "benign")
+    write_flows(csv_folder / "x.csv.gz", 2000, "udp_flood")
+
+    store = sync_store(str(csv_folder), store_dir)
+    assert stored(store) == {"x.csv": (1000, 2), "x.csv.gz": (2000, 2)}
+    assert store.present_labels() == ["benign", "udp_flood"]
+
+    os.remove(csv_folder / "x.csv")
+    store = sync_store(str(csv_folder), store_dir)
+    assert stored(store) == {"x.csv.gz": (2000, 2)}
+    assert sorted(os.listdir(store_dir)) == [MANIFEST_FILE, "x.csv.gz"]
+
+
+def test_colliding_legacy_entries_are_reingested(tmp_path):
+    csv_folder, store_dir = tmp_path / "training_data", str(tmp_path / "store")
+    csv_folder.mkdir()
+    write_flows(csv_folder / "x.csv", 1000, "benign")
+    write_flows(csv_folder / "x.csv.gz", 2000, "udp_flood")
+    sync_store(str(csv_folder), store_dir)
+
+    # Rewrite the manifest as the old stem-keyed layout, both entries pointing at x/
+    manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    for entry in manifest["files"].values():
+        entry["dir"] = "x"
+    os.rename(os.path.join(store_dir, "x.csv.gz"), os.path.join(store_dir, "x"))
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    store = sync_store(str(csv_folder), store_dir)
+    assert stored(store) == {"x.csv": (1000, 2), "x.csv.gz": (2000, 2)}
+    assert not os.path.exists(os.path.join(store_dir, "x"))
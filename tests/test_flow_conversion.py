@@ -0,0 +1,77 @@
+import os
+import sys
+import importlib
+import subprocess
+import pandas as pd
+import pytest
+from flow_conversion import PartWriter, iter_converter_chunks, run_parallel, stream_converter_to_file
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+FLOWS = os.path.join(DATA, "flows.rwcut.txt")
+CONVERTER = [sys.executable, os.path.join(DATA, "fake_rwcut.py"), "--fields", "{fields}", "--no-title",
+             "--delimited={delimiter}", "{input}"]
+
+
+@pytest.fixture
+def process_traning(tmp_path, monkeypatch):
+    # The script creates its output folder on import
+    monkeypatch.chdir(tmp_path)
+    return importlib.import_module("process_traning")
+
+
+def test_chunks_are_parsed_from_the_pipe():
+    chunks = list(iter_converter_chunks(FLOWS, "sip,dport,bytes", CONVERTER, chunk_size=3))
+    assert [len(df) for df in chunks] == [3, 3, 1]
+    df = pd.concat(chunks, ignore_index=True)
+    assert list(df.columns) == ["sip", "dport", "bytes"]
+    assert df["dport"].tolist() == [6007, 33000, 0, 65535, 6003, 51515, 6008]
+
+
+def test_converter_failure_is_raised(tmp_path):
+    failing = tmp_path / "flows.fail"
+    failing.write_text(open(FLOWS).read())
+    with pytest.raises(subprocess.CalledProcessError):
+        list(iter_converter_chunks(str(failing), "sip", CONVERTER))
+
+
+def test_stream_to_file(tmp_path):
+    out = tmp_path / "out.csv"
+    stream_converter_to_file(FLOWS, str(out), "sip,dip,sport,dport,proto,packets,bytes,stime,etime", CONVERTER)
+    assert out.read_text() == open(FLOWS).read()
+
+
+def test_part_writer_rolls_over(tmp_path):
+    df = pd.DataFrame({"x": range(7)})
+    with PartWriter(str(tmp_path / "f_part"), 4, max_rows=3) as writer:
+        writer.write(df.iloc[:2])
+        writer.write(df.iloc[2:])
+    assert [os.path.basename(p) for p in writer.paths] == ["f_part_4_0.csv", "f_part_4_1.csv", "f_part_4_2.csv"]
+    assert pd.concat(pd.read_csv(p) for p in writer.paths)["x"].tolist() == list(range(7))
+
+    with PartWriter(str(tmp_path / "g_part"), 5, max_rows=10) as writer:
+        writer.write(df)
+    assert [os.path.basename(p) for p in writer.paths] == ["g_part_5.csv"]
+
+
+def test_convert_and_label(process_traning, tmp_path, monkeypatch):
+    monkeypatch.setattr(process_traning, "max_rows_per_csv", 4)
+    monkeypatch.setattr(process_traning, "CHUNK_SIZE", 3)
+    paths = process_traning.convert_and_label(FLOWS, str(tmp_path / "flows"), 0, CONVERTER)
+
+    assert [os.path.basename(p) for p in paths] == ["flows_part_0_0.csv", "flows_part_0_1.csv"]
+    df = pd.concat((pd.read_csv(p) for p in paths), ignore_index=True)
+    assert list(df.columns) == process_traning.fields.split(",") + ["label"]
+    assert df["label"].tolist() == ["syn_flood", "normal", "normal", "normal", "ping_flood", "normal", "slowloris"]
+
+
+def test_pool_converts_every_file(process_traning, tmp_path):
+    inputs = []
+    for i in range(3):
+        path = tmp_path / f"in_{i}.txt"
+        path.write_text(open(FLOWS).read())
+        inputs.append(str(path))
+    jobs = [(path, str(tmp_path / f"out_{i}"), i, CONVERTER) for i, path in enumerate(inputs)]
+    results = run_parallel(process_traning.convert_and_label, jobs, max_workers=2)
+    assert [[os.path.basename(p) for p in paths] for paths in results] == [
+        ["out_0_part_0.csv"], ["out_1_part_1.csv"], ["out_2_part_2.csv"]]
+    assert all(len(pd.read_csv(paths[0])) == 7 for paths in results)
@@ -0,0 +1,56 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+from flow_features import (FactorizedFlowFeatureTransformer, FlowFeatureTransformer, PROTO_COL,
+                           feature_transformer_path, load_feature_transformer)
+from migrate_feature_transformers import migrate
+
+FLOWS = pd.DataFrame({"sport": [1000, 2000, 3000, 4000], "dport": [80, 53, 443, 80],
+                      "proto": [17, 6, 1, 47], "packets": [1, 2, 3, 4], "bytes": [60, 120, 180, 240]})
+
+
+def test_codes_match_label_encoder():
+    encoder = LabelEncoder().fit([6, 17, 1, 6])
+    X, valid = FlowFeatureTransformer.from_protocols(encoder.classes_).transform(FLOWS)
+    assert valid is None
+    assert X[:3, PROTO_COL].tolist() == encoder.transform([17, 6, 1]).tolist()
+    assert X[3, PROTO_COL] == -1  # not seen at fit time
+
+
+def test_saved_transformer_is_loaded(tmp_path):
+    model_path = str(tmp_path / "rf_model.pkl")
+    FlowFeatureTransformer.from_protocols([6, 17]).save(feature_transformer_path(model_path))
+    assert load_feature_transformer(model_path).protocols.tolist() == [6, 17]
+
+
+def test_fallback_to_proto_encoder(tmp_path):
+    model_path = str(tmp_path / "nb_model.pkl")
+    joblib.dump(LabelEncoder().fit([1, 6, 17]), str(tmp_path / "nb_proto_encoder.pkl"))
+    features = load_feature_transformer(model_path)
+    assert type(features) is FlowFeatureTransformer
+    assert features.protocols.tolist() == [1, 6, 17]
+
+
+def test_fallback_to_factorize(tmp_path):
+    features = load_feature_transformer(str(tmp_path / "rf_model.pkl"))
+    assert isinstance(features, FactorizedFlowFeatureTransformer)
+    X, _ = features.transform(FLOWS.iloc[[1, 0, 1, 2]])
+    assert X[:, PROTO_COL].tolist() == [0, 1, 0, 2]  # first-seen order within the chunk
+
+
+def test_migrate_writes_transformer_once(tmp_path):
+    model_path = str(tmp_path / "rf_model.pkl")
+    open(model_path, "wb").close()
+    store_calls = []
+
+    def protocols_from_store():
+        store_calls.append(1)
+        return np.array([1, 6, 17], dtype=np.uint8)
+
+    assert migrate(model_path, protocols_from_store) == feature_transformer_path(model_path)
+    assert load_feature_transformer(model_path).protocols.tolist() == [1, 6, 17]
+    assert migrate(model_path, protocols_from_store) is None  # already migrated
+    assert len(store_calls) == 1
+    assert os.path.exists(feature_transformer_path(model_path))
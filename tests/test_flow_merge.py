@@ -0,0 +1,116 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from silk_io import FlowWriter, iter_record_batches
+from flow_merge import RecordRange, UnsortedInputError, merge_files, merge_many, merge_sorted
+from silk_attack_data_merger import attack_chunk_ranges
+
+DTYPE = [("stime", np.int64), ("source", np.int16), ("row", np.int32)]
+
+
+def sorted_run(source, n, seed):
+    rng = np.random.default_rng(seed)
+    run = np.zeros(n, dtype=DTYPE)
+    run["stime"] = np.sort(rng.integers(0, 1000, n))  # many ties within and across runs
+    run["source"] = source
+    run["row"] = np.arange(n)
+    return run
+
+
+def batches(run, size):
+    return [run[i:i + size] for i in range(0, len(run), size)]
+
+
+def records(path):
+    parts = list(iter_record_batches(path))
+    return np.concatenate(parts) if parts else np.empty(0)
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 100, 10_000])
+def test_merge_sorted_order_and_content(batch_size):
+    runs = [sorted_run(i, n, seed=i) for i, n in enumerate([500, 0, 1, 333, 1200])]
+    merged = np.concatenate(list(merge_sorted([batches(run, batch_size) for run in runs])))
+
+    assert (np.diff(merged["stime"]) >= 0).all()
+    expected = np.sort(np.concatenate(runs), order=["stime", "source", "row"])
+    assert np.array_equal(np.sort(merged, order=["stime", "source", "row"]), expected)
+    # Rows of one input keep their order
+    for i in range(len(runs)):
+        assert (np.diff(merged["row"][merged["source"] == i]) > 0).all()
+
+
+def test_merge_sorted_dataframes():
+    runs = [pd.DataFrame(sorted_run(i, 50, seed=i)) for i in range(3)]
+    merged = pd.concat(merge_sorted([[run.iloc[:20], run.iloc[20:]] for run in runs]), ignore_index=True)
+    assert len(merged) == 150 and merged["stime"].is_monotonic_increasing
+
+
+def test_merge_sorted_rejects_unsorted_input():
+    run = sorted_run(0, 100, seed=0)
+    with pytest.raises(UnsortedInputError) as error:
+        list(merge_sorted([batches(run, 10), [run[50:], run[:50]]]))
+    assert error.value.index == 1
+
+
+def flow_file(path, n, seed, shuffle=False):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"sip": rng.integers(0, 2**32, n, dtype=np.uint32), "dip": rng.integers(0, 2**32, n, dtype=np.uint32),
+                       "sport": rng.integers(0, 65536, n), "dport": rng.integers(0, 65536, n), "proto": 6,
+                       "packets": 1, "bytes": rng.integers(40, 1500, n), "stime": np.sort(rng.integers(0, 10**6, n)),
+                       "duration": 5})
+    if shuffle:
+        df = df.sample(frac=1, random_state=seed)
+    with FlowWriter(str(path)) as writer:
+        writer.write(df)
+    return records(str(path))
+
+
+def test_merge_files_with_attack_range(tmp_path):
+    normal = flow_file(tmp_path / "normal.rw", 5000, seed=1)
+    attacks = flow_file(tmp_path / "attacks.rw", 900, seed=2, shuffle=True)
+    out = str(tmp_path / "merged.rw")
+    n = merge_files([str(tmp_path / "normal.rw"), RecordRange(str(tmp_path / "attacks.rw"), 100, 400, sort_key="stime")],
+                    out, batch_size=256)
+
+    merged = records(out)
+    assert n == len(merged) == 5300
+    assert (np.diff(merged["stime"]) >= 0).all()
+    expected = np.concatenate([normal, attacks[100:400]])
+    assert np.array_equal(np.sort(merged, order=["stime", "sip", "dip"]), np.sort(expected, order=["stime", "sip", "dip"]))
+
+
+def test_unsorted_file_is_sorted_and_merge_is_atomic(tmp_path):
+    flow_file(tmp_path / "normal.rw", 2000, seed=3, shuffle=True)
+    flow_file(tmp_path / "other.rw", 500, seed=4)
+    out = str(tmp_path / "merged.rw")
+    assert merge_files([str(tmp_path / "normal.rw"), str(tmp_path / "other.rw")], out, batch_size=128) == 2500
+    assert (np.diff(records(out)["stime"]) >= 0).all()
+
+    # An unsorted input that cannot be re-read leaves no output behind
+    unsorted = [np.sort(records(out)[:50], order="stime")[::-1].copy()]
+    with pytest.raises(UnsortedInputError):
+        merge_files([unsorted], str(tmp_path / "failed.rw"))
+    assert sorted(os.listdir(tmp_path)) == ["merged.rw", "normal.rw", "other.rw"]
+
+
+def test_merge_many_reports_failed_jobs(tmp_path):
+    flow_file(tmp_path / "a.rw", 300, seed=5)
+    jobs = [([str(tmp_path / "a.rw")], str(tmp_path / "ok.rw")),
+            ([str(tmp_path / "missing.rw")], str(tmp_path / "bad.rw"))]
+    assert merge_many(jobs, workers=2) == [300, None]
+    assert not os.path.exists(tmp_path / "bad.rw")
+
+
+def test_attack_chunks_follow_byte_limit(tmp_path):
+    attacks = flow_file(tmp_path / "attacks.rw", 3000, seed=6)
+    limit = 20_000
+    ranges = attack_chunk_ranges(str(tmp_path / "attacks.rw"), byte_limit=limit)
+
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(attacks)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    sizes = attacks["bytes"].astype(np.int64)
+    for start, stop in ranges[:-1]:
+        # The flow that reaches the limit closes the chunk
+        assert sizes[start:stop].sum() >= limit > sizes[start:stop - 1].sum()
+    assert sizes[ranges[-1][0]:ranges[-1][1] - 1].sum() < limit
@@ -0,0 +1,52 @@
+import gzip
+import numpy as np
+from flow_partition import INVALID, LabelRouter, PortRouter, make_router, partition_file
+
+HEADER = "sip,dip,sport,dport,proto,packets,bytes,stime,label"
+ROWS = [
+    "10.0.0.1,192.168.1.2,40312,6007,6,1,60,2025/04/01T15:00:00.123,syn_flood",
+    "10.0.0.3,192.168.1.2,53,33000,17,2,180,2025/04/01T15:00:00.500,normal",
+    "10.0.0.4,8.8.8.8,5001,abc,6,,,2025/04/01T15:00:01.000,normal",
+    "172.16.5.4,10.0.0.1,443,6006,6,12,6500,2025/04/01T15:00:02.000,",
+    "10.0.0.1,10.0.0.2,6008,6006,17,1,40,2025/04/01T15:00:03.000,udp_flood",
+]
+
+
+def write_csv(path, rows=ROWS):
+    path.write_text("\n".join([HEADER] + rows) + "\n")
+    return str(path)
+
+
+def read_lines(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return f.read().splitlines()
+
+
+def test_label_split_round_trips_csv_text(tmp_path, capsys):
+    source = write_csv(tmp_path / "in.csv")
+    paths = [str(tmp_path / "normal.csv"), str(tmp_path / "attacks.csv.gz")]
+    counts = partition_file(source, make_router("label", ["normal", "syn_flood,udp_flood"]), paths, batch_size=2)
+
+    assert counts == {paths[0]: 2, paths[1]: 2}
+    assert read_lines(paths[0]) == [HEADER, ROWS[1], ROWS[2]]  # fields outside the route are kept as written
+    assert read_lines(paths[1]) == [HEADER, ROWS[0], ROWS[4]]
+    assert "dropped 1 rows" in capsys.readouterr().out  # the row without a label
+
+
+def test_port_split_reports_invalid_ports(tmp_path, capsys):
+    source = write_csv(tmp_path / "in.csv")
+    paths = [str(tmp_path / "syn_flood.csv"), str(tmp_path / "udp_flood.csv")]
+    counts = partition_file(source, make_router("dport", ["6007", "6006"]), paths)
+
+    assert counts == {paths[0]: 1, paths[1]: 2}
+    assert read_lines(paths[0]) == [HEADER, ROWS[0]]
+    assert read_lines(paths[1]) == [HEADER, ROWS[3], ROWS[4]]
+    assert "dropped 1 rows" in capsys.readouterr().out  # dport "abc"; 33000 is simply not routed
+
+
+def test_routers_on_typed_batches():
+    ports = np.array([6007, 6006, 80], dtype=np.uint16)
+    assert PortRouter("dport", ["6007", "6000-6006"])({"dport": ports}).tolist() == [0, 1, -1]
+    labels = np.array(["normal", None, "other"], dtype=object)
+    assert LabelRouter("label", ["normal"])({"label": labels}).tolist() == [0, INVALID, -1]
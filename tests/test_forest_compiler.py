@@ -0,0 +1,44 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from forest_compiler import CompiledForest, compile_model, load_classifier
+
+
+def fitted_forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5)).astype(np.float32)
+    X[rng.random(X.shape) < 0.05] = np.nan  # exercises missing_go_to_left
+    y = (np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) > 0).astype(int) + (np.nan_to_num(X[:, 2]) > 1)
+    return RandomForestClassifier(n_estimators=7, max_depth=6, random_state=0).fit(X, y), X
+
+
+def test_npz_round_trip_scores_identically(tmp_path):
+    forest, X = fitted_forest()
+    model_path = str(tmp_path / "rf_model.pkl")
+    joblib.dump(forest, model_path)
+    compile_model(model_path)
+
+    rebuilt = load_classifier(model_path)
+    assert isinstance(rebuilt, RandomForestClassifier)
+    np.testing.assert_array_equal(rebuilt.predict_proba(X), forest.predict_proba(X))
+    np.testing.assert_array_equal(rebuilt.predict(X), forest.predict(X))
+
+    compiled = load_classifier(model_path, evaluator="numpy")
+    assert isinstance(compiled, CompiledForest)
+    assert isinstance(compiled.feature, np.memmap)
+    np.testing.assert_array_equal(compiled.predict_proba(X), forest.predict_proba(X))
+
+
+def test_stale_npz_is_ignored(tmp_path):
+    forest, _ = fitted_forest()
+    model_path = str(tmp_path / "rf_model.pkl")
+    joblib.dump(forest, model_path)
+    compile_model(model_path)
+    npz_mtime = os.path.getmtime(str(tmp_path / "rf_model.npz"))
+    os.utime(model_path, (npz_mtime + 10, npz_mtime + 10))  # model retrained after compiling
+
+    assert isinstance(load_classifier(model_path, evaluator="numpy"), RandomForestClassifier)
+    with pytest.raises(ValueError, match="evaluator"):
+        load_classifier(model_path, evaluator="cython")
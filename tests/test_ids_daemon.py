@@ -0,0 +1,142 @@
+import socket
+import threading
+import time
+import pytest
+import ids_daemon
+import ids_loadgen
+import port_detection
+
+VALID = b"10.0.0.1,10.0.0.2,40312,6007,6,1,60,2024/01/01T00:00:00.000,2024/01/01T00:00:00.001"
+MALFORMED = [
+    b"\xff\xfe\x00garbage",                      # invalid UTF-8, 1 field
+    b"1,2,3,4,5,6,7,8,9,10,11",                  # too many fields
+    b"x",                                        # lone field
+    b'"10.0.0.1,10.0.0.2,1,2,6,1,60,a,b',        # unterminated quote
+    VALID.replace(b"40312", b"\xff\xfe"),        # invalid UTF-8 in a numeric field
+    VALID.replace(b"6007", b"port"),             # non-numeric value
+]
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    # Records what reaches the models instead of loading the trained artifacts
+    frames = []
+    monkeypatch.setattr(port_detection, "score_flows", lambda df, summary, source: frames.append(df))
+    return frames
+
+
+@pytest.mark.parametrize("bad", MALFORMED)
+def test_parse_lines_rejects_only_bad_line(bad):
+    for lines in ([bad, VALID, VALID], [VALID, bad, VALID]):
+        df, rejected = ids_daemon.parse_lines(lines)
+        assert rejected == 1
+        assert len(df) == 2
+        assert df["dport"].tolist() == [6007, 6007]
+
+
+def test_parse_lines_all_bad():
+    df, rejected = ids_daemon.parse_lines(MALFORMED)
+    assert df is None or len(df) == 0
+    assert rejected == len(MALFORMED)
+
+
+def test_failed_batch_is_counted_not_fatal(tmp_path, monkeypatch):
+    calls = []
+
+    def flaky(df, summary, source):
+        calls.append(len(df))
+        if len(calls) == 1:
+            raise RuntimeError("model exploded")
+
+    monkeypatch.setattr(port_detection, "score_flows", flaky)
+    daemon = ids_daemon.IDSDaemon(batch_size=1, batch_timeout=0.01, output_folder=str(tmp_path))
+    daemon.queue.put((time.perf_counter(), [VALID]))
+    daemon.queue.put((time.perf_counter(), [VALID, VALID]))
+    daemon.stop_event.set()
+    daemon.run()
+
+    assert daemon.failed_batches == 1
+    assert daemon.failed_flows == 1
+    assert daemon.flows_scored == 2
+    assert calls == [1, 2]
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind((ids_daemon.HOST, 0))
+        return sock.getsockname()[1]
+
+
+def test_daemon_keeps_scoring_after_malformed_datagrams(tmp_path, scored):
+    port = _free_port()
+    daemon = ids_daemon.IDSDaemon(batch_size=10, batch_timeout=0.05, report_interval=0.2,
+                                  output_folder=str(tmp_path))
+    receiver = threading.Thread(target=daemon.serve_udp, args=(ids_daemon.HOST, port), daemon=True)
+    receiver.start()
+    loop = threading.Thread(target=daemon.run, daemon=True)
+    loop.start()
+    time.sleep(0.2)
+
+    # Each malformed datagram on its own, then one mixed in with valid lines, then valid traffic
+    lines = MALFORMED + [VALID] * 5 + MALFORMED + [VALID] * 20
+    for bad in MALFORMED:
+        ids_loadgen.send_lines([bad], "udp", ids_daemon.HOST, port)
+    ids_loadgen.send_lines(lines, "udp", ids_daemon.HOST, port, lines_per_datagram=7)
+    ids_loadgen.send_lines([VALID] * 10, "udp", ids_daemon.HOST, port)
+
+    stats = ids_loadgen.wait_for_stats(str(tmp_path), len(MALFORMED) + len(lines) + 10, 0, timeout=10)
+    daemon.stop_event.set()
+    loop.join(timeout=5)
+
+    assert loop.is_alive() is False
+    assert stats["flows_scored"] == 35
+    assert stats["rejected_lines"] == 3 * len(MALFORMED)
+    assert stats["failed_batches"] == 0
+    assert sum(len(df) for df in scored) == 35
+
+
+def write_labeled_csv(path, n):
+    rows = ["sip,dip,sport,dport,proto,packets,bytes,stime,etime,label"]
+    for i in range(n):
+        dport = "port" if i == n - 1 else str(6000 + i % 8)  # not typed by the flow loader, so not sent
+        rows.append(f"10.0.0.{i % 250 + 1},10.0.1.1,{40000 + i},{dport},{6 if i % 2 else 17},{i % 5 + 1},"
+                    f"{60 * (i % 5 + 1)},2024/01/01T00:00:{i % 60:02d}.000,2024/01/01T00:00:{i % 60:02d}.500,"
+                    f"{'normal' if i % 3 else 'syn_flood'}")
+    path.write_text("\n".join(rows) + "\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("protocol", ["udp", "tcp"])
+def test_replay_accounts_for_every_sent_flow(tmp_path, monkeypatch, protocol):
+    calls = []
+
+    def first_batch_fails(df, summary, source):
+        calls.append(len(df))
+        if len(calls) == 1:
+            raise RuntimeError("model exploded")
+
+    monkeypatch.setattr(port_detection, "score_flows", first_batch_fails)
+    lines, labels = ids_loadgen.load_lines(write_labeled_csv(tmp_path / "replay.csv", 121))
+    assert len(lines) == 120 and labels.sum() == 120
+    assert lines[0].startswith(b"10.0.0.1,10.0.1.1,40000,6000,17,1,60,2024/01/01T00:00:00.000,")
+    for i in (3, 57):  # malformed on the wire, in the first batch and a later one
+        lines[i] = lines[i].replace(b",600", b",port", 1)
+
+    port = _free_port()
+    daemon = ids_daemon.IDSDaemon(batch_size=40, batch_timeout=0.05, report_interval=0.1,
+                                  output_folder=str(tmp_path / "out"))
+    serve = daemon.serve_udp if protocol == "udp" else daemon.serve_tcp
+    threading.Thread(target=serve, args=(ids_daemon.HOST, port), daemon=True).start()
+    loop = threading.Thread(target=daemon.run, daemon=True)
+    loop.start()
+    time.sleep(0.2)
+
+    ids_loadgen.send_lines(lines, protocol, ids_daemon.HOST, port, lines_per_datagram=10)
+    ids_loadgen.wait_for_stats(str(tmp_path / "out"), len(lines), 0, timeout=10)
+    daemon.stop_event.set()
+    loop.join(timeout=5)
+
+    stats = ids_loadgen.read_stats(str(tmp_path / "out"))
+    assert stats["failed_batches"] == 1
+    assert ids_loadgen.accounted_flows(stats) == len(lines)  # a malformed line of the failed batch counts once
+    assert stats["flows_scored"] == sum(calls[1:])
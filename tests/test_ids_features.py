@@ -0,0 +1,65 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+import IDS
+from silk_io import TCP_FLAG_BITS, iter_flow_batches
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+GENERIC = os.path.join(DATA, "generic_v5.rw")
+
+
+def lzo_copy(tmp_path):
+    # generic_v5.rw with the header claiming lzo1x: valid SiLK, but not decodable by silk_io
+    raw = bytearray(open(GENERIC, "rb").read())
+    raw[7] = 2
+    path = tmp_path / "generic_v5_lzo.rw"
+    path.write_bytes(bytes(raw))
+    return str(path)
+
+
+class StandInSilkFile:
+    # PySiLK stand-in: RWRec-like records of the uncompressed fixture, whatever file is opened
+    def __init__(self):
+        df = pd.concat(iter_flow_batches(GENERIC, columns=IDS.READ_COLUMNS), ignore_index=True)
+        self.records = []
+        for row in df.itertuples(index=False):
+            flags = SimpleNamespace(**{name: int(row.flags & bit != 0) for name, bit in TCP_FLAG_BITS.items()})
+            self.records.append(SimpleNamespace(
+                stime_epoch_secs=row.stime / 1000, sip=row.sip, dip=row.dip, sport=row.sport, dport=row.dport,
+                protocol=row.proto, packets=row.packets, bytes=row.bytes, nhip=row.nhip, tcpflags=flags,
+                duration=datetime.timedelta(milliseconds=int(row.duration)), sensor_id=row.sensor))
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def close(self):
+        pass
+
+
+def test_compressed_file_falls_back_to_pysilk(tmp_path, monkeypatch):
+    opened = []
+
+    def silkfile_open(path, mode):
+        opened.append(path)
+        return StandInSilkFile()
+
+    monkeypatch.setattr(IDS, "silkfile_open", silkfile_open)
+    path = lzo_copy(tmp_path)
+    assert not IDS._can_read_natively(path)
+
+    n = IDS.extract_silk_features([path], str(tmp_path / "pysilk"))
+    assert opened == [path]
+
+    assert IDS.extract_silk_features([GENERIC], str(tmp_path / "native")) == n == 7
+    assert opened == [path]  # the uncompressed file is decoded natively
+    for name in ("fields.npy", "entropy.npy", "combined.npy"):
+        np.testing.assert_array_equal(np.load(tmp_path / "pysilk" / name), np.load(tmp_path / "native" / name))
+
+
+def test_compressed_file_without_pysilk(tmp_path, monkeypatch):
+    monkeypatch.setattr(IDS, "silkfile_open", None)
+    with pytest.raises(ValueError, match="PySiLK is not installed"):
+        IDS.extract_silk_features([lzo_copy(tmp_path)], str(tmp_path / "out"))
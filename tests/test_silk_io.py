@@ -0,0 +1,74 @@
+import os
+import shutil
+import subprocess
+import numpy as np
+import pandas as pd
+import pytest
+import silk_io
+from silk_io import FlowWriter, UnsupportedFormatError, iter_flow_batches, iter_record_batches, iter_rwcut_batches
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+FIXTURES = ["generic_v5.rw", "generic_v5_zlib.rw", "generic_v5_big_endian.rw",
+            "ipv6routing_v1.rw", "ipv6routing_v1_zlib.rw"]
+RWCUT_FIELDS = "sip,dip,sport,dport,proto,packets,bytes,stime,etime"
+
+
+def expected_lines():
+    with open(os.path.join(DATA, "flows.rwcut.txt")) as f:
+        return f.read().splitlines()
+
+
+def rwcut_lines(path, batch_size=65536):
+    lines = []
+    for df in iter_rwcut_batches(path, RWCUT_FIELDS, batch_size):
+        lines += df.to_csv(header=False, index=False).splitlines()
+    return lines
+
+
+@pytest.mark.parametrize("name", FIXTURES)
+@pytest.mark.parametrize("batch_size", [2, 65536])
+def test_matches_rwcut_text(name, batch_size):
+    assert rwcut_lines(os.path.join(DATA, name), batch_size) == expected_lines()
+
+
+@pytest.mark.skipif(shutil.which("rwcut") is None, reason="SiLK tools not installed")
+@pytest.mark.parametrize("name", FIXTURES)
+def test_matches_live_rwcut(name):
+    path = os.path.join(DATA, name)
+    out = subprocess.run(["rwcut", f"--fields={RWCUT_FIELDS}", "--no-title", "--delimited=,", path],
+                         check=True, capture_output=True, text=True).stdout
+    assert rwcut_lines(path) == out.splitlines()
+
+
+@pytest.mark.parametrize("name", FIXTURES[1:])
+def test_formats_decode_to_same_flows(name):
+    reference = pd.concat(iter_flow_batches(os.path.join(DATA, FIXTURES[0])), ignore_index=True)
+    flows = pd.concat(iter_flow_batches(os.path.join(DATA, name), batch_size=3), ignore_index=True)
+    pd.testing.assert_frame_equal(flows, reference)
+
+
+def test_writer_round_trip(tmp_path):
+    flows = pd.concat(iter_flow_batches(os.path.join(DATA, "ipv6routing_v1_zlib.rw")), ignore_index=True)
+    path = str(tmp_path / "out.rw")
+    with FlowWriter(path) as writer:
+        writer.write(flows)
+    assert rwcut_lines(path) == expected_lines()
+    records = np.concatenate(list(iter_record_batches(path)))
+    assert records.dtype == writer.dtype and len(records) == len(flows)
+
+
+def test_unsupported_compression(tmp_path):
+    raw = bytearray(open(os.path.join(DATA, "generic_v5.rw"), "rb").read())
+    raw[7] = 2  # lzo1x
+    path = tmp_path / "lzo.rw"
+    path.write_bytes(bytes(raw))
+    assert not silk_io.is_supported(str(path))
+    with pytest.raises(UnsupportedFormatError):
+        list(iter_record_batches(str(path)))
+
+
+def test_not_silk(tmp_path):
+    path = tmp_path / "text.rw"
+    path.write_text("sip,dip\n")
+    with pytest.raises(ValueError, match="bad magic"):
+        list(iter_record_batches(str(path)))